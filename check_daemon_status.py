@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import time
 import logging
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+
+try:
+    from echo_notes.shared import control
+except ImportError:
+    control = None
+
 # Set up logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -17,6 +25,24 @@ logger = logging.getLogger('check-daemon-status')
 
 def check_daemon_status():
     """Check if the daemon is running"""
+    if control is not None:
+        try:
+            status = control.send_command('status')
+        except (OSError, ValueError) as e:
+            # ValueError: a truncated or malformed reply
+            logger.debug(f"Control socket not reachable ({e}), checking PID file")
+            status = None
+        if status is not None and not status.get('ok'):
+            logger.warning(f"Daemon answered the status command with an error: {status.get('error')}")
+        elif status is not None:
+            logger.info(f"Daemon is running with PID: {status['pid']}, "
+                        f"current job: {status['current_job'] or 'idle'}, "
+                        f"queued notes: {status['queue_depth']}, "
+                        f"LLM calls in flight: {status['llm_in_flight']}")
+            for job, finished in status['last_runs'].items():
+                logger.info(f"Last {job} run: {finished}")
+            return True
+
     pid_file = Path.home() / 'Documents' / 'notes' / 'echo-notes.pid'
     logger.debug(f"Checking daemon status, PID file: {pid_file}")
     
@@ -6,8 +6,10 @@ import logging
 import os
 import sys
 import signal
+import select
 import argparse
 import subprocess
+import threading
 import atexit
 from pathlib import Path
 
@@ -19,12 +21,16 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
-    from echo_notes.shared import config
-    from echo_notes.shared.config import SCHEDULE_CONFIG
+    from echo_notes.shared import config, llm_client, control, metrics, profiling
+    from echo_notes.shared.memory_tracking import MemoryTracker
+    from echo_notes.shared.file_watcher import NotesWatcher
+    from echo_notes.shared.work_queue import WorkQueue
 except ImportError:
     # Try relative import
-    from shared import config
-    from shared.config import SCHEDULE_CONFIG
+    from shared import config, llm_client, control, metrics, profiling
+    from shared.memory_tracking import MemoryTracker
+    from shared.file_watcher import NotesWatcher
+    from shared.work_queue import WorkQueue
 
 # Set up logging
 logging.basicConfig(
@@ -40,23 +46,164 @@ logger = logging.getLogger('echo-notes-daemon')
 # Global flag to control daemon execution
 running = True
 
+# Seconds between schedule/config checks when nothing else wakes the loop
+LOOP_INTERVAL = 60
+
+# Self-pipe used to wake the main loop early (signals, file watcher)
+_wake_r = None
+_wake_w = None
+
+def setup_wakeup_pipe():
+    """Create the pipe that wake() writes to and the main loop waits on"""
+    global _wake_r, _wake_w
+    _wake_r, _wake_w = os.pipe()
+    os.set_blocking(_wake_r, False)
+    os.set_blocking(_wake_w, False)
+
+def wake():
+    """Wake the main loop early; safe to call from signal handlers and other threads"""
+    if _wake_w is None:
+        return
+    try:
+        os.write(_wake_w, b'\0')
+    except OSError:
+        # Pipe full means a wakeup is already pending
+        pass
+
+def wait_for_wakeup(timeout):
+    """Sleep until timeout seconds pass or wake() is called"""
+    if _wake_r is None:
+        time.sleep(timeout)
+        return
+    readable, _, _ = select.select([_wake_r], [], [], timeout)
+    if readable:
+        try:
+            while os.read(_wake_r, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+# What the daemon is doing, published to clients through the control socket
+_state_lock = threading.Lock()
+daemon_state = {
+    'started_at': None,
+    'current_job': None,
+    'job_started_at': None,
+    'last_runs': {},
+    'watch_backend': None,
+}
+# Jobs asked for through the control socket, picked up on the next loop iteration
+_requested = set()
+# Profile every job (--profile), or just the next one (SIGUSR1 / the profile command).
+# A plain flag rather than _requested: signal handlers must not take _state_lock
+profile_jobs = False
+_profile_next = False
+# Reports memory growth after each job while running (--track-memory, SIGUSR2, the memory command).
+# Started and stopped by the main loop; _memory_request is True/False to start/stop, 'toggle' for SIGUSR2
+memory_tracker = MemoryTracker()
+_memory_request = None
+
+def set_state(**changes):
+    with _state_lock:
+        daemon_state.update(changes)
+
+def request_job(name):
+    """Ask the main loop to run a job now ('process', 'summary' or 'reload')"""
+    with _state_lock:
+        _requested.add(name)
+    wake()
+
+def take_request(name) -> bool:
+    """Whether the job was requested since the last check, clearing the request"""
+    with _state_lock:
+        if name in _requested:
+            _requested.discard(name)
+            return True
+        return False
+
+def request_profile():
+    """Profile the next job the daemon runs"""
+    global _profile_next
+    _profile_next = True
+
+def request_memory_tracking(enable='toggle'):
+    """Ask the main loop to start (True) or stop (False) memory tracking, or toggle it"""
+    global _memory_request
+    _memory_request = enable
+    wake()
+
+def apply_memory_request():
+    """Start or stop memory tracking as last requested"""
+    global _memory_request
+    request, _memory_request = _memory_request, None
+    if request is None:
+        return
+    if request == 'toggle':
+        request = not memory_tracker.running
+    if request:
+        try:
+            memory_tracker.start()
+        except OSError as e:
+            logger.error(f"Could not start memory tracking: {e}")
+    else:
+        memory_tracker.stop()
+
+def run_job(name, fn, *args, **kwargs):
+    """
+    Run a task, publishing it as the current job for the status command.
+    Returns the task's result, or None if it raised.
+    """
+    global _profile_next
+    profile, _profile_next = profile_jobs or _profile_next, False
+    set_state(current_job=name, job_started_at=datetime.datetime.now())
+    outcome = 'error'
+    result = None
+    try:
+        with metrics.RUN_SECONDS.time(job=name), profiling.profiled(f'daemon-{name}', enabled=profile):
+            result = fn(*args, **kwargs)
+        outcome = 'ok'
+    except Exception:
+        # Jobs log their own errors; a failed run is retried on the next check
+        pass
+    finally:
+        set_state(current_job=None, job_started_at=None)
+        metrics.RUNS.inc(job=name, outcome=outcome)
+        memory_tracker.record(name)
+    if result is not None:
+        with _state_lock:
+            daemon_state['last_runs'][name] = result
+    return result
+
 def signal_handler(sig, frame):
     """Handle termination signals gracefully"""
     global running
     logger.info("Received termination signal. Shutting down...")
     running = False
+    wake()
+
+def profile_signal_handler(sig, frame):
+    """SIGUSR1: profile the next job"""
+    request_profile()
+
+def memory_signal_handler(sig, frame):
+    """SIGUSR2: start or stop memory tracking"""
+    request_memory_tracking()
 
 def setup_signal_handlers():
     """Set up signal handlers for graceful termination"""
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profile_signal_handler)
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, memory_signal_handler)
 
 def should_process_notes(last_run):
     """Check if it's time to process notes based on the configured interval"""
     if last_run is None:
         return True
     
-    interval_minutes = SCHEDULE_CONFIG.get('processing_interval', 60)
+    interval_minutes = config.SCHEDULE_CONFIG.get('processing_interval', 60)
     elapsed = (datetime.datetime.now() - last_run).total_seconds() / 60
     return elapsed >= interval_minutes
 
@@ -65,8 +212,8 @@ def should_generate_summary(last_run):
     if last_run is None:
         # Check if it's the right day and hour for the first run
         now = datetime.datetime.now()
-        target_day = SCHEDULE_CONFIG.get('summary_day', 6)  # Default: Sunday (6)
-        target_hour = SCHEDULE_CONFIG.get('summary_hour', 12)  # Default: 12:00 PM
+        target_day = config.SCHEDULE_CONFIG.get('summary_day', 6)  # Default: Sunday (6)
+        target_hour = config.SCHEDULE_CONFIG.get('summary_hour', 12)  # Default: 12:00 PM
         
         # Convert to Python's day of week (0 = Monday, 6 = Sunday)
         current_day = now.weekday()
@@ -74,14 +221,14 @@ def should_generate_summary(last_run):
             return True
         return False
     
-    interval_minutes = SCHEDULE_CONFIG.get('summary_interval', 10080)  # Default: 1 week
+    interval_minutes = config.SCHEDULE_CONFIG.get('summary_interval', 10080)  # Default: 1 week
     elapsed = (datetime.datetime.now() - last_run).total_seconds() / 60
     
     # If using weekly interval with specific day/hour
     if interval_minutes == 10080:  # If it's set to exactly one week
         now = datetime.datetime.now()
-        target_day = SCHEDULE_CONFIG.get('summary_day', 6)  # Default: Sunday (6)
-        target_hour = SCHEDULE_CONFIG.get('summary_hour', 12)  # Default: 12:00 PM
+        target_day = config.SCHEDULE_CONFIG.get('summary_day', 6)  # Default: Sunday (6)
+        target_hour = config.SCHEDULE_CONFIG.get('summary_hour', 12)  # Default: 12:00 PM
         
         # Convert to Python's day of week (0 = Monday, 6 = Sunday)
         current_day = now.weekday()
@@ -94,26 +241,26 @@ def should_generate_summary(last_run):
     # For custom intervals not tied to specific day/hour
     return elapsed >= interval_minutes
 
-def run_process_notes():
-    """Run the note processing script"""
+def run_process_notes(paths=None, work_queue=None):
+    """Run the note processing script, optionally only for the given changed files"""
     logger.info("Running note processing...")
     logger.debug(f"Current NOTES_DIR: {config.NOTES_DIR}")
     try:
         # Try the correct import path first
         try:
-            from echo_notes.notes_nextcloud import main as process_notes_main
+            from echo_notes.notes_nextcloud import run as process_notes_run
             logger.debug("Successfully imported from echo_notes.notes_nextcloud")
         except ImportError:
             # Fall back to the old import path
             try:
-                from ai_notes_nextcloud import main as process_notes_main
+                from ai_notes_nextcloud import run as process_notes_run
                 logger.debug("Successfully imported from ai_notes_nextcloud")
             except ImportError:
                 # Try relative import
-                from .notes_nextcloud import main as process_notes_main
+                from .notes_nextcloud import run as process_notes_run
                 logger.debug("Successfully imported from .notes_nextcloud")
         
-        process_notes_main()
+        process_notes_run(paths=paths, work_queue=work_queue)
         logger.info("Note processing completed successfully")
         return datetime.datetime.now()
     except Exception as e:
@@ -121,7 +268,7 @@ def run_process_notes():
         logger.error(f"Import error details: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return None
+        raise
 
 def run_generate_summary():
     """Run the summary generation script"""
@@ -143,33 +290,158 @@ def run_generate_summary():
                 from .weekly_summary import main as generate_summary_main
                 logger.debug("Successfully imported from .weekly_summary")
         
-        generate_summary_main()
+        generate_summary_main([])
         logger.info("Summary generation completed successfully")
         return datetime.datetime.now()
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
+        raise
+
+def start_watcher():
+    """Start watching NOTES_DIR so changed notes are processed within seconds"""
+    try:
+        from echo_notes.notes_nextcloud import is_note_file
+    except ImportError:
+        from notes_nextcloud import is_note_file
+
+    watcher = NotesWatcher(
+        config.NOTES_DIR,
+        accept=is_note_file,
+        settle_seconds=config.SCHEDULE_CONFIG.get('watch_settle_seconds', config.DEFAULT_WATCH_SETTLE_SECONDS),
+        on_change=wake
+    )
+    watcher.start()
+    return watcher
+
+def open_work_queue():
+    """Open the persistent job queue, resuming jobs a previous run left unfinished"""
+    work_queue = WorkQueue(
+        config.WORK_QUEUE_PATH,
+        max_attempts=int(config.SCHEDULE_CONFIG.get('job_max_attempts', config.DEFAULT_JOB_MAX_ATTEMPTS)),
+        base_backoff=float(config.SCHEDULE_CONFIG.get('job_retry_backoff', config.DEFAULT_JOB_RETRY_BACKOFF))
+    )
+    work_queue.recover()
+    work_queue.purge_done()
+    for path, attempts, error in work_queue.dead_jobs():
+        logger.warning(f"Skipping {path} until it changes, it failed {attempts} times: {error}")
+    return work_queue
+
+def control_handlers(work_queue):
+    """Commands served on the control socket; they run on the control server's thread"""
+    def status(request):
+        with _state_lock:
+            state = dict(daemon_state, last_runs=dict(daemon_state['last_runs']),
+                         requested=sorted(_requested))
+        state.update(
+            pid=os.getpid(),
+            notes_dir=str(config.NOTES_DIR),
+            queue=work_queue.counts(),
+            queue_depth=work_queue.depth(),
+            memory_tracking=memory_tracker.running,
+            llm_in_flight=llm_client.in_flight_requests()
+        )
+        return state
+
+    def queue_job(name):
+        def handler(request):
+            request_job(name)
+            return {'queued': name}
+        return handler
+
+    def profile(request):
+        request_profile()
+        logger.info("Profiling the next job on request")
+        return {'profiling': 'next job'}
+
+    def memory(request):
+        enable = request.get('enable', 'toggle')
+        request_memory_tracking(enable)
+        return {'memory_tracking': {True: 'starting', False: 'stopping'}.get(enable, 'toggling'),
+                'report': str(config.MEMORY_LOG_PATH)}
+
+    def stop(request):
+        global running
+        logger.info("Stop requested over the control socket. Shutting down...")
+        running = False
+        wake()
+        return {'stopping': True}
+
+    return {
+        'status': status,
+        'process': queue_job('process'),
+        'summary': queue_job('summary'),
+        'reload': queue_job('reload'),
+        'profile': profile,
+        'memory': memory,
+        'stop': stop,
+    }
+
+def start_control_server(work_queue):
+    """Serve status and run-now commands on the control socket; None if unavailable"""
+    if not control.is_supported():
+        logger.info("Control socket not supported on this platform")
+        return None
+    server = control.ControlServer(control_handlers(work_queue))
+    try:
+        server.start()
+    except OSError as e:
+        logger.warning(f"Control socket unavailable at {config.CONTROL_SOCKET_PATH}: {e}")
         return None
+    return server
+
+def update_queue_metrics(work_queue):
+    """Publish the job queue's size in the metrics"""
+    counts = work_queue.counts()
+    for state, count in counts.items():
+        metrics.QUEUE_JOBS.set(count, state=state)
+    metrics.QUEUE_DEPTH.set(work_queue.depth())
+
+def start_metrics_publisher():
+    """Serve and/or write metrics as configured; None if both are off"""
+    port = int(config.SCHEDULE_CONFIG.get('metrics_port', config.DEFAULT_METRICS_PORT))
+    interval = float(config.SCHEDULE_CONFIG.get('metrics_interval', config.DEFAULT_METRICS_INTERVAL))
+    if not port and not interval:
+        return None
+    return metrics.MetricsPublisher(port=port, interval=interval).start()
+
+def on_config_change(changed):
+    """Apply edited settings right away instead of on the next tick"""
+    if 'notes_directory' in changed:
+        logger.info(f"Notes directory changed to {config.NOTES_DIR}")
+    wake()
 
-def daemon_loop():
+def daemon_loop(watch=False):
     """Main daemon loop that checks and runs tasks at scheduled intervals"""
     last_process_run = None
     last_summary_run = None
+    watcher = None
+    work_queue = open_work_queue()
+    try:
+        control_server = start_control_server(work_queue)
+    except RuntimeError as e:
+        logger.error(f"{e}. Exiting...")
+        work_queue.close()
+        return
+    set_state(started_at=datetime.datetime.now())
+    config.subscribe(on_config_change)
+    publisher = start_metrics_publisher()
     
     logger.info("Starting Echo-Notes daemon...")
-    logger.info(f"Current schedule configuration: {SCHEDULE_CONFIG}")
+    logger.info(f"Current schedule configuration: {dict(config.SCHEDULE_CONFIG)}")
     
     while running:
-        # Reload config in case it was changed
-        old_notes_dir = config.NOTES_DIR
-        config.SCHEDULE_CONFIG = config.load_schedule_config()
-        
-        # Check if notes directory has changed
-        if "notes_directory" in config.SCHEDULE_CONFIG:
-            notes_dir_from_config = Path(config.SCHEDULE_CONFIG["notes_directory"])
-            if notes_dir_from_config != config.NOTES_DIR:
-                logger.info(f"Notes directory changed from {config.NOTES_DIR} to {notes_dir_from_config}")
-                config.NOTES_DIR = notes_dir_from_config
-                os.environ['ECHO_NOTES_DIR'] = str(notes_dir_from_config)
+        apply_memory_request()
+
+        # Pick up edits to the config file; only re-parsed if the file changed
+        if take_request('reload'):
+            config.schedule.refresh(force=True)
+            logger.info("Configuration reloaded on request")
+            if watcher is not None:
+                # Restarted below with the new settings
+                watcher.stop()
+                watcher = None
+        else:
+            config.schedule.refresh()
         
         logger.debug(f"Current NOTES_DIR in daemon loop: {config.NOTES_DIR}")
         
@@ -177,25 +449,70 @@ def daemon_loop():
         if not config.SCHEDULE_CONFIG.get('daemon_enabled', True):
             logger.info("Daemon is disabled in configuration. Exiting...")
             break
+
+        # (Re)start the watcher in event-driven mode, e.g. after the notes directory moved
+        if watch or config.SCHEDULE_CONFIG.get('watch_notes', False):
+            if watcher is not None and (watcher.directory != config.NOTES_DIR or not watcher.is_alive()):
+                watcher.stop()
+                watcher = None
+            if watcher is None and config.NOTES_DIR.is_dir():
+                watcher = start_watcher()
+                # Anything that changed while we weren't watching is caught by a full scan
+                last_process_run = None
+        elif watcher is not None:
+            watcher.stop()
+            watcher = None
+        set_state(watch_backend=watcher.backend if watcher is not None else None)
         
         # Check if it's time to process notes
-        if should_process_notes(last_process_run):
-            last_process_run = run_process_notes()
+        process_requested = take_request('process')
+        if process_requested or should_process_notes(last_process_run) or \
+                (watcher is not None and watcher.rescan_needed):
+            if watcher is not None:
+                watcher.rescan_needed = False
+            last_process_run = run_job('process', run_process_notes, work_queue=work_queue)
+        else:
+            changed = watcher.pop_ready() if watcher is not None else []
+            if changed:
+                logger.info(f"{len(changed)} notes changed, processing them now")
+            if changed or work_queue.seconds_until_due() == 0:
+                # Also picks up failed notes whose retry is due
+                run_job('process', run_process_notes, changed, work_queue=work_queue)
         
         # Check if it's time to generate summary
-        if should_generate_summary(last_summary_run):
-            last_summary_run = run_generate_summary()
+        if take_request('summary') or should_generate_summary(last_summary_run):
+            last_summary_run = run_job('summary', run_generate_summary)
         
-        # Sleep for a minute before checking again
-        for _ in range(60):  # Check every second if we should stop
-            if not running:
-                break
-            time.sleep(1)
+        update_queue_metrics(work_queue)
 
-def start_daemon():
+        # Sleep until the next check, a settled file change or a termination signal
+        timeout = LOOP_INTERVAL
+        if watcher is not None:
+            until_ready = watcher.seconds_until_ready()
+            if until_ready is not None:
+                timeout = min(timeout, until_ready)
+        until_due = work_queue.seconds_until_due()
+        if until_due is not None:
+            timeout = min(timeout, until_due)
+        if running:
+            wait_for_wakeup(timeout)
+
+    if watcher is not None:
+        watcher.stop()
+    if control_server is not None:
+        control_server.stop()
+    if publisher is not None:
+        publisher.stop()
+    memory_tracker.stop()
+    work_queue.close()
+
+def start_daemon(watch=False, profile=False):
     """Start the daemon process"""
+    global profile_jobs
+    profile_jobs = profile
+    setup_wakeup_pipe()
     setup_signal_handlers()
-    daemon_loop()
+    daemon_loop(watch=watch)
 
 def daemonize():
     """Detach from the terminal and run as a daemon process"""
@@ -252,19 +569,77 @@ def main():
     parser.add_argument('--configure', action='store_true', help='Configure scheduling settings')
     parser.add_argument('--daemon', action='store_true', help='Run as a daemon (detached from terminal)')
     parser.add_argument('--stop', action='store_true', help='Stop the running daemon')
+    parser.add_argument('--watch', action='store_true',
+                        help='Process notes as soon as they change instead of only on the schedule')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Profile every job, writing pstats and collapsed stacks to {config.STATE_DIR}')
+    parser.add_argument('--profile-next', action='store_true',
+                        help='Ask the running daemon to profile its next job')
+    parser.add_argument('--track-memory', action='store_true',
+                        help=f'Report memory growth after every job to {config.MEMORY_LOG_PATH}')
+    parser.add_argument('--memory-tracking', choices=['on', 'off'],
+                        help='Turn memory tracking on or off in the running daemon')
     args = parser.parse_args()
     
     if args.configure:
         configure_scheduling()
     elif args.stop:
         stop_daemon()
+    elif args.profile_next:
+        profile_running_daemon()
+    elif args.memory_tracking:
+        try:
+            reply = control.send_command('memory', enable=args.memory_tracking == 'on')
+        except OSError as e:
+            print(f"Could not reach the daemon ({e}); kill -USR2 <pid> toggles memory tracking")
+            return
+        print(f"Memory tracking {reply.get('memory_tracking', reply.get('error'))}, report: {config.MEMORY_LOG_PATH}")
     else:
         if args.daemon:
             daemonize()
-        start_daemon()
+        if args.track_memory:
+            request_memory_tracking(True)
+        start_daemon(watch=args.watch, profile=args.profile)
+
+def profile_running_daemon():
+    """Ask the running daemon to profile its next job, over the control socket or with SIGUSR1"""
+    try:
+        control.send_command('profile')
+    except OSError:
+        pass
+    else:
+        print(f"The daemon will profile its next job; results go to {config.STATE_DIR}")
+        return
+
+    pid_file = os.path.join(os.path.expanduser('~'), 'Documents', 'notes', 'echo-notes.pid')
+    try:
+        with open(pid_file, 'r') as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGUSR1)
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Could not reach the daemon: {e}")
+        return
+    print(f"Sent SIGUSR1 to daemon process (PID: {pid}); it will profile its next job")
 
 def stop_daemon():
     """Stop the running daemon process"""
+    try:
+        control.send_command('stop')
+    except OSError:
+        # Not listening on the control socket, fall back to signalling the PID
+        pass
+    else:
+        print("Asked the daemon to stop")
+        for _ in range(20):  # Wait up to 10 seconds
+            try:
+                control.send_command('ping', timeout=0.5)
+            except OSError:
+                print("Daemon stopped successfully")
+                return
+            time.sleep(0.5)
+        print("Daemon is still finishing its current job; it will exit once that is done")
+        return
+
     pid_file = os.path.join(os.path.expanduser('~'), 'Documents', 'notes', 'echo-notes.pid')
     if not os.path.exists(pid_file):
         print("Daemon is not running (PID file not found)")
@@ -14,17 +14,20 @@ import traceback
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QTextEdit, QGroupBox, QSplitter,
+    QPushButton, QLabel, QTextEdit, QPlainTextEdit, QGroupBox, QSplitter,
     QFrame, QSizePolicy, QFileDialog, QMessageBox, QDialog,
     QMenu
 )
-from PyQt6.QtCore import Qt, QTimer, pyqtSlot, QSize, pyqtSignal, QObject, QMetaObject, Q_ARG, QThread
+from PyQt6.QtCore import (
+    Qt, QTimer, pyqtSlot, QSize, pyqtSignal, QObject, QThread,
+    QFileSystemWatcher
+)
 from PyQt6.QtGui import QFont, QIcon, QColor, QPalette
 
 # Import Echo-Notes modules
 # Import Echo-Notes modules
-from echo_notes.shared import config
-from echo_notes.shared.config import SCHEDULE_CONFIG
+from echo_notes.shared import config, llm_client, file_utils, control, metrics
+from echo_notes.shared.log_buffer import LogBuffer
 
 # Set up logging
 logging.basicConfig(
@@ -37,6 +40,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('echo-notes-dashboard')
 
+# Milliseconds between moves of buffered log lines into the log view
+LOG_FLUSH_INTERVAL = 250
+
 class WorkerSignals(QObject):
     """Defines the signals available from a running worker thread."""
     finished = pyqtSignal()
@@ -67,26 +73,11 @@ class Worker(QThread):
         finally:
             self.signals.finished.emit()
 
-class LogHandler(logging.Handler):
-    """Custom log handler to redirect logs to the GUI"""
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget  # Store the text widget
-        # Use a custom formatter that only shows date and time (no seconds) and no log level
-        self.setFormatter(logging.Formatter('%(asctime)s - %(message)s',
-                                           datefmt='%Y-%m-%d %H:%M'))
-
-    def emit(self, record):
-        msg = self.format(record)
-        # Use invokeMethod to ensure thread safety
-        QMetaObject.invokeMethod(self.text_widget, 
-                                "append", 
-                                Qt.ConnectionType.QueuedConnection,
-                                Q_ARG(str, msg))
-        # Auto-scroll is handled in the slot
-
 class EchoNotesDashboard(QMainWindow):
     """Main dashboard window for Echo-Notes"""
+    # Config change callbacks can run on any thread; this carries them to the GUI thread
+    log_line_limit_changed = pyqtSignal(int)
+
     def __init__(self):
         super().__init__()
 
@@ -94,18 +85,23 @@ class EchoNotesDashboard(QMainWindow):
         self.last_note_time = None
         self.last_summary_time = None
         self.worker_threads = []  # Keep track of worker threads
+        self.latest_times_worker = None
+        self.latest_times_rescan = False
+        self.status_worker = None
 
         self.init_ui()
         self.setup_log_handler()
         self.setup_signals()
+        self.setup_notes_watcher()
 
-        # Start the update timer
+        # Start the update timer; it polls the daemon on a worker thread, note times arrive from the watcher
         self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self.update_status)
         self.update_timer.start(1000)  # Update every second
 
         # Initial status update
         self.update_status()
+        self.check_last_processed_times()
 
     def init_ui(self):
         """Initialize the user interface"""
@@ -157,6 +153,11 @@ class EchoNotesDashboard(QMainWindow):
         timestamps_layout.addWidget(self.last_summary_label)
         status_layout.addLayout(timestamps_layout)
 
+        # Counters written by the daemon (metrics_interval setting)
+        self.metrics_label = QLabel("Metrics: No metrics yet")
+        self.metrics_label.setWordWrap(True)
+        status_layout.addWidget(self.metrics_label)
+
         # Notes directory section
         notes_dir_layout = QHBoxLayout()
         self.notes_dir_label = QLabel(f"Notes Directory: {config.NOTES_DIR}")
@@ -192,12 +193,12 @@ class EchoNotesDashboard(QMainWindow):
         logs_group = QGroupBox("Logs")
         logs_layout = QVBoxLayout(logs_group)
 
-        self.log_display = QTextEdit()
+        # Plain text only lays out the visible lines, and old lines are dropped past the limit
+        self.log_display = QPlainTextEdit()
         self.log_display.setReadOnly(True)
-        self.log_display.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
-        
-        # Connect textChanged to auto-scroll
-        self.log_display.textChanged.connect(self.auto_scroll_logs)
+        self.log_display.setUndoRedoEnabled(False)
+        self.log_display.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.log_display.setMaximumBlockCount(self.log_line_limit())
 
         logs_layout.addWidget(self.log_display)
 
@@ -211,106 +212,200 @@ class EchoNotesDashboard(QMainWindow):
         main_layout.setStretch(1, 1)  # Controls section
         main_layout.setStretch(2, 4)  # Logs section
 
+    def log_line_limit(self):
+        return max(100, int(config.SCHEDULE_CONFIG.get('dashboard_log_lines', config.DEFAULT_DASHBOARD_LOG_LINES)))
+
     def setup_log_handler(self):
-        """Set up custom log handler to display logs in the GUI"""
-        self.log_handler = LogHandler(self.log_display)
-        logger.addHandler(self.log_handler)
+        """Collect log records in a ring buffer that a timer moves into the log view"""
+        # Records can come from any thread; they are only buffered here, never sent to the widget one by one
+        self.log_handler = LogBuffer(self.log_line_limit())
+        # Use a custom formatter that only shows date and time (no seconds) and no log level
+        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s',
+                                                        datefmt='%Y-%m-%d %H:%M'))
 
-        # Also capture root logger to see all Echo-Notes logs
+        # The root logger sees all Echo-Notes logs, including this module's
         root_logger = logging.getLogger()
         root_logger.addHandler(self.log_handler)
 
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.timeout.connect(self.flush_logs)
+        self.log_flush_timer.start(LOG_FLUSH_INTERVAL)
+
+        self.log_line_limit_changed.connect(self.apply_log_line_limit)
+        config.subscribe(self.on_config_change)
+
+    def on_config_change(self, changed):
+        if 'dashboard_log_lines' in changed:
+            self.log_line_limit_changed.emit(self.log_line_limit())
+
+    @pyqtSlot(int)
+    def apply_log_line_limit(self, max_lines):
+        """Keep a new number of log lines; the next flush redraws the view from the buffer"""
+        self.log_handler.resize(max_lines)
+        self.log_display.setMaximumBlockCount(max_lines)
+
+    def flush_logs(self):
+        """Append the lines logged since the last tick in one update"""
+        lines, reset = self.log_handler.drain()
+        if not lines and not reset:
+            return
+        scrollbar = self.log_display.verticalScrollBar()
+        # Only follow new lines if the view was already at the bottom
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 1
+        if reset:
+            self.log_display.setPlainText('\n'.join(lines))
+        else:
+            self.log_display.appendPlainText('\n'.join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
     def setup_signals(self):
         """Set up signal connections for thread-safe UI updates"""
         # These will be connected when workers are created
 
-    def auto_scroll_logs(self):
-        """Auto-scroll log display to the bottom"""
+    def query_daemon_status(self):
+        """Status reported by the daemon over its control socket, or None if it isn't listening"""
         try:
-            scrollbar = self.log_display.verticalScrollBar()
-            scrollbar.setValue(scrollbar.maximum())
+            status = control.send_command('status', timeout=0.25)
+        except (OSError, ValueError):
+            return None
+        return status if status.get('ok') else None
+
+    def poll_daemon(self):
+        """
+        Read the metrics file, the control socket and the PID file. Runs on a
+        worker thread; returns (metrics text, running, status text, color).
+        """
+        metrics_text = f"Metrics: {metrics.summarize(metrics.read_json())}"
+
+        # Ask the daemon itself first; the PID file only says whether the process exists
+        daemon_status = self.query_daemon_status()
+        if daemon_status is not None:
+            status_text = "Status: Running"
+            job = daemon_status.get('current_job')
+            if job:
+                status_text += " (processing notes)" if job == 'process' else " (generating summary)"
+            if daemon_status.get('queue_depth'):
+                status_text += f", {daemon_status['queue_depth']} notes queued"
+            return metrics_text, True, status_text, "green"
+
+        # Check if daemon is running
+        pid_file = Path.home() / 'Documents' / 'notes' / 'echo-notes.pid'
+        logger.debug(f"Checking daemon status, PID file: {pid_file}")
+        if not pid_file.exists():
+            logger.debug("No PID file found, daemon is not running")
+            return metrics_text, False, "Status: Not Running", "red"
+
+        try:
+            with open(pid_file, 'r') as f:
+                pid = int(f.read().strip())
+            logger.debug(f"Found PID file with PID: {pid}")
         except Exception as e:
-            logger.error(f"Error auto-scrolling logs: {e}")
+            logger.error(f"Error checking daemon status: {e}")
+            logger.error(traceback.format_exc())
+            return metrics_text, False, "Status: Error", "orange"
 
-    def update_status(self):
-        """Update the daemon status and timestamps"""
+        # Check if process is actually running
         try:
-            # Check if daemon is running
-            pid_file = Path.home() / 'Documents' / 'notes' / 'echo-notes.pid'
-            logger.debug(f"Checking daemon status, PID file: {pid_file}")
+            os.kill(pid, 0)  # This will raise an exception if process doesn't exist
+        except OSError:
+            # Clean up stale PID file
+            pid_file.unlink(missing_ok=True)
+            logger.debug(f"Daemon process with PID {pid} is not running (stale PID file)")
+            return metrics_text, False, "Status: Not Running (Stale PID)", "red"
+        logger.debug(f"Daemon process with PID {pid} is running")
+        return metrics_text, True, "Status: Running", "green"
 
-            if pid_file.exists():
-                try:
-                    with open(pid_file, 'r') as f:
-                        pid = int(f.read().strip())
-                    logger.debug(f"Found PID file with PID: {pid}")
+    def update_status(self):
+        """Refresh the daemon status and metrics on a worker thread"""
+        # The socket query and file reads would stall the window if run here
+        if self.status_worker is not None:
+            return
+        worker = Worker(self.poll_daemon)
+        worker.signals.result.connect(self.apply_status)
+        worker.signals.finished.connect(self.status_poll_finished)
+        self.status_worker = worker
+        worker.start()
+
+    @pyqtSlot(object)
+    def apply_status(self, result):
+        """Show the status found by poll_daemon"""
+        metrics_text, running, status_text, color = result
+        self.metrics_label.setText(metrics_text)
+        self.daemon_running = running
+        self.status_label.setText(status_text)
+        self.status_label.setStyleSheet(f"color: {color}")
+        self.toggle_daemon_btn.setText("Stop Daemon" if running else "Start Daemon")
 
-                    # Check if process is actually running
-                    try:
-                        os.kill(pid, 0)  # This will raise an exception if process doesn't exist
-                        self.daemon_running = True
-                        self.status_label.setText("Status: Running")
-                        self.status_label.setStyleSheet("color: green")
-                        self.toggle_daemon_btn.setText("Stop Daemon")
-                        logger.debug(f"Daemon process with PID {pid} is running")
-                    except OSError:
-                        self.daemon_running = False
-                        self.status_label.setText("Status: Not Running (Stale PID)")
-                        self.status_label.setStyleSheet("color: red")
-                        self.toggle_daemon_btn.setText("Start Daemon")
-                        # Clean up stale PID file
-                        pid_file.unlink(missing_ok=True)
-                        logger.debug(f"Daemon process with PID {pid} is not running (stale PID file)")
-                except Exception as e:
-                    logger.error(f"Error checking daemon status: {e}")
-                    logger.error(traceback.format_exc())
-                    self.daemon_running = False
-                    self.status_label.setText("Status: Error")
-                    self.status_label.setStyleSheet("color: orange")
-                    self.toggle_daemon_btn.setText("Start Daemon")
-            else:
-                self.daemon_running = False
-                self.status_label.setText("Status: Not Running")
-                self.status_label.setStyleSheet("color: red")
-                self.toggle_daemon_btn.setText("Start Daemon")
-                logger.debug("No PID file found, daemon is not running")
-
-            # Check for last processed note and summary
-            self.check_last_processed_times()
-        except Exception as e:
-            logger.error(f"Unexpected error in update_status: {e}")
-            logger.error(traceback.format_exc())
+    @pyqtSlot()
+    def status_poll_finished(self):
+        self.status_worker.wait()
+        self.status_worker = None
+
+    def setup_notes_watcher(self):
+        """Refresh the note timestamps when the notes directory changes"""
+        self.notes_watcher = QFileSystemWatcher(self)
+        self.notes_watcher.directoryChanged.connect(self.schedule_latest_times_scan)
+
+        # Coalesce bursts of changes (e.g. a sync client) into one scan
+        self.latest_times_debounce = QTimer(self)
+        self.latest_times_debounce.setSingleShot(True)
+        self.latest_times_debounce.setInterval(500)
+        self.latest_times_debounce.timeout.connect(self.start_latest_times_scan)
+
+        # Edits to existing files don't change the directory itself, so rescan now and then too
+        self.latest_times_timer = QTimer(self)
+        self.latest_times_timer.timeout.connect(self.schedule_latest_times_scan)
+        self.latest_times_timer.start(60000)
 
     def check_last_processed_times(self):
-        """Check for the last processed note and summary times"""
+        """Watch the current notes directory and refresh the last note and summary times"""
         try:
-            # Check for most recent note file
-            notes_dir = config.NOTES_DIR
-            logger.debug(f"Checking for notes in directory: {notes_dir}")
-            if notes_dir.exists():
-                # Look for .md, .txt, and .docx files
-                note_files = [f for f in notes_dir.iterdir()
-                             if f.suffix in ['.md', '.txt', '.docx']
-                             and not f.name.startswith('Weekly Summary')]
-                if note_files:
-                    latest_note = max(note_files, key=os.path.getmtime)
-                    mtime = datetime.datetime.fromtimestamp(os.path.getmtime(latest_note))
-                    self.last_note_time = mtime
-                    self.last_note_label.setText(f"Last Note: {mtime.strftime('%Y-%m-%d %H:%M')}")
-                    logger.debug(f"Found latest note: {latest_note.name} from {mtime}")
-
-                # Check for most recent summary file
-                summary_files = [f for f in notes_dir.iterdir() if f.suffix == '.md' and f.name.startswith('Weekly Summary')]
-                if summary_files:
-                    latest_summary = max(summary_files, key=os.path.getmtime)
-                    mtime = datetime.datetime.fromtimestamp(os.path.getmtime(latest_summary))
-                    self.last_summary_time = mtime
-                    self.last_summary_label.setText(f"Last Summary: {mtime.strftime('%Y-%m-%d %H:%M')}")
-                    logger.debug(f"Found latest summary: {latest_summary.name} from {mtime}")
+            watched = self.notes_watcher.directories()
+            if watched:
+                self.notes_watcher.removePaths(watched)
+            if config.NOTES_DIR.exists():
+                self.notes_watcher.addPath(str(config.NOTES_DIR))
+            self.schedule_latest_times_scan()
         except Exception as e:
             logger.error(f"Error checking processed times: {e}")
             logger.error(traceback.format_exc())
 
+    def schedule_latest_times_scan(self, *args):
+        """Queue a background rescan of the notes directory"""
+        self.latest_times_debounce.start()
+
+    def start_latest_times_scan(self):
+        """Find the newest note and summary on a worker thread"""
+        if self.latest_times_worker is not None:
+            # Run again once the current scan is done
+            self.latest_times_rescan = True
+            return
+        worker = Worker(file_utils.find_latest_note_times, config.NOTES_DIR)
+        worker.signals.result.connect(self.apply_latest_times)
+        worker.signals.finished.connect(self.latest_times_scan_finished)
+        self.latest_times_worker = worker
+        worker.start()
+
+    @pyqtSlot(object)
+    def apply_latest_times(self, result):
+        """Show the times found by the background scan"""
+        note_mtime, summary_mtime = result
+        if note_mtime is not None:
+            self.last_note_time = datetime.datetime.fromtimestamp(note_mtime)
+            self.last_note_label.setText(f"Last Note: {self.last_note_time.strftime('%Y-%m-%d %H:%M')}")
+        if summary_mtime is not None:
+            self.last_summary_time = datetime.datetime.fromtimestamp(summary_mtime)
+            self.last_summary_label.setText(f"Last Summary: {self.last_summary_time.strftime('%Y-%m-%d %H:%M')}")
+
+    @pyqtSlot()
+    def latest_times_scan_finished(self):
+        self.latest_times_worker.wait()
+        self.latest_times_worker = None
+        if self.latest_times_rescan:
+            self.latest_times_rescan = False
+            self.start_latest_times_scan()
+
     @pyqtSlot()
     def toggle_daemon(self):
         """Start or stop the daemon process"""
@@ -412,11 +507,28 @@ class EchoNotesDashboard(QMainWindow):
             logger.error(f"Error stopping daemon: {e}")
             logger.error(traceback.format_exc())
 
+    def request_daemon_job(self, job):
+        """Ask the running daemon to start a job now; False if it can't be reached"""
+        try:
+            reply = control.send_command(job)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not reach daemon control socket: {e}")
+            return False
+        if not reply.get('ok'):
+            logger.warning(f"Daemon rejected {job} request: {reply.get('error')}")
+            return False
+        logger.info("Daemon will start it right away")
+        return True
+
     @pyqtSlot()
     def process_notes(self):
         """Manually trigger note processing"""
         try:
             logger.info("Manually triggering note processing...")
+
+            # Let a running daemon do it, so the same notes aren't processed twice at once
+            if self.daemon_running and self.request_daemon_job('process'):
+                return
             
             # Create worker thread for note processing
             worker = Worker(self._run_process_notes)
@@ -440,10 +552,7 @@ class EchoNotesDashboard(QMainWindow):
             import requests
             try:
                 # Use models endpoint to check server availability instead of chat completions
-                server_url = config.LM_URL.rsplit('/', 2)[0]  # Remove '/chat/completions'
-                models_url = f"{server_url}/models"
-                logger.debug(f"Checking LLM server availability at {models_url}")
-                response = requests.get(models_url, timeout=1)
+                response = llm_client.get_client().check_server(timeout=1)
                 logger.debug(f"LLM server response status: {response.status_code}")
                 
                 # LLM server is available, proceed with processing
@@ -459,7 +568,7 @@ class EchoNotesDashboard(QMainWindow):
                         logger.debug("Successfully imported from notes_nextcloud")
                 
                 logger.debug(f"LLM server available, proceeding with note processing. Using NOTES_DIR: {config.NOTES_DIR}")
-                process_notes_main()
+                process_notes_main([])
                 logger.info("Note processing completed successfully")
 
                 # Emit signal to update timestamp safely
@@ -498,6 +607,9 @@ class EchoNotesDashboard(QMainWindow):
         """Manually trigger summary generation"""
         try:
             logger.info("Manually triggering summary generation...")
+
+            if self.daemon_running and self.request_daemon_job('summary'):
+                return
             
             # Create worker thread for summary generation
             worker = Worker(self._run_generate_summary)
@@ -521,10 +633,7 @@ class EchoNotesDashboard(QMainWindow):
             import requests
             try:
                 # Use models endpoint to check server availability instead of chat completions
-                server_url = config.LM_URL.rsplit('/', 2)[0]  # Remove '/chat/completions'
-                models_url = f"{server_url}/models"
-                logger.debug(f"Checking LLM server availability at {models_url}")
-                response = requests.get(models_url, timeout=1)
+                response = llm_client.get_client().check_server(timeout=1)
                 logger.debug(f"LLM server response status: {response.status_code}")
                 
                 # LLM server is available, proceed with summary generation
@@ -540,7 +649,7 @@ class EchoNotesDashboard(QMainWindow):
                         logger.debug("Successfully imported from weekly_summary")
                 
                 logger.debug(f"LLM server available, proceeding with summary generation. Using NOTES_DIR: {config.NOTES_DIR}")
-                generate_summary_main()
+                generate_summary_main([])
                 logger.info("Summary generation completed successfully")
 
                 # Emit signal to update timestamp safely
@@ -596,10 +705,6 @@ class EchoNotesDashboard(QMainWindow):
                 new_dir_path = Path(new_dir)
                 logger.info(f"User selected new notes directory: {new_dir_path}")
                 
-                # Update the configuration in memory
-                os.environ['ECHO_NOTES_DIR'] = str(new_dir_path)
-                config.NOTES_DIR = new_dir_path
-                
                 # Update the UI
                 self.notes_dir_label.setText(f"Notes Directory: {new_dir_path}")
                 
@@ -608,9 +713,8 @@ class EchoNotesDashboard(QMainWindow):
                     new_dir_path.mkdir(parents=True, exist_ok=True)
                     logger.info(f"Created new notes directory: {new_dir_path}")
                 
-                # Save the configuration to file for persistence
-                config.SCHEDULE_CONFIG["notes_directory"] = str(new_dir_path)
-                config.save_schedule_config(config.SCHEDULE_CONFIG)
+                # Save the configuration to file; config.NOTES_DIR follows it
+                config.update_schedule_config(notes_directory=str(new_dir_path))
                 logger.info(f"Saved notes directory to configuration file: {new_dir_path}")
                 
                 # If daemon is running, ask user if they want to restart it
@@ -651,7 +755,16 @@ class EchoNotesDashboard(QMainWindow):
         """Handle window close event"""
         try:
             logger.info("Closing Echo-Notes Dashboard")
+            self.log_flush_timer.stop()
+            config.unsubscribe(self.on_config_change)
+            logging.getLogger().removeHandler(self.log_handler)
             # Clean up worker threads
+            self.latest_times_timer.stop()
+            if self.latest_times_worker is not None:
+                self.latest_times_worker.wait(1000)
+            self.update_timer.stop()
+            if self.status_worker is not None:
+                self.status_worker.wait(1000)
             for worker in self.worker_threads:
                 if worker.isRunning():
                     worker.quit()
@@ -801,12 +914,9 @@ class EchoNotesDashboard(QMainWindow):
                     schedule_config["summary_hour"] = summary_hour_spin.value()
                     schedule_config["daemon_enabled"] = daemon_enabled_check.isChecked()
                     
-                    # Save to file
+                    # Save to file; config.SCHEDULE_CONFIG picks it up from there
                     config.save_schedule_config(schedule_config)
                     
-                    # Update in-memory config
-                    config.SCHEDULE_CONFIG = schedule_config
-                    
                     # Show success message
                     from PyQt6.QtWidgets import QMessageBox
                     QMessageBox.information(dialog, "Success", "Scheduling configuration saved successfully!")
@@ -926,11 +1036,11 @@ class EchoNotesDashboard(QMainWindow):
                     config.LLM_MODEL = model_combo.currentText()
                     config.LM_URL = llm_url_input.text()
                     
-                    # Save prompts config
-                    prompts_config = {
+                    # Save prompts config, keeping prompts not edited on this page
+                    prompts_config.update({
                         "daily_notes_prompt": daily_prompt_edit.toPlainText(),
                         "weekly_summary_prompt": weekly_prompt_edit.toPlainText()
-                    }
+                    })
                     
                     with open(config.PROMPTS_CONFIG_PATH, 'w') as f:
                         json.dump(prompts_config, f, indent=2)
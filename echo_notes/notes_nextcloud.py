@@ -2,7 +2,10 @@
 
 from pathlib import Path
 import os
-import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 try:
     # Try the correct import path first
     from echo_notes.shared import (
@@ -10,8 +13,16 @@ try:
         file_utils,
         date_helpers,
         llm_client,
-        file_converters
+        file_converters,
+        chunker,
+        prompt_registry,
+        conversion,
+        metrics,
+        tracing,
+        profiling,
+        atomic_files
     )
+    from echo_notes.shared.note_index import NoteIndex
     print("Successfully imported from echo_notes.shared")
 except ImportError:
     # Fall back to the old import path
@@ -20,48 +31,387 @@ except ImportError:
         file_utils,
         date_helpers,
         llm_client,
-        file_converters
+        file_converters,
+        chunker,
+        prompt_registry,
+        conversion,
+        metrics,
+        tracing,
+        profiling,
+        atomic_files
     )
+    from shared.note_index import NoteIndex
     print("Falling back to import from shared")
 
+logger = logging.getLogger('notes_nextcloud')
+
+# Reply budget requested for each note (or each chunk of a long note)
+NOTE_REPLY_TOKENS = 2000
+
+# Sections of a processed note, in order, after its SUMMARY header
+NOTE_SECTIONS = (config.SUMMARY_MARKER, 'TASKS', 'SUGGESTIONS / NEXT STEPS')
+
+# Long notes are cleaned up chunk by chunk without the SUMMARY header, then
+# the chunk replies are merged into a single note in the daily format
+DEFAULT_CHUNK_NOTES_PROMPT = (
+    "You are an AI assistant. I will give you one part of a longer set of raw voice-to-text notes.\n"
+    "Please:\n"
+    " 1. Fix grammar, spelling, and sentence structure.\n"
+    " 2. Organize into clear UPPERCASE sub-sections (e.g., GOALS, IDEAS).\n"
+    " 3. Extract tasks as a checklist with '[ ] '.\n"
+    " 4. Suggest next steps as bullet points.\n\n"
+    "Output only these three sections, with no summary; the parts are merged afterwards:\n"
+    "CLEANED & STRUCTURED NOTES\n...your sections here...\n\n"
+    "TASKS\n[ ] Task 1\n\n"
+    "SUGGESTIONS / NEXT STEPS\n• Suggestion 1\n"
+)
+DEFAULT_MERGE_NOTES_PROMPT = (
+    "You are an AI assistant. I will give you notes that were cleaned up in several overlapping parts "
+    "and gathered under their section headings.\n"
+    "Merge them into one coherent note: remove text repeated where the parts overlap, "
+    "keep every fact, task and date, and write a short summary of the whole note.\n\n"
+    "Output each section exactly once, in this format:\n"
+    "SUMMARY ({now})\n...short summary...\n\n"
+    "CLEANED & STRUCTURED NOTES\n...your sections here...\n\n"
+    "TASKS\n[ ] Task 1\n\n"
+    "SUGGESTIONS / NEXT STEPS\n• Suggestion 1\n"
+)
+
 def load_prompts_from_config():
-    with open(config.PROMPTS_CONFIG_PATH, 'r') as f:
-        prompts = json.load(f)
-    return prompts
+    return prompt_registry.get_prompts()
+
+def process_note(file_path: Path, text: str = None) -> bool:
+    """Process a single note, returning False if it was already processed"""
+    with tracing.span('notes_nextcloud.process_note') as span:
+        if text is None:
+            text = file_utils.get_note_text(file_path)
+        if span.recording:
+            span.set_attributes(file_utils.span_attributes(file_path, text))
+        processed = _process_text(file_path, text)
+        span.set_attribute('note.processed', processed)
+        return processed
 
-def process_note(file_path: Path):
-    text = file_utils.get_note_text(file_path)
+def _process_text(file_path: Path, text: str) -> bool:
     if file_utils.is_processed_note(text):
-        return
+        return False
     
-    # ... rest of processing logic ...
-    prompts = load_prompts_from_config()
-    processed = llm_client.query_llm(text, prompts['daily_notes_prompt'])
-    file_utils.write_processed_note(file_path, processed)
+    # Identical for every note, so the server can reuse the processed prefix
+    system_message = prompt_registry.get_prompt('daily_notes_prompt')
+    context_length = int(config.SCHEDULE_CONFIG.get('model_context_length', config.DEFAULT_MODEL_CONTEXT_LENGTH))
+    budget = chunker.prompt_budget(context_length, system_message, NOTE_REPLY_TOKENS)
 
-def main():
-    print(f"NOTES_NEXTCLOUD: Processing notes from directory: {config.NOTES_DIR}")
-    import logging
-    logging.basicConfig(level=logging.DEBUG)
-    logger = logging.getLogger('notes_nextcloud')
+    if chunker.estimate_tokens(text) > budget:
+        chunk_prompt = prompt_registry.get_prompt('chunk_notes_prompt', DEFAULT_CHUNK_NOTES_PROMPT)
+        chunk_budget = chunker.prompt_budget(context_length, chunk_prompt, NOTE_REPLY_TOKENS)
+        chunks = chunker.split_text(text, chunk_budget, config.CHUNK_OVERLAP_TOKENS)
+        tracing.current_span().set_attribute('note.chunks', len(chunks))
+        logger.info(f"{file_path.name} is ~{chunker.estimate_tokens(text)} tokens, "
+                    f"splitting into {len(chunks)} chunks of up to {chunk_budget}")
+        processed = process_chunks(chunks, chunk_prompt)
+        file_utils.write_processed_note(file_path, processed)
+    elif config.SCHEDULE_CONFIG.get('llm_streaming', False):
+        tracing.current_span().set_attribute('note.chunks', 1)
+        stream = llm_client.stream_llm(text, system_message, NOTE_REPLY_TOKENS)
+        file_utils.write_processed_note_stream(file_path, stream)
+    else:
+        tracing.current_span().set_attribute('note.chunks', 1)
+        processed = llm_client.query_llm(text, system_message, NOTE_REPLY_TOKENS)
+        file_utils.write_processed_note(file_path, processed)
+    return True
+
+def process_chunks(chunks, chunk_prompt: str) -> str:
+    """
+    Clean up the chunks of a long note in parallel, then merge the replies
+    into one note with each section once
+    """
+    # The shared LLM client caps requests in flight, so nesting this pool
+    # inside the per-note pool cannot exceed llm_concurrency
+    concurrency = max(1, int(config.SCHEDULE_CONFIG.get('llm_concurrency', config.DEFAULT_LLM_CONCURRENCY)))
+    with ThreadPoolExecutor(max_workers=min(len(chunks), concurrency)) as pool:
+        replies = list(pool.map(
+            tracing.wrap(lambda chunk: llm_client.query_llm(chunk, chunk_prompt, NOTE_REPLY_TOKENS)), chunks
+        ))
+    merged = merge_sections(replies)
+
+    # One more pass lets the model drop what the chunk overlap repeated and
+    # summarize the whole note, when the merged sections fit in its context
+    merge_prompt = prompt_registry.get_prompt('merge_notes_prompt', DEFAULT_MERGE_NOTES_PROMPT)
+    context_length = int(config.SCHEDULE_CONFIG.get('model_context_length', config.DEFAULT_MODEL_CONTEXT_LENGTH))
+    if chunker.estimate_tokens(merged) > chunker.prompt_budget(context_length, merge_prompt, NOTE_REPLY_TOKENS):
+        logger.info("Merged chunks don't fit the model context, keeping them merged by section")
+        return merged
+    reply = llm_client.query_llm(merged, merge_prompt, NOTE_REPLY_TOKENS)
+    counts = count_sections(reply)
+    if counts.get('SUMMARY') != 1 or any(counts.get(name) != 1 for name in NOTE_SECTIONS):
+        logger.warning("Merge pass didn't return each section once, keeping the chunks merged by section")
+        return merged
+    return reply
+
+def _section_header(line: str):
+    """The section a header line starts (SUMMARY or one of NOTE_SECTIONS), else None"""
+    title = line.strip().strip('#*_ ').rstrip(':').strip().upper()
+    if title.startswith('SUMMARY'):
+        return 'SUMMARY'
+    return title if title in NOTE_SECTIONS else None
+
+def count_sections(text: str) -> dict:
+    """How many times each section header appears in a processed note"""
+    counts = {}
+    for line in text.splitlines():
+        header = _section_header(line)
+        if header:
+            counts[header] = counts.get(header, 0) + 1
+    return counts
+
+def merge_sections(replies) -> str:
+    """
+    Gather the sections of several chunk replies under one header each, in
+    the daily note format. Text before a reply's first header counts as
+    notes; tasks and suggestions repeated by the chunk overlap are dropped.
+    """
+    sections = {name: [] for name in ('SUMMARY',) + NOTE_SECTIONS}
+    for reply in replies:
+        current = config.SUMMARY_MARKER
+        body = {name: [] for name in sections}
+        for line in reply.splitlines():
+            header = _section_header(line)
+            if header:
+                current = header
+            else:
+                body[current].append(line)
+        for name, lines in body.items():
+            part = '\n'.join(lines).strip()
+            if not part:
+                continue
+            if name in ('TASKS', 'SUGGESTIONS / NEXT STEPS'):
+                seen = set('\n'.join(sections[name]).splitlines())
+                part = '\n'.join(line for line in part.splitlines() if line not in seen or not line.strip())
+            sections[name].append(part)
+
+    now = time.strftime('%Y-%m-%d %H:%M')
+    parts = [f"SUMMARY ({now})" + ''.join(f"\n{part}" for part in sections['SUMMARY'])]
+    for name in NOTE_SECTIONS:
+        parts.append('\n'.join([name] + sections[name]))
+    return '\n\n'.join(parts) + '\n'
+
+def _timed_process_note(file_path: Path, text: str = None):
+    """Run process_note and return (processed, seconds taken)"""
+    started = time.monotonic()
+    processed = process_note(file_path, text)
+    return processed, time.monotonic() - started
+
+def _record_failure(index: NoteIndex, work_queue, file_path: Path, stat, error: Exception):
+    if isinstance(error, ImportError):
+        logger.error(f"Missing dependency for {file_path}: {error}")
+        print(f"Error: {error}")
+    else:
+        logger.error(f"Failed to process {file_path}: {error}")
+        print(f"Error processing {file_path}: {error}")
+    index.record(file_path, processed=False, stat=stat, content_hash='')
+    if work_queue is not None:
+        work_queue.mark_failed(file_path, str(error))
+
+def _log_run_stats(latencies, failed, elapsed):
+    """Report per-note latency and overall throughput for a run"""
+    if not latencies and not failed:
+        return
+    latencies = sorted(latencies)
+    count = len(latencies)
+    if count:
+        mean = sum(latencies) / count
+        median = latencies[count // 2]
+        logger.info(f"Note latency: mean {mean:.1f}s, median {median:.1f}s, max {latencies[-1]:.1f}s")
+    rate = count / elapsed * 60 if elapsed > 0 else 0.0
+    logger.info(f"Processed {count} notes ({failed} failed) in {elapsed:.1f}s, {rate:.1f} notes/min")
+
+# Supported file extensions
+SUPPORTED_EXTENSIONS = ['.md', '.txt', '.docx']
+
+def is_note_file(file_path: Path) -> bool:
+    """Whether a path looks like a note this module can process"""
+    return file_path.suffix.lower() in SUPPORTED_EXTENSIONS and not file_path.name.startswith('.')
+
+def _scan_notes_dir(index: NoteIndex):
+    """Return (all notes seen, {path: stat} of notes needing processing)"""
+    seen = []
+    pending = {}
+    notes_dir = config.NOTES_DIR
+    with os.scandir(notes_dir) as entries:
+        for entry in entries:
+            file_path = notes_dir / entry.name
+            if not is_note_file(file_path):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                processed = index.is_processed(file_path, stat)
+            except FileNotFoundError:
+                # Renamed or deleted (e.g. by a sync client) since the directory was listed
+                logger.debug(f"{file_path} disappeared during the scan")
+                continue
+            seen.append(file_path)
+            if not processed:
+                logger.debug(f"Checking file: {file_path}")
+                pending[file_path] = stat
+    return seen, pending
+
+def _check_paths(index: NoteIndex, paths):
+    """Like _scan_notes_dir, but only for the given paths"""
+    seen = []
+    pending = {}
+    for file_path in paths:
+        file_path = Path(file_path)
+        if not is_note_file(file_path):
+            continue
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        seen.append(file_path)
+        if not index.is_processed(file_path, stat):
+            logger.debug(f"Checking file: {file_path}")
+            pending[file_path] = stat
+    return seen, pending
+
+def _claim_jobs(work_queue, pending):
+    """Queue pending notes and return {path: stat} of the jobs due now, including earlier retries"""
+    for file_path, stat in pending.items():
+        work_queue.enqueue(file_path, stat)
+
+    due = {}
+    for file_path in work_queue.claim_due():
+        try:
+            due[file_path] = file_path.stat()
+        except FileNotFoundError:
+            logger.info(f"Dropping queued job for deleted note {file_path}")
+            work_queue.remove(file_path)
+    return due
+
+def run(paths=None, rebuild_index=False, work_queue=None):
+    """
+    Process new or changed notes in NOTES_DIR, or only those in paths if given.
+
+    With a WorkQueue, notes are processed as durable jobs: failures are
+    retried with backoff across runs instead of on every scan.
+    """
+    # The root span of a processing run's trace
+    with tracing.span('notes_nextcloud.run') as span:
+        if span.recording:
+            span.set_attributes({'notes.dir': str(config.NOTES_DIR), 'notes.rebuild_index': rebuild_index,
+                                 'notes.paths': -1 if paths is None else len(paths)})
+        _run(paths, rebuild_index, work_queue)
+
+def _run(paths, rebuild_index, work_queue):
+    span = tracing.current_span()
     logger.debug(f"Processing notes from directory: {config.NOTES_DIR}")
+    concurrency = max(1, int(config.SCHEDULE_CONFIG.get('llm_concurrency', config.DEFAULT_LLM_CONCURRENCY)))
     
-    # Supported file extensions
-    SUPPORTED_EXTENSIONS = ['.md', '.txt', '.docx']
-    
-    for fname in os.listdir(config.NOTES_DIR):
-        file_path = config.NOTES_DIR / fname
-        logger.debug(f"Checking file: {file_path}")
-        if file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+    with NoteIndex(config.NOTE_INDEX_PATH) as index:
+        if rebuild_index:
+            logger.info(f"Rebuilding note index at {config.NOTE_INDEX_PATH}")
+            index.clear()
+
+        if paths is None:
+            seen, pending = _scan_notes_dir(index)
+        else:
+            seen, pending = _check_paths(index, paths)
+
+        logger.info(f"Checked {len(seen)} notes, {len(seen) - len(pending)} unchanged since last run")
+        metrics.FILES_SCANNED.inc(len(seen))
+        metrics.FILES_SKIPPED.inc(len(seen) - len(pending), reason='unchanged')
+        span.set_attribute('notes.scanned', len(seen))
+        if work_queue is not None:
+            pending = _claim_jobs(work_queue, pending)
+        span.set_attribute('notes.pending', len(pending))
+        if pending:
+            logger.info(f"Processing {len(pending)} notes with up to {concurrency} concurrent LLM requests")
+
+        latencies = []
+        failed = 0
+        run_started = time.monotonic()
+
+        def finish(future, file_path):
+            nonlocal failed
             try:
-                logger.info(f"Processing file: {file_path}")
-                process_note(file_path)
-            except ImportError as e:
-                logger.error(f"Missing dependency for {file_path}: {e}")
-                print(f"Error: {e}")
+                processed, seconds = future.result()
+                if processed:
+                    latencies.append(seconds)
+                    metrics.FILES_PROCESSED.inc()
+                    logger.info(f"Processed {file_path.name} in {seconds:.1f}s")
+                else:
+                    metrics.FILES_SKIPPED.inc(reason='already_processed')
+                index.record(file_path, processed=True)
+                if work_queue is not None:
+                    work_queue.mark_done(file_path)
             except Exception as e:
-                logger.error(f"Failed to process {file_path}: {e}")
-                print(f"Error processing {file_path}: {e}")
+                failed += 1
+                metrics.FILES_FAILED.inc(stage='processing')
+                _record_failure(index, work_queue, file_path, pending[file_path], e)
+            index.commit()
+
+        # Notes are converted to text in worker processes while earlier ones are with
+        # the LLM; index updates stay on this thread. At most `concurrency` notes are
+        # with the LLM and a few more converted ahead, so a big backlog isn't held in memory.
+        # Rewritten notes are fsynced together once the run is over
+        with atomic_files.fsync_batch(), conversion.ConversionPool() as converter, \
+                ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = {}
+            converted = conversion.convert_in_background(
+                pending, converter, max_pending=max(converter.max_workers, concurrency) * 2
+            )
+            for file_path, converting in converted:
+                try:
+                    text = converting.result()
+                except Exception as e:
+                    failed += 1
+                    metrics.FILES_FAILED.inc(stage='conversion')
+                    _record_failure(index, work_queue, file_path, pending[file_path], e)
+                    index.commit()
+                    continue
+
+                while len(in_flight) >= concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future, in_flight.pop(future))
+                logger.info(f"Processing file: {file_path}")
+                in_flight[pool.submit(tracing.wrap(_timed_process_note), file_path, text)] = file_path
+
+            for future in as_completed(in_flight):
+                finish(future, in_flight[future])
+
+        if paths is None:
+            index.prune(config.NOTES_DIR, seen)
+
+    span.set_attributes({'notes.processed': len(latencies), 'notes.failed': failed})
+    _log_run_stats(latencies, failed, time.monotonic() - run_started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Process raw notes with the LLM')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Discard the processed-note index and re-check every file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always query the LLM instead of reusing cached replies')
+    parser.add_argument('--llm-url', metavar='URL',
+                        help='Send requests to this chat completions endpoint instead (e.g. a mock server); '
+                             'disables the reply cache')
+    parser.add_argument('--trace', action='store_true',
+                        help=f'Record tracing spans for this run in {config.TRACE_PATH}')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Profile the run, writing pstats and collapsed stacks to {config.STATE_DIR}')
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracing.enable()
+    if args.no_cache:
+        llm_client.disable_cache()
+    if args.llm_url:
+        print(f"Using LLM server at {llm_client.use_server(args.llm_url)}")
+
+    print(f"NOTES_NEXTCLOUD: Processing notes from directory: {config.NOTES_DIR}")
+    logging.basicConfig(level=logging.DEBUG)
+    with profiling.profiled('process-notes', enabled=args.profile):
+        run(rebuild_index=args.rebuild_index)
+    tracing.flush()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
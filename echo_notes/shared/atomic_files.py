@@ -0,0 +1,120 @@
+"""
+Atomic file replacement for notes.
+
+Notes are written to a temporary file in the same directory and moved over
+the original with os.replace, so neither a crash nor a sync client (which
+would upload every intermediate state) ever sees a half-written note.
+
+fsync is optional (the fsync_notes setting). Inside fsync_batch(), the
+fsyncs are deferred and done once per file and directory when the batch
+ends, which keeps a run over many notes from stalling on each write.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_batch = None
+_batch_lock = threading.Lock()
+
+
+def _fsync_path(path, directory=False):
+    flags = os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError as e:
+        # Directories can't be opened on Windows; the file is gone if it was replaced again
+        logger.debug(f"Can't open {path} to fsync: {e}")
+        return
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        logger.warning(f"fsync of {path} failed: {e}")
+    finally:
+        os.close(fd)
+
+
+def _umask() -> int:
+    """The process umask, read from /proc where possible since setting it affects every thread"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+@contextmanager
+def fsync_batch():
+    """Defer the fsyncs of atomic writes made inside the block (from any thread) to its end"""
+    global _batch
+    with _batch_lock:
+        outer = _batch is not None
+        if not outer:
+            _batch = set()
+    if outer:
+        # Nested: the outermost batch syncs everything
+        yield
+        return
+    try:
+        yield
+    finally:
+        with _batch_lock:
+            paths, _batch = _batch, None
+        directories = set()
+        for path in paths:
+            _fsync_path(path)
+            directories.add(path.parent)
+        for directory in directories:
+            _fsync_path(directory, directory=True)
+        if paths:
+            logger.debug(f"Synced {len(paths)} files in {len(directories)} directories")
+
+
+@contextmanager
+def atomic_write(file_path: Path, mode: str = 'w', encoding: str = 'utf-8', fsync: bool = None):
+    """
+    Open a temporary file that replaces file_path when the block exits cleanly.
+
+    If the block raises, the temporary file is removed and file_path is left
+    untouched. The original's permissions are kept; a new file gets the usual
+    mode for the umask. fsync defaults to the fsync_notes setting.
+    """
+    file_path = Path(file_path)
+    if fsync is None:
+        fsync = bool(config.SCHEDULE_CONFIG.get('fsync_notes', config.DEFAULT_FSYNC_NOTES))
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{file_path.name}.", suffix='.tmp', dir=file_path.parent)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            f.flush()
+            with _batch_lock:
+                deferred = fsync and _batch is not None
+                if deferred:
+                    _batch.add(file_path)
+            if fsync and not deferred:
+                os.fsync(f.fileno())
+        if file_path.exists():
+            shutil.copymode(file_path, tmp_name)
+        else:
+            # mkstemp creates the file 0600; give a new note the mode open() would
+            os.chmod(tmp_name, 0o666 & ~_umask())
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    if fsync and not deferred:
+        _fsync_path(file_path.parent, directory=True)
@@ -0,0 +1,118 @@
+"""
+Token-budget-aware splitting of long notes.
+
+Token counts are estimated offline with a character/word heuristic that
+errs on the high side for typical English transcripts, so no tokenizer
+download is needed. Text is split on headings and paragraph breaks first,
+then on lines and sentences, and only as a last resort mid-sentence.
+"""
+
+import re
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 4 / 3
+# Headroom for chat template tokens and estimate error
+PROMPT_MARGIN_TOKENS = 256
+
+_HEADING_RE = re.compile(r'^(#{1,6}\s|[A-Z][A-Z &/\-]{2,}$)')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without a tokenizer"""
+    if not text:
+        return 0
+    by_chars = len(text) / CHARS_PER_TOKEN
+    by_words = len(text.split()) * TOKENS_PER_WORD
+    return int(max(by_chars, by_words)) + 1
+
+
+def prompt_budget(context_length: int, system_message: str, max_tokens: int) -> int:
+    """Tokens left for the user prompt once the system prompt and reply are reserved"""
+    budget = context_length - max_tokens - estimate_tokens(system_message) - PROMPT_MARGIN_TOKENS
+    return max(budget, 1)
+
+
+def _blocks(text: str):
+    """Split text into paragraphs, starting a new block at every heading"""
+    blocks = []
+    current = []
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        if current and _HEADING_RE.match(line.strip()):
+            blocks.append('\n'.join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+def _split_oversized(block: str, max_tokens: int):
+    """Break a single block that exceeds the budget into smaller pieces"""
+    pieces = []
+    for line in block.splitlines():
+        pieces.extend(_SENTENCE_RE.split(line))
+
+    out = []
+    for piece in pieces:
+        while estimate_tokens(piece) > max_tokens and len(piece) > 1:
+            limit = max(1, (max_tokens - 1) * CHARS_PER_TOKEN)
+            while limit > 1 and estimate_tokens(piece[:limit]) > max_tokens:
+                limit = int(limit * 0.9)
+            # Prefer cutting at whitespace; give up and cut hard if there is none
+            cut = piece.rfind(' ', 0, limit)
+            cut = cut if cut > 0 else limit
+            out.append(piece[:cut])
+            piece = piece[cut:].lstrip()
+        if piece:
+            out.append(piece)
+    return out
+
+
+def split_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """
+    Split text into chunks of at most max_tokens estimated tokens.
+
+    Consecutive chunks share up to overlap_tokens of trailing context from
+    the previous chunk so that the LLM sees where each piece picks up.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    units = []
+    for block in _blocks(text):
+        if estimate_tokens(block) > max_tokens:
+            units.extend(_split_oversized(block, max_tokens))
+        else:
+            units.append(block)
+
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit)
+        if current and size + unit_tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            # Carry trailing units forward as overlap, newest last
+            carried = []
+            carried_size = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if carried_size + previous_tokens > overlap_tokens or \
+                        carried_size + previous_tokens + unit_tokens > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous_tokens
+            current = carried
+            size = carried_size
+        current.append(unit)
+        size += unit_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
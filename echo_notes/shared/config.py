@@ -1,6 +1,23 @@
+"""
+Echo-Notes settings.
+
+Importing this module does no I/O. schedule_config.json is read the first
+time a setting is needed and re-read only when the file changes, so
+config.SCHEDULE_CONFIG and config.NOTES_DIR are always current and cheap
+to access repeatedly.
+"""
+
+import json
+import logging
 import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
 
 # Core Configuration
 # Default paths that can be overridden by environment variables
@@ -8,14 +25,34 @@ DEFAULT_NOTES_DIR = Path.home() / 'Documents' / 'notes' / 'log'
 DEFAULT_APP_DIR = Path(__file__).parent.parent  # Echo-Notes directory
 
 # Use environment variables if set, otherwise use defaults
-NOTES_DIR = Path(os.environ.get('ECHO_NOTES_DIR', DEFAULT_NOTES_DIR))
+# (NOTES_DIR itself is resolved lazily, see __getattr__ below)
 APP_DIR = Path(os.environ.get('ECHO_APP_DIR', DEFAULT_APP_DIR))
 
+# Local state (logs, PID file, processing index) lives next to the notes folder
+# rather than inside it, so sync clients never pick it up
+DEFAULT_STATE_DIR = Path.home() / 'Documents' / 'notes'
+STATE_DIR = Path(os.environ.get('ECHO_STATE_DIR', DEFAULT_STATE_DIR))
+NOTE_INDEX_PATH = STATE_DIR / 'echo-notes-index.sqlite'
+LLM_CACHE_PATH = STATE_DIR / 'llm-cache.sqlite'
+WORK_QUEUE_PATH = STATE_DIR / 'echo-notes-queue.sqlite'
+METRICS_JSON_PATH = STATE_DIR / 'echo-notes-metrics.json'
+TRACE_PATH = STATE_DIR / 'echo-notes-traces.jsonl'
+MEMORY_LOG_PATH = STATE_DIR / 'echo-notes-memory.log'
+CONTROL_SOCKET_PATH = STATE_DIR / 'echo-notes.sock'
+
 # Other configuration
 LM_URL = 'http://localhost:8080/v1/chat/completions'
 SUMMARY_MARKER = 'CLEANED & STRUCTURED NOTES'
 LLM_MODEL = "qwen2.5-7b-instruct-1m"
 
+# LLM HTTP client settings
+LLM_POOL_SIZE = 4  # Keep-alive connections kept open to the LLM server
+LLM_MAX_RETRIES = 3  # Retries on connection errors and 429/503 responses
+LLM_RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled on each further retry
+LLM_CONNECT_TIMEOUT = 5  # Seconds to establish a connection
+LLM_READ_TIMEOUT = 120  # Seconds to wait for the completion
+DEFAULT_LLM_CACHE_MAX_MB = 64  # Size limit of the on-disk LLM response cache
+
 # Path to the prompts configuration file
 # This uses the APP_DIR to locate prompts_config.json
 PROMPTS_CONFIG_PATH = Path(__file__).parent / 'prompts_config.json'
@@ -26,25 +63,23 @@ DEFAULT_PROCESSING_INTERVAL = 60  # Process notes every 60 minutes (hourly)
 DEFAULT_SUMMARY_INTERVAL = 10080  # Generate summary every 10080 minutes (weekly)
 DEFAULT_SUMMARY_DAY = 6  # Sunday (0 = Monday, 6 = Sunday)
 DEFAULT_SUMMARY_HOUR = 12  # 12:00 PM
+DEFAULT_LLM_CONCURRENCY = 1  # Notes sent to the LLM server in parallel (match the server's slot count)
+DEFAULT_MODEL_CONTEXT_LENGTH = 8192  # Tokens; longer notes are split into overlapping chunks
+CHUNK_OVERLAP_TOKENS = 200  # Context repeated between consecutive chunks of a long note
+DEFAULT_WATCH_SETTLE_SECONDS = 5  # A changed note must be quiet this long before it is processed
+DEFAULT_JOB_MAX_ATTEMPTS = 5  # Failed notes are set aside after this many attempts
+DEFAULT_JOB_RETRY_BACKOFF = 60  # Seconds before a failed note is retried, doubled on each further failure
+DEFAULT_DOCX_WRITER = 'template'  # 'template' (streaming, keeps the note's styles) or 'python-docx'
+DEFAULT_CONVERSION_WORKERS = 0  # Processes converting .docx notes; 0 = one per available core
+DEFAULT_METRICS_PORT = 0  # Localhost port for the daemon's /metrics endpoint; 0 = off
+DEFAULT_METRICS_INTERVAL = 15  # Seconds between rewrites of the metrics JSON file; 0 = off
+DEFAULT_DASHBOARD_LOG_LINES = 5000  # Lines kept in the dashboard's log view
+DEFAULT_TRACE_SAMPLE_RATE = 1.0  # Fraction of traces (processing runs) recorded when tracing is on
+DEFAULT_FSYNC_NOTES = True  # fsync rewritten notes (batched once per processing run)
 
 # Path to the scheduling configuration file
 SCHEDULE_CONFIG_PATH = Path(__file__).parent / 'schedule_config.json'
-
-# Load scheduling configuration from file if it exists, otherwise use defaults
-def load_schedule_config():
-    if SCHEDULE_CONFIG_PATH.exists():
-        try:
-            import json
-            with open(SCHEDULE_CONFIG_PATH, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading schedule config: {e}")
-            return get_default_schedule_config()
-    else:
-        # Create default config file if it doesn't exist
-        config = get_default_schedule_config()
-        save_schedule_config(config)
-        return config
+CONFIG_CHECK_INTERVAL = 1.0  # Seconds between checks of schedule_config.json for changes
 
 def get_default_schedule_config():
     return {
@@ -53,25 +88,230 @@ def get_default_schedule_config():
         "summary_day": DEFAULT_SUMMARY_DAY,
         "summary_hour": DEFAULT_SUMMARY_HOUR,
         "daemon_enabled": True,
-        "notes_directory": str(NOTES_DIR)
+        "llm_concurrency": DEFAULT_LLM_CONCURRENCY,
+        "llm_streaming": False,
+        "model_context_length": DEFAULT_MODEL_CONTEXT_LENGTH,
+        "llm_cache_enabled": True,
+        "llm_cache_max_mb": DEFAULT_LLM_CACHE_MAX_MB,
+        "llama_cpp_prompt_cache": False,
+        "watch_notes": False,
+        "watch_settle_seconds": DEFAULT_WATCH_SETTLE_SECONDS,
+        "job_max_attempts": DEFAULT_JOB_MAX_ATTEMPTS,
+        "job_retry_backoff": DEFAULT_JOB_RETRY_BACKOFF,
+        "docx_writer": DEFAULT_DOCX_WRITER,
+        "conversion_workers": DEFAULT_CONVERSION_WORKERS,
+        "fsync_notes": DEFAULT_FSYNC_NOTES,
+        "metrics_port": DEFAULT_METRICS_PORT,
+        "metrics_interval": DEFAULT_METRICS_INTERVAL,
+        "tracing_enabled": False,
+        "trace_sample_rate": DEFAULT_TRACE_SAMPLE_RATE,
+        "dashboard_log_lines": DEFAULT_DASHBOARD_LOG_LINES,
+        "notes_directory": str(Path(os.environ.get('ECHO_NOTES_DIR', DEFAULT_NOTES_DIR)))
     }
 
+def _coerce(key, value, default):
+    """Convert a value from the JSON file to the type of its default"""
+    if default is None or value is None:
+        return value
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                if value.strip().lower() in ('true', 'yes', 'on', '1'):
+                    return True
+                if value.strip().lower() in ('false', 'no', 'off', '0'):
+                    return False
+                raise ValueError(value)
+            return bool(value)
+        if isinstance(default, (int, float)):
+            if isinstance(value, bool):
+                raise ValueError(value)
+            if isinstance(value, (int, float)):
+                return value
+            number = float(value)
+            return int(number) if isinstance(default, int) and number.is_integer() else number
+        if isinstance(default, str):
+            return str(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid {key} {value!r} in schedule config, using {default!r}")
+        return default
+    return value
+
+class ScheduleConfig:
+    """
+    Settings from schedule_config.json, merged over the defaults.
+
+    The file is loaded on first access and reloaded when its mtime, size or
+    inode changes (checked at most every CONFIG_CHECK_INTERVAL seconds).
+    Subscribers are called with the set of keys whose values changed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._file_values = None
+        self._overrides = {}
+        self._values = None
+        self._view = None
+        self._notes_dir = None
+        self._stat_key = None
+        self._checked_at = 0.0
+        self._subscribers = []
+
+    def _read(self):
+        """Parse the file; returns None if it can't be used"""
+        try:
+            with open(self.path, 'r') as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading schedule config: {e}")
+            return None
+        if not isinstance(raw, dict):
+            logger.error(f"Error loading schedule config: expected a JSON object in {self.path}")
+            return None
+        defaults = get_default_schedule_config()
+        return {key: _coerce(key, value, defaults.get(key)) for key, value in raw.items()}
+
+    def _apply(self):
+        """Recompute the effective values; returns the keys that changed"""
+        old = self._values
+        values = get_default_schedule_config()
+        values.update(self._file_values)
+        values.update(self._overrides)
+
+        notes_dir = None
+        configured = values.get('notes_directory')
+        if configured:
+            configured = Path(configured).expanduser()
+            if configured.exists() or configured.parent.exists():
+                notes_dir = configured
+        self._notes_dir = notes_dir or Path(os.environ.get('ECHO_NOTES_DIR', DEFAULT_NOTES_DIR))
+
+        self._values = values
+        self._view = MappingProxyType(values)
+        if old is None:
+            return set()
+        return {key for key in old.keys() | values.keys() if old.get(key) != values.get(key)}
+
+    def refresh(self, force=False) -> set:
+        """Reload the file if it changed (or always if force); returns the keys that changed"""
+        with self._lock:
+            now = time.monotonic()
+            if self._values is not None and not force and now - self._checked_at < CONFIG_CHECK_INTERVAL:
+                return set()
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+                stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except FileNotFoundError:
+                stat_key = None
+            if self._values is not None and not force and stat_key == self._stat_key:
+                return set()
+            self._stat_key = stat_key
+
+            file_values = self._read()
+            if file_values is None:
+                if self._values is not None:
+                    return set()  # Keep the last good settings
+                file_values = {}
+            self._file_values = file_values
+            changed = self._apply()
+        self._notify(changed)
+        return changed
+
+    def _notify(self, changed):
+        if not changed:
+            return
+        logger.info(f"Schedule config changed: {', '.join(sorted(changed))}")
+        for callback in list(self._subscribers):
+            try:
+                callback(changed)
+            except Exception as e:
+                logger.error(f"Error in config change callback {callback}: {e}")
+
+    @property
+    def values(self):
+        """Read-only mapping of the current settings"""
+        self.refresh()
+        return self._view
+
+    @property
+    def notes_dir(self) -> Path:
+        self.refresh()
+        return self._notes_dir
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def subscribe(self, callback):
+        """Call callback(changed_keys) whenever settings change"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def override(self, **values):
+        """Set values for this process only, on top of the file (e.g. from command line flags)"""
+        with self._lock:
+            if self._values is None:
+                self.refresh()
+            self._overrides.update(values)
+            changed = self._apply()
+        self._notify(changed)
+
+    def save(self, values):
+        """Write settings to the file atomically and reload them"""
+        values = {key: value for key, value in dict(values).items()
+                  if key not in self._overrides or value != self._overrides[key]}
+        fd, tmp_name = tempfile.mkstemp(prefix='.schedule_config.', suffix='.tmp', dir=self.path.parent)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(values, f, indent=2)
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        self.refresh(force=True)
+
+    def update(self, **changes):
+        """Change some settings and save them"""
+        with self._lock:
+            self.refresh()
+            values = dict(self._file_values)
+        values.update(changes)
+        self.save(values)
+
+# The process-wide settings, loaded on first use
+schedule = ScheduleConfig(SCHEDULE_CONFIG_PATH)
+
+def load_schedule_config():
+    """Current schedule settings as a plain dict"""
+    return dict(schedule.values)
+
 def save_schedule_config(config):
-    import json
-    with open(SCHEDULE_CONFIG_PATH, 'w') as f:
-        json.dump(config, f, indent=2)
+    schedule.save(config)
+
+def update_schedule_config(**changes):
+    schedule.update(**changes)
+
+def subscribe(callback):
+    """Call callback(changed_keys) whenever the schedule config changes"""
+    schedule.subscribe(callback)
 
-# Load schedule config
-SCHEDULE_CONFIG = load_schedule_config()
+def unsubscribe(callback):
+    schedule.unsubscribe(callback)
 
-# Update NOTES_DIR from config if it exists
-if "notes_directory" in SCHEDULE_CONFIG:
-    notes_dir_from_config = Path(SCHEDULE_CONFIG["notes_directory"])
-    if notes_dir_from_config.exists() or notes_dir_from_config.parent.exists():
-        NOTES_DIR = notes_dir_from_config
-        # Also update environment variable for consistency
-        os.environ['ECHO_NOTES_DIR'] = str(NOTES_DIR)
+def __getattr__(name):
+    # Resolved on access so that importing config never touches the disk
+    if name == 'SCHEDULE_CONFIG':
+        return schedule.values
+    if name == 'NOTES_DIR':
+        return schedule.notes_dir
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Derived Values
 def weekly_summary_filename():
-    return f"Weekly Summary - {datetime.now().strftime('%Y-%m-%d')}.md"
\ No newline at end of file
+    return f"Weekly Summary - {datetime.now().strftime('%Y-%m-%d')}.md"
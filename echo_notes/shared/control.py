@@ -0,0 +1,138 @@
+"""
+Local control channel for the daemon.
+
+The daemon listens on a Unix domain socket in the state directory. A
+client connects, sends one JSON object terminated by a newline, e.g.
+{"command": "status"}, and reads one JSON reply line back before the
+connection is closed. Replies always carry "ok"; failures add "error".
+"""
+
+import json
+import logging
+import os
+import select
+import socket
+import threading
+from pathlib import Path
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 1.0
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def is_supported() -> bool:
+    """Unix domain sockets are unavailable on some platforms (older Windows builds)"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def send_command(command: str, socket_path: Path = None, timeout=DEFAULT_TIMEOUT, **params) -> dict:
+    """
+    Send a command to the running daemon and return its reply.
+
+    Raises OSError (e.g. FileNotFoundError, ConnectionRefusedError) if no
+    daemon is listening.
+    """
+    if not is_supported():
+        raise OSError("Unix domain sockets are not supported on this platform")
+    request = dict(params, command=command)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path or config.CONTROL_SOCKET_PATH))
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            line = reader.readline(MAX_REQUEST_BYTES)
+    if not line:
+        raise ConnectionError("Daemon closed the control connection without replying")
+    return json.loads(line)
+
+
+class ControlServer:
+    """Answer control requests on a Unix socket from a background thread"""
+
+    def __init__(self, handlers: dict, socket_path: Path = None):
+        # handlers maps a command name to a callable taking the request dict and returning a reply dict
+        self.handlers = handlers
+        self.socket_path = Path(socket_path or config.CONTROL_SOCKET_PATH)
+        self._sock = None
+        self._thread = None
+        self._stop_r = self._stop_w = None
+
+    def start(self):
+        """Bind the socket and start serving; raises RuntimeError if another daemon owns it"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            try:
+                send_command('ping', self.socket_path, timeout=0.5)
+            except OSError:
+                # Left behind by a daemon that did not shut down cleanly
+                self.socket_path.unlink()
+            else:
+                raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)  # Only the current user may connect
+        try:
+            self._sock.bind(str(self.socket_path))
+        finally:
+            os.umask(old_umask)
+        self._sock.listen(8)
+        self._stop_r, self._stop_w = os.pipe()
+
+        self._thread = threading.Thread(target=self._serve, name='control-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Listening for control commands on {self.socket_path}")
+
+    def stop(self):
+        """Stop serving and remove the socket file"""
+        if self._thread is None:
+            return
+        os.write(self._stop_w, b'x')
+        self._thread.join(timeout=5)
+        self._sock.close()
+        os.close(self._stop_r)
+        os.close(self._stop_w)
+        self._thread = None
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _serve(self):
+        while True:
+            readable, _, _ = select.select([self._sock, self._stop_r], [], [])
+            if self._stop_r in readable:
+                return
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                continue
+            with conn:
+                # A client that stalls must not hold up the next one for long
+                conn.settimeout(DEFAULT_TIMEOUT)
+                try:
+                    self._handle(conn)
+                except OSError as e:
+                    logger.debug(f"Control connection failed: {e}")
+
+    def _handle(self, conn):
+        with conn.makefile('rb') as reader:
+            line = reader.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            command = request.get('command')
+            handler = self.handlers.get(command)
+            if command == 'ping':
+                reply = {'ok': True}
+            elif handler is None:
+                reply = {'ok': False, 'error': f"Unknown command: {command}"}
+            else:
+                reply = dict(handler(request), ok=True)
+        except (ValueError, AttributeError) as e:
+            reply = {'ok': False, 'error': f"Malformed request: {e}"}
+        except Exception as e:
+            logger.error(f"Control command failed: {e}")
+            reply = {'ok': False, 'error': str(e)}
+        conn.sendall(json.dumps(reply, default=str).encode('utf-8') + b'\n')
@@ -0,0 +1,149 @@
+"""
+Conversion stage: turn note files into text off the LLM dispatch thread.
+
+Parsing Word files is CPU-bound and holds the GIL, so doing it on the
+threads that talk to the LLM server serializes the two. ConversionPool
+runs heavy formats in a process pool sized to the available cores (plain
+text is still read inline, a process hop would cost more than the read),
+and convert_in_background feeds a run's notes through it with a bounded
+number of converted-but-not-yet-sent texts held in memory.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from . import config, file_utils, metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# Formats worth shipping to a worker process
+HEAVY_EXTENSIONS = {'.docx'}
+
+
+def available_cores() -> int:
+    """CPUs this process may run on (respects affinity masks and cgroups cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def configured_workers() -> int:
+    """The conversion_workers setting; 0 means one worker per available core"""
+    workers = int(config.SCHEDULE_CONFIG.get('conversion_workers', config.DEFAULT_CONVERSION_WORKERS))
+    return workers if workers > 0 else available_cores()
+
+
+def _convert(file_path: str):
+    # Runs in the worker process, whose metrics are not collected; the
+    # time taken is handed back and recorded in the parent
+    started = time.perf_counter()
+    text = file_utils.get_note_text(Path(file_path))
+    return text, time.perf_counter() - started
+
+
+def _unwrap_converted(source: Future, target: Future, suffix: str):
+    try:
+        text, seconds = source.result()
+    except BaseException as e:
+        target.set_exception(e)
+        return
+    metrics.CONVERSION_SECONDS.observe(seconds, format=suffix)
+    target.set_result(text)
+
+
+class ConversionPool:
+    """
+    Convert notes to text, in worker processes for heavy formats.
+
+    With a single worker everything is converted inline and no processes
+    are started. The process pool itself is only created once the first
+    heavy note is submitted.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or configured_workers()
+        self._executor = None
+
+    def submit(self, file_path: Path) -> Future:
+        """Start converting a note; the future's result is its text"""
+        file_path = Path(file_path)
+        if self.max_workers > 1 and file_path.suffix.lower() in HEAVY_EXTENSIONS:
+            if self._executor is None:
+                # spawn: the daemon has threads running, which fork does not mix well with
+                # Workers don't trace; their spans would have no parent in this run
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=tracing.disable
+                )
+                logger.debug(f"Started {self.max_workers} conversion worker processes")
+            try:
+                converting = self._executor.submit(_convert, str(file_path))
+            except BrokenProcessPool as e:
+                # A worker died (or could not start); carry on without processes
+                logger.warning(f"Conversion workers failed ({e}), converting inline from now on")
+                self.shutdown()
+                self.max_workers = 1
+            else:
+                future = Future()
+                converting.add_done_callback(
+                    lambda done: _unwrap_converted(done, future, file_path.suffix.lower())
+                )
+                return future
+
+        future = Future()
+        try:
+            future.set_result(file_utils.get_note_text(file_path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def convert(self, file_path: Path) -> str:
+        return self.submit(file_path).result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+
+def convert_in_background(paths, pool: ConversionPool, max_pending: int):
+    """
+    Yield (path, future) for each path as its conversion finishes.
+
+    Besides the note last handed out, at most max_pending notes are being
+    converted or waiting to be consumed, so a slow consumer (the LLM stage)
+    holds conversion back instead of letting converted text pile up.
+    """
+    paths = iter(paths)
+    finished = queue.Queue()
+    outstanding = 0
+
+    def fill():
+        nonlocal outstanding
+        while outstanding < max_pending:
+            file_path = next(paths, None)
+            if file_path is None:
+                return
+            future = pool.submit(file_path)
+            future.add_done_callback(lambda done, file_path=file_path: finished.put((file_path, done)))
+            outstanding += 1
+
+    fill()
+    while outstanding:
+        file_path, future = finished.get()
+        outstanding -= 1
+        fill()
+        yield file_path, future
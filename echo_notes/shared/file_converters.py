@@ -6,17 +6,135 @@ that can be processed by the LLM.
 
 from pathlib import Path
 import os
+import re
+import logging
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from . import config
+from .atomic_files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# WordprocessingML namespaces (transitional and strict)
+WORD_NAMESPACES = (
+    'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'http://purl.oclc.org/ooxml/wordprocessingml/main',
+)
+_P_TAGS = {f'{{{ns}}}p' for ns in WORD_NAMESPACES}
+_T_TAGS = {f'{{{ns}}}t' for ns in WORD_NAMESPACES}
+_TAB_TAGS = {f'{{{ns}}}tab' for ns in WORD_NAMESPACES}
+_BREAK_TAGS = {f'{{{ns}}}{name}' for ns in WORD_NAMESPACES for name in ('br', 'cr')}
+_BODY_TAGS = {f'{{{ns}}}body' for ns in WORD_NAMESPACES}
+
+# The fixed parts of the package written by write_docx_template; only
+# word/document.xml (and optionally word/styles.xml) varies per note
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_DOCX_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_DOCX_DEFAULT_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:styles xmlns:w="{WORD_NAMESPACES[0]}">'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:sz w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="160" w:line="259" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    '</w:styles>'
+)
+_DOCX_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:document xmlns:w="{WORD_NAMESPACES[0]}"><w:body>'
+)
+_DOCX_DOCUMENT_END = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+# Characters XML 1.0 does not allow; LLM output occasionally contains them
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
 
 def txt_to_text(file_path: Path) -> str:
     """Convert a .txt file to text"""
     with open(file_path, 'r', encoding='utf-8') as f:
         return f.read()
 
-def docx_to_text(file_path: Path) -> str:
+def text_to_file(file_path: Path, content: str) -> None:
+    """Write text content to a plain-text file, replacing it atomically"""
+    with atomic_write(file_path) as f:
+        f.write(content)
+
+def iter_docx_paragraphs(file_path: Path):
     """
-    Convert a .docx file to text.
-    Requires python-docx package.
+    Yield the text of each paragraph of a .docx file in document order,
+    including paragraphs in tables and text boxes.
+
+    word/document.xml is parsed incrementally straight from the zip, so
+    memory stays flat on long documents and python-docx is not needed.
+    Raises zipfile.BadZipFile, KeyError or ET.ParseError on documents it
+    can't read.
     """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open('word/document.xml') as xml:
+            # One text buffer per open paragraph; text boxes nest paragraphs inside runs
+            paragraphs = []
+            body = None
+            depth = 0
+            body_depth = None
+            for event, elem in ET.iterparse(xml, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    depth += 1
+                    if tag in _P_TAGS:
+                        paragraphs.append([])
+                    elif tag in _BODY_TAGS:
+                        body = elem
+                        body_depth = depth
+                    continue
+
+                depth -= 1
+                if tag in _T_TAGS:
+                    if paragraphs and elem.text:
+                        paragraphs[-1].append(elem.text)
+                elif tag in _TAB_TAGS:
+                    if paragraphs:
+                        paragraphs[-1].append('\t')
+                elif tag in _BREAK_TAGS:
+                    if paragraphs:
+                        paragraphs[-1].append('\n')
+                elif tag in _P_TAGS:
+                    yield ''.join(paragraphs.pop())
+
+                if body is not None and depth == body_depth:
+                    # A top-level paragraph or table is done; drop it to keep memory flat
+                    body.clear()
+
+def _docx_to_text_python_docx(file_path: Path) -> str:
+    """Convert a .docx file to text with python-docx"""
     try:
         import docx
     except ImportError:
@@ -40,6 +158,18 @@ def docx_to_text(file_path: Path) -> str:
     
     return '\n'.join(full_text)
 
+def docx_to_text(file_path: Path) -> str:
+    """
+    Convert a .docx file to text.
+    Uses the streaming reader and falls back to python-docx for documents
+    it can't handle.
+    """
+    try:
+        return '\n'.join(iter_docx_paragraphs(file_path))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        logger.debug(f"Streaming .docx reader failed on {file_path} ({e}), using python-docx")
+        return _docx_to_text_python_docx(file_path)
+
 def text_to_docx(file_path: Path, content: str) -> None:
     """
     Write text content to a .docx file.
@@ -61,7 +191,59 @@ def text_to_docx(file_path: Path, content: str) -> None:
         doc.add_paragraph(paragraph)
     
     # Save the document
-    doc.save(file_path)
+    with atomic_write(file_path, 'wb') as f:
+        doc.save(f)
+
+def _docx_paragraph_xml(line: str) -> str:
+    line = _XML_INVALID_RE.sub('', line.rstrip('\r'))
+    if not line:
+        return '<w:p/>'
+    runs = '<w:tab/>'.join(
+        f'<w:t xml:space="preserve">{escape(part)}</w:t>' if part else ''
+        for part in line.split('\t')
+    )
+    return f'<w:p><w:r>{runs}</w:r></w:p>'
+
+def _read_docx_styles(file_path: Path):
+    """Return the styles part of an existing .docx, or None if it has no usable one"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            styles = archive.read('word/styles.xml')
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+    # Our document.xml uses the transitional namespace; strict styles wouldn't apply
+    if WORD_NAMESPACES[0].encode('ascii') not in styles[:4096]:
+        return None
+    return styles
+
+def write_docx_template(file_path: Path, content: str, styles_from: Path = None, fsync: bool = None) -> None:
+    """
+    Write text content to a .docx file, one paragraph per line, without python-docx.
+
+    A minimal package is filled in with a document.xml generated in a single
+    streaming pass. The styles part is taken from styles_from, or from the
+    file being overwritten, so a processed note keeps its original look.
+    The note is replaced atomically; fsync defaults to the fsync_notes setting.
+    """
+    source = styles_from if styles_from is not None else file_path
+    styles = _read_docx_styles(source) if os.path.exists(source) else None
+
+    with atomic_write(file_path, 'wb', fsync=fsync) as f:
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+            archive.writestr('_rels/.rels', _DOCX_PACKAGE_RELS)
+            archive.writestr('word/_rels/document.xml.rels', _DOCX_DOCUMENT_RELS)
+            archive.writestr('word/styles.xml', styles or _DOCX_DEFAULT_STYLES)
+            with archive.open('word/document.xml', 'w') as document:
+                document.write(_DOCX_DOCUMENT_START.encode('utf-8'))
+                for line in content.split('\n'):
+                    document.write(_docx_paragraph_xml(line).encode('utf-8'))
+                document.write(_DOCX_DOCUMENT_END.encode('utf-8'))
+
+DOCX_WRITERS = {
+    'template': write_docx_template,
+    'python-docx': text_to_docx,
+}
 
 def get_converter_for_file(file_path: Path):
     """Get the appropriate converter function for a file based on its extension"""
@@ -75,14 +257,24 @@ def get_converter_for_file(file_path: Path):
     
     return converters.get(extension)
 
-def get_writer_for_file(file_path: Path):
-    """Get the appropriate writer function for a file based on its extension"""
+def get_writer_for_file(file_path: Path, docx_writer: str = None):
+    """
+    Get the appropriate writer function for a file based on its extension.
+    For .docx, docx_writer (default: the docx_writer setting) picks the
+    implementation from DOCX_WRITERS.
+    """
     extension = file_path.suffix.lower()
     
+    if docx_writer is None:
+        docx_writer = config.SCHEDULE_CONFIG.get('docx_writer', config.DEFAULT_DOCX_WRITER)
+    if docx_writer not in DOCX_WRITERS:
+        logger.warning(f"Unknown docx_writer '{docx_writer}', using '{config.DEFAULT_DOCX_WRITER}'")
+        docx_writer = config.DEFAULT_DOCX_WRITER
+
     writers = {
-        '.txt': lambda path, content: open(path, 'w', encoding='utf-8').write(content),
-        '.docx': text_to_docx,
-        '.md': lambda path, content: open(path, 'w', encoding='utf-8').write(content),
+        '.txt': text_to_file,
+        '.docx': DOCX_WRITERS[docx_writer],
+        '.md': text_to_file,
     }
     
     return writers.get(extension)
\ No newline at end of file
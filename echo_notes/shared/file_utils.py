@@ -1,16 +1,45 @@
 from pathlib import Path
 import logging
-from .config import NOTES_DIR, SUMMARY_MARKER
+import os
+import time
+from .config import SUMMARY_MARKER
 from .file_converters import get_converter_for_file
+from .atomic_files import atomic_write
+from .chunker import estimate_tokens
+from . import metrics, tracing
 
 logger = logging.getLogger(__name__)
 
-def get_note_text(file_path: Path) -> str:
-    """Read note content from various file formats"""
+def get_note_text(file_path: Path, pool=None) -> str:
+    """
+    Read note content from various file formats.
+    With a conversion.ConversionPool, heavy formats are converted in a worker process.
+    """
+    with tracing.span('file_utils.get_note_text') as span:
+        text = _get_note_text(file_path, pool)
+        if span.recording:
+            span.set_attributes(span_attributes(file_path, text))
+        return text
+
+def span_attributes(file_path: Path, text: str) -> dict:
+    """Span attributes describing a note file and its text"""
+    try:
+        size = file_path.stat().st_size
+    except OSError:
+        size = -1
+    return {'file.path': str(file_path), 'file.size': size, 'text.chars': len(text),
+            'tokens.estimate': estimate_tokens(text)}
+
+def _get_note_text(file_path: Path, pool=None) -> str:
+    if pool is not None:
+        return pool.convert(file_path)
     converter = get_converter_for_file(file_path)
     if converter:
         try:
-            return converter(file_path)
+            started = time.perf_counter()
+            text = converter(file_path)
+            metrics.CONVERSION_SECONDS.observe(time.perf_counter() - started, format=file_path.suffix.lower())
+            return text
         except ImportError as e:
             logger.error(f"Failed to convert {file_path}: {e}")
             raise
@@ -31,7 +60,11 @@ def write_processed_note(file_path: Path, content: str):
     writer = get_writer_for_file(file_path)
     if writer:
         try:
-            writer(file_path, content)
+            with tracing.span('file_utils.write_processed_note') as span, \
+                    metrics.WRITE_SECONDS.time(format=file_path.suffix.lower()):
+                writer(file_path, content)
+                if span.recording:
+                    span.set_attributes(span_attributes(file_path, content))
         except ImportError as e:
             logger.error(f"Failed to write to {file_path}: {e}")
             raise
@@ -39,4 +72,63 @@ def write_processed_note(file_path: Path, content: str):
             logger.error(f"Error writing to {file_path}: {e}")
             raise
     else:
-        raise ValueError(f"Unsupported file format for writing: {file_path.suffix}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file format for writing: {file_path.suffix}")
+
+def write_processed_note_stream(file_path: Path, chunks):
+    """
+    Write processed content from an iterable of text chunks.
+
+    Plain-text formats are written incrementally to a temporary file which
+    then atomically replaces the note, so the original is untouched if the
+    stream fails part-way. Other formats are collected
+    and handed to write_processed_note.
+    """
+    if file_path.suffix.lower() not in ('.md', '.txt'):
+        content = ''.join(chunks)
+        if not content:
+            raise RuntimeError(f"No content received for {file_path}")
+        write_processed_note(file_path, content)
+        return
+
+    written = 0
+    # Includes waiting for the reply to stream in
+    with tracing.span('file_utils.write_processed_note_stream') as span, \
+            metrics.WRITE_SECONDS.time(format=file_path.suffix.lower()), atomic_write(file_path) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+        if span.recording:
+            span.set_attributes({'file.path': str(file_path), 'text.chars': written})
+        if not written:
+            raise RuntimeError(f"No content received for {file_path}")
+
+def find_latest_note_times(directory: Path):
+    """
+    Return (newest note mtime, newest weekly summary mtime) in directory.
+
+    Either value is None if there is no such file. The directory is read in
+    a single scandir pass, so this is cheap enough to rerun on every change.
+    """
+    latest_note = None
+    latest_summary = None
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name
+                suffix = os.path.splitext(name)[1]
+                if name.startswith('.') or suffix not in ('.md', '.txt', '.docx'):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if name.startswith('Weekly Summary'):
+                    if suffix == '.md' and (latest_summary is None or mtime > latest_summary):
+                        latest_summary = mtime
+                elif latest_note is None or mtime > latest_note:
+                    latest_note = mtime
+    except FileNotFoundError:
+        pass
+    return latest_note, latest_summary
@@ -0,0 +1,200 @@
+"""
+Directory watcher for the daemon's event-driven mode.
+
+On Linux the watcher talks to inotify directly through ctypes, so the
+backing thread sleeps in the kernel until something changes. Elsewhere,
+or if inotify is unavailable, it falls back to comparing directory
+snapshots on a fixed interval.
+
+Changed files are debounced: a path is only reported once no further
+events have arrived for it for `settle_seconds`, so notes that are still
+being written or synced are not picked up half-way.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+DEFAULT_SETTLE_SECONDS = 5
+DEFAULT_POLL_INTERVAL = 30
+
+
+def _load_libc():
+    """Return libc with the inotify functions, or None if unsupported"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class NotesWatcher:
+    """Report files in a directory that were created or changed and have settled"""
+
+    def __init__(self, directory: Path, accept=None, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, on_change=None, use_inotify=True):
+        self.directory = Path(directory)
+        self.accept = accept or (lambda path: True)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self.use_inotify = use_inotify
+        self.backend = None
+        # Set when events were lost and the caller should rescan everything
+        self.rescan_needed = False
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        # Wakes the inotify thread out of select() on stop
+        self._stop_r = self._stop_w = None
+
+    def start(self):
+        """Start watching in a background thread"""
+        libc = _load_libc() if self.use_inotify else None
+        fd = -1
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), WATCH_MASK) < 0:
+                err = ctypes.get_errno()
+                logger.warning(f"inotify_add_watch failed for {self.directory}: {os.strerror(err)}")
+                os.close(fd)
+                fd = -1
+
+        if fd >= 0:
+            self.backend = 'inotify'
+            self._stop_r, self._stop_w = os.pipe()
+            target, args = self._inotify_loop, (fd,)
+        else:
+            self.backend = 'polling'
+            target, args = self._polling_loop, ()
+
+        logger.info(f"Watching {self.directory} for new notes using {self.backend}")
+        self._thread = threading.Thread(target=target, args=args, name='notes-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and release its resources"""
+        self._stopped.set()
+        if self._stop_w is not None:
+            os.write(self._stop_w, b'x')
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._stop_r is not None:
+            os.close(self._stop_r)
+            os.close(self._stop_w)
+            self._stop_r = self._stop_w = None
+
+    def is_alive(self) -> bool:
+        """False once the watch thread has exited, e.g. because the directory was removed"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _mark(self, name: str):
+        path = self.directory / name
+        if not self.accept(path):
+            return
+        with self._lock:
+            self._pending[path] = time.monotonic()
+        if self.on_change:
+            self.on_change()
+
+    def pop_ready(self) -> list:
+        """Remove and return paths that have been quiet for settle_seconds"""
+        cutoff = time.monotonic() - self.settle_seconds
+        with self._lock:
+            ready = [path for path, last_event in self._pending.items() if last_event <= cutoff]
+            for path in ready:
+                del self._pending[path]
+        return ready
+
+    def seconds_until_ready(self):
+        """Seconds until the next pending path settles, or None if nothing is pending"""
+        with self._lock:
+            if not self._pending:
+                return None
+            oldest = min(self._pending.values())
+        return max(0.0, oldest + self.settle_seconds - time.monotonic())
+
+    def _inotify_loop(self, fd: int):
+        try:
+            while True:
+                readable, _, _ = select.select([fd, self._stop_r], [], [])
+                if self._stop_r in readable:
+                    return
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+                    offset += EVENT_HEADER.size
+                    name = data[offset:offset + name_len].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+                    offset += name_len
+
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("inotify queue overflowed, a full rescan is needed")
+                        self.rescan_needed = True
+                        if self.on_change:
+                            self.on_change()
+                    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        logger.warning(f"Watched directory {self.directory} went away")
+                        self.rescan_needed = True
+                        if self.on_change:
+                            self.on_change()
+                        return
+                    elif name:
+                        self._mark(name)
+        finally:
+            os.close(fd)
+
+    def _snapshot(self) -> dict:
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def _polling_loop(self):
+        previous = self._snapshot()
+        while not self._stopped.wait(self.poll_interval):
+            current = self._snapshot()
+            for name, signature in current.items():
+                if previous.get(name) != signature:
+                    self._mark(name)
+            previous = current
@@ -0,0 +1,131 @@
+"""
+Content-addressed cache of LLM replies.
+
+Replies are keyed by a hash of model, system prompt, user prompt and
+max_tokens and kept in a size-bounded SQLite file; once the total size
+goes over the limit the least recently used entries are evicted. The
+whole cache is dropped whenever prompts_config.json changes, since any
+edit to the prompts is meant to change the output.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def cache_key(model: str, system_message: str, prompt: str, max_tokens: int) -> str:
+    """Hash everything that determines the reply"""
+    digest = hashlib.sha256()
+    for part in (model, system_message, prompt, str(max_tokens)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded on-disk LLM reply cache with LRU eviction"""
+
+    def __init__(self, db_path: Path, max_bytes: int, prompts_path: Path = None):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.prompts_path = Path(prompts_path) if prompts_path else None
+        self._prompts_stat = None
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Shared by the LLM worker threads; access is serialized by _lock
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._check_prompts()
+
+    def _check_prompts(self):
+        """Clear the cache if prompts_config.json differs from when entries were stored"""
+        if self.prompts_path is None:
+            return
+        try:
+            stat = os.stat(self.prompts_path)
+        except FileNotFoundError:
+            return
+        stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stat_key == self._prompts_stat:
+            return
+
+        with open(self.prompts_path, 'rb') as f:
+            fingerprint = hashlib.sha256(f.read()).hexdigest()
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'prompts'").fetchone()
+        if row is None or row[0] != fingerprint:
+            if row is not None:
+                logger.info("Prompts changed, clearing LLM response cache")
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('prompts', ?)", (fingerprint,))
+            self.conn.commit()
+        self._prompts_stat = stat_key
+
+    def get(self, key: str):
+        """Return the cached reply for key, or None"""
+        with self._lock:
+            self._check_prompts()
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a reply, evicting least recently used entries to stay under max_bytes"""
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_prompts()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} entries from LLM response cache")
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
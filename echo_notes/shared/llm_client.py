@@ -1,20 +1,404 @@
+"""
+Client for the OpenAI-compatible chat completions endpoint at config.LM_URL.
+
+LLMClient keeps a pooled keep-alive requests.Session with retries, and a
+single shared instance is returned by get_client() so every note processed
+in this process reuses the same connections. AsyncLLMClient offers the
+same calls to asyncio code by running them on an executor, so they share
+the client's connections, response cache, metrics and llm_concurrency cap.
+
+stream() / stream_llm() request "stream": true and yield the reply as it
+is generated, logging time-to-first-token and progress along the way.
+
+Replies are served from the on-disk ResponseCache when the same request
+was answered before (see llm_cache.py).
+
+With the llama_cpp_prompt_cache setting, requests carry llama.cpp's
+"cache_prompt" flag and an "id_slot" taken from a fixed pool of
+llm_concurrency slots. The system prompt comes first in every request, so
+each slot keeps it in its KV cache and only the note itself has to be
+processed on subsequent requests.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
 import requests
-from .config import LM_URL, LLM_MODEL
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def query_llm(prompt: str, system_message: str, max_tokens=2000) -> str:
-    """Generic LLM query handler"""
-    payload = {
-        "model": LLM_MODEL,
+from . import config, metrics, tracing
+from .chunker import estimate_tokens
+from .llm_cache import ResponseCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 503)
+STREAM_PROGRESS_INTERVAL = 5  # Seconds between streaming progress log lines
+
+
+def build_payload(prompt: str, system_message: str, max_tokens: int, model: str = None) -> dict:
+    """Build the chat completions request body"""
+    return {
+        "model": model or config.LLM_MODEL,
         "max_tokens": max_tokens,
         "messages": [
             {"role": "system", "content": system_message},
             {"role": "user", "content": prompt}
         ]
     }
-    
-    try:
-        response = requests.post(LM_URL, json=payload, timeout=120)
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"LLM request failed: {str(e)}")
\ No newline at end of file
+
+
+def record_error(error: Exception):
+    """Count a failed request in the LLM error metrics, by type"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        kind = f"http_{error.response.status_code}"
+    elif isinstance(error, requests.exceptions.Timeout):
+        kind = 'timeout'
+    elif isinstance(error, requests.exceptions.ConnectionError):
+        kind = 'connection'
+    else:
+        kind = 'other'
+    metrics.LLM_ERRORS.inc(type=kind)
+    span = tracing.current_span()
+    if span.recording:
+        span.set_attribute('llm.error', kind)
+        if kind.startswith('http_'):
+            span.set_attribute('http.status_code', error.response.status_code)
+
+
+def record_usage(payload: dict, reply: str, usage: dict = None):
+    """Count a request's tokens, as reported by the server or else estimated"""
+    usage = usage or {}
+    prompt_tokens = usage.get('prompt_tokens')
+    if prompt_tokens is None:
+        prompt_tokens = sum(estimate_tokens(message['content']) for message in payload['messages'])
+    completion_tokens = usage.get('completion_tokens')
+    if completion_tokens is None:
+        completion_tokens = estimate_tokens(reply)
+    metrics.LLM_PROMPT_TOKENS.inc(prompt_tokens)
+    metrics.LLM_COMPLETION_TOKENS.inc(completion_tokens)
+    span = tracing.current_span()
+    if span.recording:
+        span.set_attributes({'llm.prompt_tokens': prompt_tokens, 'llm.completion_tokens': completion_tokens,
+                             'llm.usage_reported': bool(usage)})
+
+
+def models_url(url: str) -> str:
+    """Derive the /models endpoint from a /chat/completions URL"""
+    server_url = url.rsplit('/', 2)[0]  # Remove '/chat/completions'
+    return f"{server_url}/models"
+
+
+class LLMClient:
+    """Synchronous LLM client with a pooled, retrying HTTP session"""
+
+    def __init__(self, url=None, model=None, pool_size=config.LLM_POOL_SIZE,
+                 max_retries=config.LLM_MAX_RETRIES, backoff=config.LLM_RETRY_BACKOFF,
+                 connect_timeout=config.LLM_CONNECT_TIMEOUT, read_timeout=config.LLM_READ_TIMEOUT,
+                 max_in_flight=None, cache: ResponseCache = None, server_hints=None):
+        # url and model fall back to config at call time so edits made from
+        # the dashboard take effect without rebuilding the client
+        self.url = url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        # Caps concurrent requests across every caller sharing this client. Slot ids
+        # map onto the server's slots; most recently released is reused first
+        self._slots = None
+        if max_in_flight:
+            self._slots = queue.LifoQueue()
+            for slot in reversed(range(max_in_flight)):
+                self._slots.put(slot)
+        # None means follow the llama_cpp_prompt_cache setting
+        self.server_hints = server_hints
+        # Requests currently being sent or answered, reported by the daemon's status command
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.cache = cache
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,  # Never resend a completion that may still be generating
+            status=max_retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # POST is safe to retry on 429/503
+            backoff_factor=backoff,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def endpoint(self) -> str:
+        return self.url or config.LM_URL
+
+    @contextlib.contextmanager
+    def _in_flight(self):
+        """Hold one request slot for the duration of a call, yielding its id (None if unlimited)"""
+        slot = self._slots.get() if self._slots is not None else None
+        with self._in_flight_lock:
+            self.in_flight += 1
+        try:
+            yield slot
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+            if slot is not None:
+                self._slots.put(slot)
+
+    def _with_hints(self, payload: dict, slot) -> dict:
+        """Add llama.cpp prompt cache hints to a request if enabled"""
+        hints = self.server_hints
+        if hints is None:
+            hints = config.SCHEDULE_CONFIG.get('llama_cpp_prompt_cache', False)
+        if not hints:
+            return payload
+        payload = dict(payload, cache_prompt=True)
+        if slot is not None:
+            payload['id_slot'] = slot
+        return payload
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+
+    def _cache_put(self, key, content):
+        if self.cache is None or not content:
+            return
+        try:
+            self.cache.put(key, content)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache store failed: {e}")
+
+    def query(self, prompt: str, system_message: str, max_tokens=2000) -> str:
+        """Send a chat completion request and return the reply text"""
+        payload = build_payload(prompt, system_message, max_tokens, self.model)
+        key = cache_key(payload["model"], system_message, prompt, max_tokens)
+        cached = self._cache_get(key)
+        if cached is not None:
+            logger.debug("LLM response served from cache")
+            tracing.current_span().set_attribute('llm.cache_hit', True)
+            return cached
+
+        with self._in_flight() as slot:
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.endpoint, json=self._with_hints(payload, slot),
+                                             timeout=self.timeout)
+                tracing.current_span().set_attribute('http.status_code', response.status_code)
+                response.raise_for_status()
+                reply = response.json()
+                content = reply['choices'][0]['message']['content']
+            except requests.exceptions.RequestException as e:
+                record_error(e)
+                raise RuntimeError(f"LLM request failed: {str(e)}")
+            metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - started)
+        record_usage(payload, content, reply.get('usage'))
+        self._cache_put(key, content)
+        return content
+
+    def stream(self, prompt: str, system_message: str, max_tokens=2000):
+        """Send a streaming chat completion request and yield reply text as it arrives"""
+        payload = build_payload(prompt, system_message, max_tokens, self.model)
+        key = cache_key(payload["model"], system_message, prompt, max_tokens)
+        cached = self._cache_get(key)
+        if cached is not None:
+            logger.info("LLM response served from cache")
+            yield cached
+            return
+
+        payload["stream"] = True
+        started = time.monotonic()
+        last_report = started
+        received = 0
+        parts = []
+        usage = None
+        try:
+            with self._in_flight() as slot, self.session.post(self.endpoint, json=self._with_hints(payload, slot),
+                                                              timeout=self.timeout, stream=True) as response:
+                tracing.current_span().set_attribute('http.status_code', response.status_code)
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        break
+                    event = json.loads(data)
+                    # Servers that report usage send it with the last chunk
+                    usage = event.get('usage') or usage
+                    if not event.get('choices'):
+                        continue
+                    delta = event['choices'][0].get('delta', {}).get('content')
+                    if not delta:
+                        continue
+
+                    now = time.monotonic()
+                    if received == 0:
+                        logger.info(f"LLM first token after {now - started:.1f}s")
+                    elif now - last_report >= STREAM_PROGRESS_INTERVAL:
+                        logger.info(f"LLM streaming: {received} chars after {now - started:.1f}s")
+                        last_report = now
+                    received += len(delta)
+                    parts.append(delta)
+                    yield delta
+        except requests.exceptions.RequestException as e:
+            record_error(e)
+            raise RuntimeError(f"LLM request failed: {str(e)}")
+        elapsed = time.monotonic() - started
+        logger.info(f"LLM stream finished: {received} chars in {elapsed:.1f}s")
+        metrics.LLM_REQUEST_SECONDS.observe(elapsed)
+        content = ''.join(parts)
+        record_usage(payload, content, usage)
+        self._cache_put(key, content)
+
+    def check_server(self, timeout=1) -> requests.Response:
+        """Probe the server's /models endpoint; raises requests exceptions if unreachable"""
+        url = models_url(self.endpoint)
+        logger.debug(f"Checking LLM server availability at {url}")
+        # Bypass the retrying session so an offline server is reported immediately
+        return requests.get(url, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+_STREAM_DONE = object()
+
+
+class AsyncLLMClient:
+    """
+    asyncio front end to an LLMClient (by default the shared one).
+
+    Requests run on an executor (the event loop's default unless one is
+    given) and wait for a slot there, so the concurrency cap, cache hits and
+    metrics are the same as for synchronous callers.
+    """
+
+    def __init__(self, client: LLMClient = None, executor=None):
+        self.client = client
+        self.executor = executor
+
+    def _client(self) -> LLMClient:
+        # Looked up per call so a client rebuilt after a settings change is picked up
+        return self.client or get_client()
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, tracing.wrap(fn), *args)
+
+    async def query(self, prompt: str, system_message: str, max_tokens=2000) -> str:
+        """Send a chat completion request and return the reply text"""
+        return await self._run(self._client().query, prompt, system_message, max_tokens)
+
+    async def stream(self, prompt: str, system_message: str, max_tokens=2000):
+        """Streaming request; an async generator of reply text as it arrives"""
+        pieces = self._client().stream(prompt, system_message, max_tokens)
+        try:
+            while True:
+                piece = await self._run(next, pieces, _STREAM_DONE)
+                if piece is _STREAM_DONE:
+                    return
+                yield piece
+        finally:
+            # Releases the request slot if the caller stops reading early
+            await self._run(pieces.close)
+
+
+_client = None
+_client_lock = threading.Lock()
+_cache_disabled = False
+# Settings baked into the shared client when it is created
+CLIENT_SETTINGS = {'llm_concurrency', 'llm_cache_enabled', 'llm_cache_max_mb'}
+
+
+def get_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            concurrency = max(1, int(config.SCHEDULE_CONFIG.get('llm_concurrency', config.DEFAULT_LLM_CONCURRENCY)))
+            cache = None
+            if config.SCHEDULE_CONFIG.get('llm_cache_enabled', True) and not _cache_disabled:
+                max_mb = float(config.SCHEDULE_CONFIG.get('llm_cache_max_mb', config.DEFAULT_LLM_CACHE_MAX_MB))
+                try:
+                    cache = ResponseCache(config.LLM_CACHE_PATH, int(max_mb * 1024 * 1024), config.PROMPTS_CONFIG_PATH)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"LLM response cache unavailable: {e}")
+            _client = LLMClient(pool_size=max(config.LLM_POOL_SIZE, concurrency), max_in_flight=concurrency,
+                                cache=cache)
+        return _client
+
+
+def in_flight_requests() -> int:
+    """LLM requests currently in flight in this process"""
+    return _client.in_flight if _client is not None else 0
+
+
+def disable_cache():
+    """Bypass the response cache for the rest of this process"""
+    global _cache_disabled
+    _cache_disabled = True
+    get_client().cache = None
+
+
+def use_server(url: str) -> str:
+    """
+    Send this process's requests to another server (e.g. a mock), as for --llm-url.
+
+    A bare http://host:port or .../v1 URL gets /v1/chat/completions appended.
+    The response cache is bypassed so replies from that server are neither
+    served from nor stored in the cache of the configured one.
+    """
+    url = url.rstrip('/')
+    if not url.endswith('/chat/completions'):
+        url += '/chat/completions' if url.endswith('/v1') else '/v1/chat/completions'
+    config.LM_URL = url
+    disable_cache()
+    return url
+
+
+def _on_config_change(changed):
+    """Rebuild the shared client on next use when its settings change"""
+    global _client
+    if not changed & CLIENT_SETTINGS:
+        return
+    with _client_lock:
+        if _client is not None:
+            logger.info("LLM client settings changed, reconnecting on the next request")
+            # Only idle connections are closed; requests already running finish
+            # on the old session and their connections are discarded afterwards
+            _client.close()
+            _client = None
+
+
+config.subscribe(_on_config_change)
+
+
+def query_llm(prompt: str, system_message: str, max_tokens=2000) -> str:
+    """Generic LLM query handler"""
+    with tracing.span('llm_client.query_llm') as span:
+        if span.recording:
+            span.set_attributes({'llm.prompt_chars': len(prompt), 'llm.max_tokens': max_tokens})
+        return get_client().query(prompt, system_message, max_tokens)
+
+
+def stream_llm(prompt: str, system_message: str, max_tokens=2000):
+    """Streaming LLM query handler, yields the reply in pieces"""
+    return get_client().stream(prompt, system_message, max_tokens)
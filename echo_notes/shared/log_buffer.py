@@ -0,0 +1,70 @@
+"""
+Bounded log sink for GUIs.
+
+LogBuffer is a logging handler that keeps the last max_lines formatted
+records in a ring buffer. Records can arrive from any thread at any rate;
+the GUI polls drain() on a timer and appends whatever arrived since the
+last poll in a single update, so a run that logs thousands of lines
+costs one widget update per tick instead of one queued call per record.
+"""
+
+import logging
+import threading
+from collections import deque
+
+
+class LogBuffer(logging.Handler):
+    def __init__(self, max_lines: int, level=logging.NOTSET):
+        super().__init__(level)
+        self.max_lines = max(1, int(max_lines))
+        self._lines = deque(maxlen=self.max_lines)
+        self._pending = deque(maxlen=self.max_lines)
+        self._overflowed = False
+        self._buffer_lock = threading.Lock()
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            if len(self._pending) == self.max_lines:
+                # More arrived since the last drain than the view keeps
+                self._overflowed = True
+            self._lines.append(line)
+            self._pending.append(line)
+
+    def drain(self):
+        """
+        Lines logged since the last drain, and whether the view must be reset.
+
+        When reset is True more lines arrived than the buffer holds; the view
+        should be replaced with the returned lines (the whole buffer) instead
+        of appending them.
+        """
+        with self._buffer_lock:
+            reset = self._overflowed
+            lines = list(self._lines) if reset else list(self._pending)
+            self._pending.clear()
+            self._overflowed = False
+        return lines, reset
+
+    def lines(self):
+        """Everything still in the buffer, oldest first"""
+        with self._buffer_lock:
+            return list(self._lines)
+
+    def resize(self, max_lines: int):
+        """Change how many lines are kept; the view should be reset"""
+        with self._buffer_lock:
+            self.max_lines = max(1, int(max_lines))
+            self._lines = deque(self._lines, maxlen=self.max_lines)
+            self._pending = deque(maxlen=self.max_lines)
+            self._overflowed = True
+
+    def clear(self):
+        with self._buffer_lock:
+            self._lines.clear()
+            self._pending.clear()
+            self._overflowed = False
@@ -0,0 +1,145 @@
+"""
+Memory tracking for the long-running daemon.
+
+While a MemoryTracker is running, tracemalloc records where memory is
+allocated. After each daemon job, record() compares a new snapshot with
+the previous one and appends a report to MEMORY_LOG_PATH (rotated like the
+other logs): RSS, the traced total, garbage collector statistics and the
+top allocation sites that grew or shrank since the last job. A site that
+keeps growing job after job is the leak.
+"""
+
+import gc
+import linecache
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from logging.handlers import RotatingFileHandler
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 25  # Allocation sites listed per report
+TRACEBACK_FRAMES = 1  # Frames stored per allocation; more is slower and uses more memory
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+# tracemalloc's own bookkeeping and module loading would otherwise top every report
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def gc_stats() -> dict:
+    stats = gc.get_stats()
+    return {
+        'counts': gc.get_count(),
+        'collections': [generation['collections'] for generation in stats],
+        'collected': sum(generation['collected'] for generation in stats),
+        'uncollectable': sum(generation['uncollectable'] for generation in stats),
+        'garbage': len(gc.garbage),
+        'objects': len(gc.get_objects()),
+    }
+
+
+def _mb(size) -> str:
+    return 'n/a' if size is None else f"{size / (1024 * 1024):.1f} MB"
+
+
+class MemoryTracker:
+    """tracemalloc snapshots diffed between daemon jobs, reported to a rotating file"""
+
+    def __init__(self, path=None, top: int = TOP_N):
+        self.path = path or config.MEMORY_LOG_PATH
+        self.top = top
+        self.cycle = 0
+        self._previous = None
+        self._started_tracing = False
+        self._report = None
+
+    @property
+    def running(self) -> bool:
+        return self._previous is not None
+
+    def start(self):
+        if self.running:
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(self.path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._report = logging.getLogger(f'{__name__}.report')
+        self._report.propagate = False
+        self._report.setLevel(logging.INFO)
+        self._report.addHandler(handler)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+            self._started_tracing = True
+        self._previous = self._snapshot()
+        self._write('tracking started', [])
+        logger.info(f"Memory tracking started, reporting to {self.path}")
+        return self
+
+    def stop(self):
+        if not self.running:
+            return
+        self._write('tracking stopped', [])
+        self._previous = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        for handler in list(self._report.handlers):
+            self._report.removeHandler(handler)
+            handler.close()
+        logger.info("Memory tracking stopped")
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def record(self, label: str):
+        """Report the change in memory since the previous record (or start)"""
+        if not self.running:
+            return
+        # Uncollected cycles would otherwise show up as growth
+        gc.collect()
+        snapshot = self._snapshot()
+        diff = snapshot.compare_to(self._previous, 'lineno')
+        self._previous = snapshot
+        self.cycle += 1
+        self._write(label, [stat for stat in diff if stat.size_diff][:self.top])
+
+    def _write(self, label, diff):
+        current, peak = tracemalloc.get_traced_memory()
+        stats = gc_stats()
+        lines = [
+            f"=== {time.strftime('%Y-%m-%d %H:%M:%S')} cycle {self.cycle}: {label}",
+            f"RSS {_mb(rss_bytes())}, traced {_mb(current)} (peak {_mb(peak)})",
+            f"GC counts {stats['counts']}, collections {stats['collections']}, collected {stats['collected']}, "
+            f"uncollectable {stats['uncollectable']}, gc.garbage {stats['garbage']}, objects {stats['objects']}",
+        ]
+        if diff:
+            lines.append(f"Top {len(diff)} allocation changes since the previous cycle:")
+            lines.extend(f"  {stat}" for stat in diff)
+        self._report.info('\n'.join(lines))
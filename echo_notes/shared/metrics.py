@@ -0,0 +1,342 @@
+"""
+Process-wide metrics: counters, gauges and histograms for note processing.
+
+Metrics live in memory in the process that records them (the daemon, or a
+one-off process-notes run). The daemon can publish them two ways, both
+configured in the schedule settings:
+
+- metrics_port: an HTTP endpoint on localhost serving /metrics in the
+  Prometheus text format and /metrics.json
+- metrics_interval: how often METRICS_JSON_PATH is rewritten with the
+  same data as JSON, which is what the dashboard reads
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from . import config
+from .atomic_files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a sub-millisecond file read up to a multi-minute LLM reply
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """A count that only goes up, e.g. notes processed"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in sorted(self._values.items())]
+
+    def prometheus_lines(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """A value that can go up and down, e.g. queue depth"""
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values (latencies) in cumulative buckets"""
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _cumulative(self, counts):
+        total = 0
+        for bound, count in zip(self.buckets, counts):
+            total += count
+            yield bound, total
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self._values.items())
+        return [{
+            'labels': dict(key),
+            'count': state['count'],
+            'sum': state['sum'],
+            'buckets': {_format_value(bound): total for bound, total in self._cumulative(state['counts'])},
+        } for key, state in items]
+
+    def prometheus_lines(self):
+        lines = []
+        for sample in self.samples():
+            key = _label_key(sample['labels'])
+            for bound, total in sample['buckets'].items():
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {total}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(sample['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {sample['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.prometheus_lines())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict:
+        return {
+            'updated_at': time.time(),
+            'metrics': {metric.name: {'type': metric.type, 'help': metric.help, 'samples': metric.samples()}
+                        for metric in self.metrics()},
+        }
+
+    def reset(self):
+        for metric in self.metrics():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+FILES_SCANNED = REGISTRY.counter('echo_notes_files_scanned_total', 'Notes checked by processing runs')
+FILES_SKIPPED = REGISTRY.counter(
+    'echo_notes_files_skipped_total', 'Notes not sent to the LLM, by reason (unchanged, already_processed)')
+FILES_PROCESSED = REGISTRY.counter('echo_notes_files_processed_total', 'Notes processed and rewritten')
+FILES_FAILED = REGISTRY.counter('echo_notes_files_failed_total', 'Notes that failed, by stage (conversion, processing)')
+CONVERSION_SECONDS = REGISTRY.histogram('echo_notes_conversion_seconds', 'Time to convert a note to text, by format')
+LLM_REQUEST_SECONDS = REGISTRY.histogram('echo_notes_llm_request_seconds', 'Time for a completed LLM request')
+WRITE_SECONDS = REGISTRY.histogram('echo_notes_write_seconds', 'Time to write a processed note, by format')
+LLM_PROMPT_TOKENS = REGISTRY.counter('echo_notes_llm_prompt_tokens_total', 'Prompt tokens sent to the LLM')
+LLM_COMPLETION_TOKENS = REGISTRY.counter('echo_notes_llm_completion_tokens_total', 'Completion tokens received')
+LLM_ERRORS = REGISTRY.counter('echo_notes_llm_errors_total', 'Failed LLM requests, by type')
+QUEUE_DEPTH = REGISTRY.gauge('echo_notes_queue_depth', 'Daemon jobs waiting to be processed')
+QUEUE_JOBS = REGISTRY.gauge('echo_notes_queue_jobs', 'Daemon jobs by state')
+RUN_SECONDS = REGISTRY.histogram('echo_notes_run_duration_seconds', 'Duration of daemon jobs, by job')
+RUNS = REGISTRY.counter('echo_notes_runs_total', 'Daemon jobs run, by job and outcome')
+
+
+def write_json(path: Path = None):
+    """Atomically write a snapshot of every metric to path (default: METRICS_JSON_PATH)"""
+    path = Path(path or config.METRICS_JSON_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path, fsync=False) as f:
+        json.dump(REGISTRY.snapshot(), f)
+
+
+def read_json(path: Path = None):
+    """Load a snapshot written by write_json, or None if there is none"""
+    try:
+        with open(path or config.METRICS_JSON_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def sample_value(snapshot: dict, name: str, **labels):
+    """Sum of a counter/gauge's samples in a snapshot matching labels (all if none given)"""
+    metric = (snapshot or {}).get('metrics', {}).get(name)
+    if metric is None:
+        return 0
+    total = 0
+    for sample in metric['samples']:
+        if all(sample['labels'].get(key) == value for key, value in labels.items()):
+            total += sample.get('value', sample.get('count', 0))
+    return total
+
+
+def summarize(snapshot: dict) -> str:
+    """One-line summary of a snapshot, as shown on the dashboard"""
+    if not snapshot:
+        return "No metrics yet"
+    processed = sample_value(snapshot, FILES_PROCESSED.name)
+    failed = sample_value(snapshot, FILES_FAILED.name)
+    scanned = sample_value(snapshot, FILES_SCANNED.name)
+    parts = [f"{processed:g} processed", f"{failed:g} failed", f"{scanned:g} scanned"]
+    requests_seen = sum(sample['count'] for sample in
+                        snapshot.get('metrics', {}).get(LLM_REQUEST_SECONDS.name, {}).get('samples', []))
+    if requests_seen:
+        total = sum(sample['sum'] for sample in snapshot['metrics'][LLM_REQUEST_SECONDS.name]['samples'])
+        parts.append(f"LLM {total / requests_seen:.1f}s avg over {requests_seen} requests")
+    errors = sample_value(snapshot, LLM_ERRORS.name)
+    if errors:
+        parts.append(f"{errors:g} LLM errors")
+    tokens = sample_value(snapshot, LLM_PROMPT_TOKENS.name) + sample_value(snapshot, LLM_COMPLETION_TOKENS.name)
+    if tokens:
+        parts.append(f"{tokens:g} tokens")
+    return ', '.join(parts)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path in ('', '/metrics'):
+            body = REGISTRY.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body = json.dumps(REGISTRY.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsPublisher:
+    """Serve metrics over HTTP on localhost and/or rewrite the JSON file periodically"""
+
+    def __init__(self, port: int = 0, interval: float = 0, json_path: Path = None):
+        self.port = port
+        self.interval = interval
+        self.json_path = Path(json_path or config.METRICS_JSON_PATH)
+        self._server = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.port:
+            try:
+                # Localhost only: the metrics include note counts and timings
+                self._server = ThreadingHTTPServer(('127.0.0.1', self.port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Metrics endpoint unavailable on port {self.port}: {e}")
+            else:
+                self._server.daemon_threads = True
+                self._start_thread(self._server.serve_forever, 'metrics-http')
+                logger.info(f"Serving metrics on http://127.0.0.1:{self._server.server_port}/metrics")
+        if self.interval:
+            self._start_thread(self._write_periodically, 'metrics-json')
+        return self
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_json(self):
+        try:
+            write_json(self.json_path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.json_path}: {e}")
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self._write_json()
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.interval:
+            # Leave the final numbers behind for the dashboard
+            self._write_json()
@@ -0,0 +1,123 @@
+"""
+Persistent index of processed notes.
+
+Remembers the size, mtime and content hash of every note that
+notes_nextcloud has looked at, so later runs only need to open files
+that are new or have changed since the last run.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's raw bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class NoteIndex:
+    """SQLite-backed index of note state keyed by absolute path"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Commit pending changes and close the database"""
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def _row(self, file_path: Path):
+        return self.conn.execute(
+            "SELECT size, mtime_ns, content_hash, processed FROM notes WHERE path = ?",
+            (str(file_path),)
+        ).fetchone()
+
+    def is_processed(self, file_path: Path, stat: os.stat_result = None) -> bool:
+        """
+        Check whether a note is known to be processed without reading it.
+
+        A matching size and mtime is trusted as-is. If only the metadata
+        changed (e.g. a sync client touched the file) the content hash is
+        compared before the note is considered changed.
+        """
+        row = self._row(file_path)
+        if row is None or not row[3]:
+            return False
+
+        stat = stat or os.stat(file_path)
+        size, mtime_ns, content_hash, _ = row
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return True
+        if stat.st_size != size:
+            return False
+
+        if hash_file(file_path) == content_hash:
+            self.record(file_path, processed=True, stat=stat, content_hash=content_hash)
+            return True
+        return False
+
+    def record(self, file_path: Path, processed: bool, stat: os.stat_result = None,
+               content_hash: str = None):
+        """Store the current state of a note"""
+        stat = stat or os.stat(file_path)
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO notes (path, size, mtime_ns, content_hash, processed, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(file_path), stat.st_size, stat.st_mtime_ns, content_hash, int(processed), time.time())
+        )
+
+    def prune(self, directory: Path, seen_paths):
+        """Drop entries for notes in directory that no longer exist"""
+        seen = {str(p) for p in seen_paths}
+        stale = [
+            (path,) for (path,) in self.conn.execute("SELECT path FROM notes")
+            if Path(path).parent == Path(directory) and path not in seen
+        ]
+        if stale:
+            self.conn.executemany("DELETE FROM notes WHERE path = ?", stale)
+            logger.debug(f"Pruned {len(stale)} stale entries from note index")
+
+    def clear(self):
+        """Remove every entry so the next run rebuilds the index from scratch"""
+        self.conn.execute("DELETE FROM notes")
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
@@ -0,0 +1,142 @@
+"""
+Cheap per-note metadata, chiefly the date a note belongs to.
+
+The date is taken, in order of preference, from a `date:`/`created:` key
+in YAML frontmatter, a YYYY-MM-DD date in the filename, the
+"SUMMARY (YYYY-MM-DD HH:MM)" header that processed notes start with, and
+finally the file's mtime. Only the first HEAD_BYTES of a note are read
+(for .docx, only as much of document.xml as yields that much text), unless
+the caller passes them in, and results are cached per (path, mtime, size)
+so repeated runs don't touch unchanged files at all.
+"""
+
+import os
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from . import file_converters
+
+HEAD_BYTES = 4096
+MAX_CACHED_NOTES = 10000
+
+SUMMARY_TIMESTAMP_RE = re.compile(r"SUMMARY\s*\((\d{4}-\d{2}-\d{2} \d{2}:\d{2})\)")
+_FRONTMATTER_RE = re.compile(r'\A---\s*\n(.*?)\n---\s*(?:\n|\Z)', re.S)
+_FRONTMATTER_DATE_RE = re.compile(
+    r'^(?:date|created)\s*:\s*["\']?(\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)', re.M | re.I
+)
+_FILENAME_DATE_RE = re.compile(r'(?<!\d)(\d{4})-(\d{2})-(\d{2})(?:[ _T](\d{2})[:.h-]?(\d{2}))?(?!\d)')
+
+
+class NoteMetadata(NamedTuple):
+    date: datetime
+    # Where the date came from: 'frontmatter', 'filename', 'summary' or 'mtime'
+    date_source: str
+    mtime: float
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def read_head(file_path: Path, limit: int = HEAD_BYTES) -> str:
+    """Return roughly the first `limit` characters of a note's text"""
+    suffix = file_path.suffix.lower()
+    if suffix == '.docx':
+        parts = []
+        size = 0
+        try:
+            # The reader is lazy, so stopping early leaves the rest of the document unparsed
+            for paragraph in file_converters.iter_docx_paragraphs(file_path):
+                parts.append(paragraph)
+                size += len(paragraph) + 1
+                if size >= limit:
+                    break
+        except (KeyError, zipfile.BadZipFile, ET.ParseError):
+            pass
+        return '\n'.join(parts)[:limit]
+    with open(file_path, 'rb') as f:
+        return f.read(limit).decode('utf-8', 'replace')
+
+
+def _parse_date(value: str):
+    try:
+        return datetime.fromisoformat(value.replace('T', ' '))
+    except ValueError:
+        return None
+
+
+def date_from_filename(name: str):
+    """The date in a note's filename, or None; never touches the file"""
+    for match in _FILENAME_DATE_RE.finditer(name):
+        year, month, day, hour, minute = match.groups()
+        try:
+            return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+        except ValueError:
+            continue
+    return None
+
+
+def extract_date(name: str, head: str):
+    """Return (date, source) from a filename and the start of a note, or (None, None)"""
+    frontmatter = _FRONTMATTER_RE.match(head)
+    if frontmatter:
+        match = _FRONTMATTER_DATE_RE.search(frontmatter.group(1))
+        if match:
+            date = _parse_date(match.group(1))
+            if date:
+                return date, 'frontmatter'
+
+    date = date_from_filename(name)
+    if date:
+        return date, 'filename'
+
+    match = SUMMARY_TIMESTAMP_RE.search(head)
+    if match:
+        date = _parse_date(match.group(1))
+        if date:
+            return date, 'summary'
+    return None, None
+
+
+def get_cached(file_path: Path, stat: os.stat_result):
+    """Cached metadata for a note if it hasn't changed since, else None; never reads the note"""
+    with _cache_lock:
+        cached = _cache.get(Path(file_path))
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    return None
+
+
+def get_metadata(file_path: Path, stat: os.stat_result = None, text: str = None) -> NoteMetadata:
+    """
+    Metadata for a note, cached until its mtime or size changes.
+    If the caller has already read the start of the note it is used instead of reading the file.
+    """
+    file_path = Path(file_path)
+    stat = stat or os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = get_cached(file_path, stat)
+    if cached is not None:
+        return cached
+
+    head = text[:HEAD_BYTES] if text is not None else read_head(file_path)
+    date, source = extract_date(file_path.name, head)
+    if date is None:
+        date, source = datetime.fromtimestamp(stat.st_mtime), 'mtime'
+    metadata = NoteMetadata(date=date, date_source=source, mtime=stat.st_mtime)
+
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHED_NOTES:
+            _cache.clear()
+        _cache[file_path] = (signature, metadata)
+    return metadata
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
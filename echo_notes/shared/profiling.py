@@ -0,0 +1,112 @@
+"""
+On-demand profiling of a processing run, summary or daemon job.
+
+profiled(label) runs its block under cProfile and, alongside it, a
+sampling profiler that snapshots every thread's stack at a fixed
+interval. cProfile only sees the thread that started it, so the samples
+are what show time spent in the LLM and conversion worker threads. Two
+files are written to STATE_DIR (next to daemon.log):
+
+    echo-notes-profile-<label>-<timestamp>.pstats     load with pstats or snakeviz
+    echo-notes-profile-<label>-<timestamp>.collapsed  "frame;frame;frame count" lines
+                                                      for flamegraph.pl or speedscope
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Count the stacks of every other thread, sampled on a background thread"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def output_paths(label: str, directory: Path = None):
+    """(pstats path, collapsed path) for a new profile of label"""
+    directory = Path(directory or config.STATE_DIR)
+    stem = f"echo-notes-profile-{label}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    return directory / f"{stem}.pstats", directory / f"{stem}.collapsed"
+
+
+@contextmanager
+def profiled(label: str, enabled: bool = True, directory: Path = None):
+    """Profile the block and write its pstats and collapsed stacks; does nothing if not enabled"""
+    if not enabled:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    sampler = StackSampler().start()
+    started = time.monotonic()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        sampler.stop()
+        pstats_path, collapsed_path = output_paths(label, directory)
+        try:
+            pstats_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(pstats_path))
+            sampler.write_collapsed(collapsed_path)
+        except OSError as e:
+            logger.error(f"Could not write profile for {label}: {e}")
+        else:
+            logger.info(f"Profiled {label} for {time.monotonic() - started:.1f}s ({sampler.samples} samples): "
+                        f"{pstats_path}, {collapsed_path}")
@@ -0,0 +1,65 @@
+"""
+Prompts from prompts_config.json, parsed once and kept until the file changes.
+
+Processing a batch of notes used to re-read and re-parse the JSON for every
+note; now each lookup costs a stat() of the file. Keeping the returned
+system prompts byte-for-byte identical across requests also lets the LLM
+server reuse the prompt prefix it already processed (see llm_client).
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class PromptRegistry:
+    """Cached view of a prompts JSON file, reloaded when its mtime, size or inode changes"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._prompts = None
+        self._stat_key = None
+
+    def _load(self) -> dict:
+        with self._lock:
+            stat = os.stat(self.path)
+            stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stat_key != self._stat_key:
+                with open(self.path, 'r') as f:
+                    prompts = json.load(f)
+                if self._prompts is not None:
+                    logger.info(f"Reloaded prompts from {self.path}")
+                self._prompts = prompts
+                self._stat_key = stat_key
+            return self._prompts
+
+    def get(self, name: str, default: str = None) -> str:
+        """Return one prompt; raises KeyError if it is missing and no default is given"""
+        prompts = self._load()
+        if name in prompts:
+            return prompts[name]
+        if default is None:
+            raise KeyError(f"Prompt '{name}' not found in {self.path}")
+        return default
+
+    def all(self) -> dict:
+        """A copy of every prompt"""
+        return dict(self._load())
+
+
+registry = PromptRegistry(config.PROMPTS_CONFIG_PATH)
+
+
+def get_prompt(name: str, default: str = None) -> str:
+    return registry.get(name, default)
+
+
+def get_prompts() -> dict:
+    return registry.all()
@@ -0,0 +1,273 @@
+"""
+Span tracing for note processing, exported as OTLP JSON lines.
+
+    with tracing.span('file_utils.get_note_text') as span:
+        if span.recording:
+            span.set_attribute('file.path', str(file_path))
+
+Spans nest through a context variable; work handed to a thread pool keeps
+its parent when the function is wrapped with tracing.wrap(). Finished
+spans are buffered and appended to TRACE_PATH once their trace's root span
+ends, one OTLP/JSON ExportTraceServiceRequest per line, which trace viewers
+and the OpenTelemetry collector's otlpjsonfile receiver can load.
+
+Tracing follows the tracing_enabled setting (or --trace). Each root span
+is kept with probability trace_sample_rate and its children follow that
+decision. When tracing is off, span() hands out a shared no-op span, so
+instrumented code pays for one flag check; callers guard any extra work
+for attributes with span.recording.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+SCOPE_NAME = 'echo_notes'
+FLUSH_SPANS = 512  # Buffered spans that force a write even if their trace is still open
+TRACE_MAX_BYTES = 50 * 1024 * 1024  # The file is rotated to .1 past this size
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar('echo_notes_span', default=None)
+_random = random.Random()
+_enabled = None  # None until the settings are first read
+_sample_rate = 1.0
+_settings_lock = threading.Lock()
+
+
+class _NoopSpan:
+    """Stand-in for spans that are not recorded (tracing off or not sampled)"""
+    recording = False
+    sampled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """Active but unrecorded span, so children of a dropped trace are dropped too"""
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+class Span:
+    recording = True
+    sampled = True
+
+    def __init__(self, name: str, parent, attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else f'{_random.getrandbits(128):032x}'
+        self.span_id = f'{_random.getrandbits(64):016x}'
+        self.attributes = dict(attributes)
+        self.status_code = STATUS_UNSET
+        self.status_message = ''
+        self.start_ns = None
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None:
+            self.status_code = STATUS_ERROR
+            self.status_message = f'{exc_type.__name__}: {exc}'
+        _exporter.add(self)
+        return False
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': self.status_code},
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = self.parent.span_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class JsonLinesExporter:
+    """Append finished spans to a file, one OTLP/JSON request per completed trace"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            if span.parent is not None and len(self._spans) < FLUSH_SPANS:
+                return
+            spans, self._spans = self._spans, []
+        self._write(spans)
+
+    def flush(self):
+        with self._lock:
+            spans, self._spans = self._spans, []
+        self._write(spans)
+
+    def _write(self, spans):
+        if not spans:
+            return
+        path = self.path or config.TRACE_PATH
+        request = {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': 'echo-notes'}},
+                {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+            ]},
+            'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [span.to_otlp() for span in spans]}],
+        }]}
+        line = json.dumps(request, separators=(',', ':')) + '\n'
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                if path.exists() and path.stat().st_size > TRACE_MAX_BYTES:
+                    os.replace(path, path.with_name(path.name + '.1'))
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"Could not write traces to {path}: {e}")
+
+
+_exporter = JsonLinesExporter()
+atexit.register(_exporter.flush)
+
+
+def _load_settings():
+    global _enabled, _sample_rate
+    with _settings_lock:
+        _sample_rate = min(1.0, max(0.0, float(
+            config.SCHEDULE_CONFIG.get('trace_sample_rate', config.DEFAULT_TRACE_SAMPLE_RATE))))
+        _enabled = bool(config.SCHEDULE_CONFIG.get('tracing_enabled', False))
+
+
+def _on_config_change(changed):
+    if changed & {'tracing_enabled', 'trace_sample_rate'}:
+        _load_settings()
+
+
+config.subscribe(_on_config_change)
+
+
+def is_enabled() -> bool:
+    if _enabled is None:
+        _load_settings()
+    return _enabled
+
+
+def enable(sample_rate: float = None):
+    """Turn tracing on for this process, as for --trace"""
+    values = {'tracing_enabled': True}
+    if sample_rate is not None:
+        values['trace_sample_rate'] = sample_rate
+    config.schedule.override(**values)
+    _load_settings()
+
+
+def disable():
+    """Turn tracing off for this process (e.g. in worker processes)"""
+    global _enabled
+    _enabled = False
+
+
+def set_exporter(exporter: JsonLinesExporter):
+    global _exporter
+    _exporter.flush()
+    _exporter = exporter
+
+
+def flush():
+    _exporter.flush()
+
+
+def span(name: str, **attributes):
+    """Start a span (use as a context manager); a no-op unless tracing is on and the trace is sampled"""
+    if not (_enabled if _enabled is not None else is_enabled()):
+        return _NOOP
+    parent = _current.get()
+    if parent is None:
+        if _sample_rate < 1.0 and _random.random() >= _sample_rate:
+            return _UnsampledSpan()
+    elif not parent.sampled:
+        return _NOOP
+    return Span(name, parent, attributes)
+
+
+def current_span():
+    """The innermost active span, or a no-op span"""
+    current = _current.get()
+    return current if current is not None else _NOOP
+
+
+def wrap(fn):
+    """Bind fn to the current span, for running it on another thread"""
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
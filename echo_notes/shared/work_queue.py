@@ -0,0 +1,192 @@
+"""
+Durable per-note job queue for the daemon.
+
+Jobs live in an SQLite database in WAL mode and every state change is
+committed straight away, so a daemon that is killed mid-run resumes with
+the notes it had not finished. Each job moves through:
+
+    pending -> in_progress -> done
+                           -> failed (retried after an exponential backoff)
+                           -> dead   (gave up after max_attempts)
+
+Dead jobs are set aside and only revived once the note itself changes.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+DEAD = 'dead'
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_BACKOFF = 60  # Seconds before the first retry, doubled on each further failure
+DEFAULT_MAX_BACKOFF = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    size INTEGER,
+    mtime_ns INTEGER,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, next_attempt_at);
+"""
+
+
+class WorkQueue:
+    """SQLite-backed queue of per-note processing jobs"""
+
+    def __init__(self, db_path: Path, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 base_backoff=DEFAULT_BASE_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Status queries may come from other threads; access is serialized by _lock
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def recover(self) -> int:
+        """Return jobs left in progress by a previous (crashed) run to pending"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), IN_PROGRESS)
+            )
+        if cursor.rowcount:
+            logger.info(f"Resuming {cursor.rowcount} notes interrupted by the previous run")
+        return cursor.rowcount
+
+    def enqueue(self, file_path: Path, stat: os.stat_result = None):
+        """
+        Queue a note for processing.
+
+        A note that is already waiting keeps its retry schedule, and a dead
+        note stays set aside unless its size or mtime changed since.
+        """
+        stat = stat or os.stat(file_path)
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT state, size, mtime_ns FROM jobs WHERE path = ?", (str(file_path),)
+            ).fetchone()
+            changed = row is None or (row[1], row[2]) != (stat.st_size, stat.st_mtime_ns)
+            if row is not None and not changed and row[0] in (PENDING, IN_PROGRESS, FAILED, DEAD):
+                return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (path, state, attempts, next_attempt_at, size, mtime_ns, "
+                "last_error, updated_at) VALUES (?, ?, 0, 0, ?, ?, NULL, ?)",
+                (str(file_path), PENDING, stat.st_size, stat.st_mtime_ns, now)
+            )
+
+    def claim_due(self, limit: int = None) -> list:
+        """Mark due pending/failed jobs in progress and return their paths"""
+        now = time.time()
+        query = ("SELECT path FROM jobs WHERE state IN (?, ?) AND next_attempt_at <= ? "
+                 "ORDER BY next_attempt_at, updated_at")
+        params = [PENDING, FAILED, now]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock, self.conn:
+            paths = [row[0] for row in self.conn.execute(query, params)]
+            self.conn.executemany(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE path = ?",
+                [(IN_PROGRESS, now, path) for path in paths]
+            )
+        return [Path(path) for path in paths]
+
+    def remove(self, file_path: Path):
+        """Drop the job for a note that no longer exists"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM jobs WHERE path = ?", (str(file_path),))
+
+    def mark_done(self, file_path: Path, stat: os.stat_result = None):
+        """Record success, remembering the note's final size and mtime"""
+        stat = stat or os.stat(file_path)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, size = ?, mtime_ns = ?, last_error = NULL, updated_at = ? "
+                "WHERE path = ?",
+                (DONE, stat.st_size, stat.st_mtime_ns, time.time(), str(file_path))
+            )
+
+    def mark_failed(self, file_path: Path, error: str) -> str:
+        """Record a failure and schedule a retry; returns the job's new state"""
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT attempts FROM jobs WHERE path = ?", (str(file_path),)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if attempts >= self.max_attempts:
+                state = DEAD
+                next_attempt_at = 0
+                logger.warning(f"Giving up on {file_path} after {attempts} failed attempts: {error}")
+            else:
+                state = FAILED
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+                next_attempt_at = now + delay
+                logger.info(f"Will retry {file_path} in {delay:.0f}s (attempt {attempts} of {self.max_attempts})")
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE path = ?",
+                (state, attempts, next_attempt_at, error, now, str(file_path))
+            )
+        return state
+
+    def counts(self) -> dict:
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def depth(self) -> int:
+        """Jobs still waiting to be (re)processed"""
+        counts = self.counts()
+        return sum(counts.get(state, 0) for state in (PENDING, IN_PROGRESS, FAILED))
+
+    def seconds_until_due(self):
+        """Seconds until the next waiting job is due, or None if nothing is waiting"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_attempt_at) FROM jobs WHERE state IN (?, ?)", (PENDING, FAILED)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def dead_jobs(self) -> list:
+        """(path, attempts, last_error) for every job that was set aside"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT path, attempts, last_error FROM jobs WHERE state = ?", (DEAD,)
+            ).fetchall()
+
+    def purge_done(self, older_than: float = 7 * 86400):
+        """Forget finished jobs older than older_than seconds"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE state = ? AND updated_at < ?", (DONE, time.time() - older_than)
+            )
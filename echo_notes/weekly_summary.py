@@ -3,31 +3,243 @@
 from pathlib import Path
 import os
 import json
-from shared import (
-    config,
-    file_utils,
-    date_helpers,
-    llm_client
+import hashlib
+import logging
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # Try the correct import path first
+    from echo_notes.shared import (
+        config,
+        file_utils,
+        date_helpers,
+        llm_client,
+        chunker,
+        prompt_registry,
+        note_metadata,
+        profiling,
+        atomic_files
+    )
+except ImportError:
+    # Fall back to the old import path
+    from shared import (
+        config,
+        file_utils,
+        date_helpers,
+        llm_client,
+        chunker,
+        prompt_registry,
+        note_metadata,
+        profiling,
+        atomic_files
+    )
+
+logger = logging.getLogger('weekly_summary')
+
+# Partial (per-day / per-chunk) summaries are cached here, keyed by content hash,
+# so re-running mid-week only pays for the days whose notes changed
+PARTIAL_CACHE_PATH = config.STATE_DIR / 'weekly-summary-cache.json'
+PARTIAL_CACHE_MAX_AGE_DAYS = 14
+# Reply budget for each partial summary request
+PARTIAL_REPLY_TOKENS = 1000
+# Reply budget for the weekly summary itself
+WEEKLY_REPLY_TOKENS = 2000
+
+DEFAULT_PARTIAL_SUMMARY_PROMPT = (
+    "You are an AI assistant. You will be given the notes written on one day, headed by its date. "
+    "Summarize them in a few concise bullet points covering themes, "
+    "completed tasks, open issues and plans. Keep any dates and names."
+)
+
+# Used when the partial summaries don't fit the model context together: groups
+# of them are condensed first, then the condensed groups make the weekly summary
+DEFAULT_GROUP_SUMMARY_PROMPT = (
+    "You are an AI assistant. You will be given summaries of several days, each headed by its date. "
+    "Condense them into concise bullet points per day, keeping the date headings, "
+    "completed tasks, open issues, plans, dates and names."
 )
 
 def load_prompts_from_config():
-    with open(config.PROMPTS_CONFIG_PATH, 'r') as f:
-        prompts = json.load(f)
-    return prompts
-
-def main():
-    collected = []
-    for fname in os.listdir(config.NOTES_DIR):
-        file_path = config.NOTES_DIR / fname
+    return prompt_registry.get_prompts()
+
+def load_partial_cache() -> dict:
+    try:
+        with open(PARTIAL_CACHE_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable summary cache {PARTIAL_CACHE_PATH}: {e}")
+        return {}
+
+def save_partial_cache(cache: dict):
+    """Write the cache atomically, dropping days older than the retention window"""
+    cutoff = (datetime.now() - timedelta(days=PARTIAL_CACHE_MAX_AGE_DAYS)).date().isoformat()
+    cache = {key: entry for key, entry in cache.items() if entry.get('day', '') >= cutoff}
+    PARTIAL_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_files.atomic_write(PARTIAL_CACHE_PATH) as f:
+        json.dump(cache, f)
+
+def partial_cache_key(system_message: str, text: str) -> str:
+    digest = hashlib.sha256()
+    for part in (config.LLM_MODEL, system_message, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def collect_recent_notes(days=7) -> dict:
+    """Group the text of recent notes by the day they were written"""
+    notes_by_day = defaultdict(list)
+    notes_dir = config.NOTES_DIR
+    cutoff = datetime.now() - timedelta(days=days)
+    for fname in sorted(os.listdir(notes_dir)):
+        file_path = notes_dir / fname
         if file_path.suffix == '.md' and not fname.startswith('Weekly Summary'):
-            if date_helpers.is_recent_note(file_path, days=7):
+            # A dated filename older than the window is enough to skip a note
+            # unopened, even if its frontmatter would date it differently
+            named_date = note_metadata.date_from_filename(fname)
+            if named_date is not None and named_date <= cutoff:
+                continue
+            # Otherwise dating it reads at most its first HEAD_BYTES (nothing if cached)
+            stat = file_path.stat()
+            head = None
+            metadata = note_metadata.get_cached(file_path, stat)
+            if metadata is None:
+                head = note_metadata.read_head(file_path)
+                metadata = note_metadata.get_metadata(file_path, stat, text=head)
+            if metadata.date <= cutoff:
+                continue
+            if head is not None and stat.st_size <= note_metadata.HEAD_BYTES:
+                # The head is the whole note; normalize newlines as reading it as text would
+                text = head.replace('\r\n', '\n').replace('\r', '\n')
+            else:
                 text = file_utils.get_note_text(file_path)
-                collected.append(text)
-    
+            notes_by_day[metadata.date.date()].append(text)
+    return notes_by_day
+
+def split_day_into_chunks(texts, max_tokens: int) -> list:
+    """Pack a day's notes into chunks of at most max_tokens estimated tokens"""
+    pieces = []
+    for text in texts:
+        pieces.extend(chunker.split_text(text, max_tokens))
+    return pack_pieces(pieces, max_tokens)
+
+def pack_pieces(pieces, max_tokens: int) -> list:
+    """Join consecutive pieces into as few chunks of at most max_tokens as possible"""
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        tokens = chunker.estimate_tokens(piece)
+        if current and size + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def summarize_partials(notes_by_day: dict, partial_prompt: str, use_cache=True, store=True) -> list:
+    """
+    Map step: summarize each day (or chunk of a day), reusing cached results.
+    With store=False new partial summaries are not written to the cache.
+    """
+    stored = load_partial_cache()
+    cache = stored if use_cache else {}
+    context_length = int(config.SCHEDULE_CONFIG.get('model_context_length', config.DEFAULT_MODEL_CONTEXT_LENGTH))
+    jobs = []
+    for day in sorted(notes_by_day):
+        # The date goes in the user message so every request shares the system prompt
+        # as a cacheable prefix; older prompts that still contain {day} get it filled in
+        system_message = partial_prompt.replace('{day}', day.isoformat())
+        budget = chunker.prompt_budget(context_length, system_message, PARTIAL_REPLY_TOKENS)
+        for chunk in split_day_into_chunks(notes_by_day[day], budget):
+            user_message = f"Notes from {day.isoformat()}:\n\n{chunk}"
+            jobs.append((day, system_message, user_message, partial_cache_key(system_message, user_message)))
+
+    misses = [job for job in jobs if job[3] not in cache]
+    logger.info(f"Weekly summary: {len(jobs)} partial summaries, {len(jobs) - len(misses)} cached")
+
+    if misses:
+        concurrency = max(1, int(config.SCHEDULE_CONFIG.get('llm_concurrency', config.DEFAULT_LLM_CONCURRENCY)))
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = pool.map(lambda job: llm_client.query_llm(job[2], job[1], PARTIAL_REPLY_TOKENS), misses)
+                for (day, _, _, key), summary in zip(misses, results):
+                    cache[key] = {'day': day.isoformat(), 'summary': summary}
+        finally:
+            # Keep whatever finished so a retry only redoes the failed parts
+            if store:
+                stored.update(cache)
+                save_partial_cache(stored)
+
+    return [(day, cache[key]['summary']) for day, _, _, key in jobs]
+
+def reduce_partials(partials, weekly_prompt: str, group_prompt: str = DEFAULT_GROUP_SUMMARY_PROMPT) -> str:
+    """
+    Reduce step: combine the partial summaries into the weekly summary.
+
+    If they don't fit the model context in one request, groups that do fit
+    are condensed with group_prompt first, repeatedly, until the result fits.
+    """
+    context_length = int(config.SCHEDULE_CONFIG.get('model_context_length', config.DEFAULT_MODEL_CONTEXT_LENGTH))
+    budget = chunker.prompt_budget(context_length, weekly_prompt, WEEKLY_REPLY_TOKENS)
+    group_budget = chunker.prompt_budget(context_length, group_prompt, PARTIAL_REPLY_TOKENS)
+    texts = [f"## {day.isoformat()}\n{summary}" for day, summary in partials]
+    level = 0
+    while chunker.estimate_tokens("\n\n".join(texts)) > budget and len(texts) > 1:
+        groups = split_day_into_chunks(texts, group_budget)
+        if len(groups) >= len(texts):
+            # Each summary alone fills the budget; pair them up so the reduction still converges
+            groups = ["\n\n".join(texts[i:i + 2]) for i in range(0, len(texts), 2)]
+        level += 1
+        logger.info(f"Weekly summary: partials exceed the context, condensing {len(texts)} "
+                    f"into {len(groups)} groups (level {level})")
+        concurrency = max(1, int(config.SCHEDULE_CONFIG.get('llm_concurrency', config.DEFAULT_LLM_CONCURRENCY)))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            texts = list(pool.map(lambda group: llm_client.query_llm(group, group_prompt, PARTIAL_REPLY_TOKENS),
+                                  groups))
+    return llm_client.query_llm("\n\n".join(texts), weekly_prompt, WEEKLY_REPLY_TOKENS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the weekly summary of recent notes')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always query the LLM instead of reusing cached replies or partial summaries')
+    parser.add_argument('--llm-url', metavar='URL',
+                        help='Send requests to this chat completions endpoint instead (e.g. a mock server); '
+                             'disables the reply cache')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Profile the run, writing pstats and collapsed stacks to {config.STATE_DIR}')
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        llm_client.disable_cache()
+    if args.llm_url:
+        print(f"Using LLM server at {llm_client.use_server(args.llm_url)}")
+
+    logging.basicConfig(level=logging.INFO)
+    with profiling.profiled('weekly-summary', enabled=args.profile):
+        generate(args)
+
+def generate(args):
+    """Summarize the past week's notes into this week's summary file"""
+    notes_by_day = collect_recent_notes(days=7)
+    if not notes_by_day:
+        print("No notes from the past week, skipping weekly summary")
+        return
+
     prompts = load_prompts_from_config()
-    summary = llm_client.query_llm("\n\n".join(collected), prompts['weekly_summary_prompt'])
+    partial_prompt = prompts.get('partial_summary_prompt', DEFAULT_PARTIAL_SUMMARY_PROMPT)
+    partials = summarize_partials(notes_by_day, partial_prompt,
+                                  use_cache=not (args.no_cache or args.llm_url), store=not args.llm_url)
+
+    summary = reduce_partials(partials, prompts['weekly_summary_prompt'],
+                              prompts.get('group_summary_prompt', DEFAULT_GROUP_SUMMARY_PROMPT))
     output_path = config.NOTES_DIR / config.weekly_summary_filename()
     file_utils.write_processed_note(output_path, summary)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
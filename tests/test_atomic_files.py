@@ -0,0 +1,83 @@
+"""
+Tests for atomic note replacement and batched fsyncs.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import atomic_files, file_converters
+except ImportError:
+    from shared import atomic_files, file_converters
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: calls.append(os.fstat(fd).st_ino) or real_fsync(fd))
+    return calls
+
+
+def test_failed_write_leaves_the_note_untouched(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("original")
+    os.chmod(note, 0o640)
+
+    with pytest.raises(RuntimeError):
+        with atomic_files.atomic_write(note) as f:
+            f.write("half a note")
+            raise RuntimeError("stream broke")
+    assert note.read_text() == "original"
+    assert os.listdir(tmp_path) == ["note.md"]
+
+    file_converters.get_writer_for_file(note)(note, "processed")
+    assert note.read_text() == "processed"
+    assert stat.S_IMODE(note.stat().st_mode) == 0o640
+    assert os.listdir(tmp_path) == ["note.md"]
+
+
+@pytest.mark.parametrize('umask', [0o022, 0o077])
+def test_new_file_gets_the_mode_open_would_give_it(tmp_path, umask):
+    old_umask = os.umask(umask)
+    try:
+        with atomic_files.atomic_write(tmp_path / "new.md") as f:
+            f.write("new note")
+        with open(tmp_path / "plain.md", 'w') as f:
+            f.write("plain note")
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE((tmp_path / "new.md").stat().st_mode) == 0o666 & ~umask
+    assert stat.S_IMODE((tmp_path / "new.md").stat().st_mode) == stat.S_IMODE((tmp_path / "plain.md").stat().st_mode)
+
+
+def test_fsync_is_immediate_or_optional(tmp_path, fsyncs):
+    note = tmp_path / "note.md"
+    with atomic_files.atomic_write(note, fsync=True) as f:
+        f.write("a")
+    assert fsyncs == [note.stat().st_ino, tmp_path.stat().st_ino]
+
+    fsyncs.clear()
+    with atomic_files.atomic_write(note, fsync=False) as f:
+        f.write("b")
+    assert fsyncs == []
+
+
+def test_fsyncs_are_batched_until_the_batch_ends(tmp_path, fsyncs):
+    notes = [tmp_path / f"{i}.md" for i in range(3)]
+    with atomic_files.fsync_batch():
+        for note in notes:
+            with atomic_files.atomic_write(note, fsync=True) as f:
+                f.write("text")
+        with atomic_files.fsync_batch():
+            with atomic_files.atomic_write(notes[0], fsync=True) as f:
+                f.write("again")
+        assert fsyncs == []
+
+    assert sorted(fsyncs[:3]) == sorted(note.stat().st_ino for note in notes)
+    assert fsyncs[3:] == [tmp_path.stat().st_ino]
@@ -0,0 +1,64 @@
+"""
+Tests for the token-budget-aware note chunker.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import chunker
+except ImportError:
+    from shared import chunker
+
+
+def paragraphs(count, words=50):
+    return "\n\n".join(f"Paragraph {i} " + "word " * words for i in range(count))
+
+
+def test_short_text_is_a_single_chunk():
+    assert chunker.split_text("just a short note", max_tokens=100) == ["just a short note"]
+
+
+def test_chunks_respect_budget_and_keep_paragraphs_whole():
+    text = paragraphs(40)
+    chunks = chunker.split_text(text, max_tokens=300)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunker.estimate_tokens(chunk) <= 300
+        for paragraph in chunk.split("\n\n"):
+            assert paragraph in text
+
+
+def test_every_paragraph_is_kept():
+    text = paragraphs(40)
+    chunks = chunker.split_text(text, max_tokens=300)
+    joined = "\n\n".join(chunks)
+    for i in range(40):
+        assert f"Paragraph {i} " in joined
+
+
+def test_overlap_repeats_previous_context():
+    chunks = chunker.split_text(paragraphs(40), max_tokens=300, overlap_tokens=80)
+    first_tail = chunks[0].split("\n\n")[-1]
+    assert chunks[1].startswith(first_tail)
+
+
+def test_headings_start_new_blocks():
+    text = "# GOALS\nship it\n# IDEAS\n" + "idea " * 500
+    chunks = chunker.split_text(text, max_tokens=200)
+    assert chunks[0].startswith("# GOALS")
+    assert all(chunker.estimate_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_oversized_paragraph_without_breaks_is_cut():
+    chunks = chunker.split_text("x" * 5000, max_tokens=100)
+    assert "".join(chunks) == "x" * 5000
+    assert all(chunker.estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+
+def test_prompt_budget_reserves_reply_and_system_prompt():
+    budget = chunker.prompt_budget(8192, "s" * 400, max_tokens=2000)
+    assert budget == 8192 - 2000 - chunker.estimate_tokens("s" * 400) - chunker.PROMPT_MARGIN_TOKENS
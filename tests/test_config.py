@@ -0,0 +1,86 @@
+"""
+Tests for the lazily loaded, auto-reloading schedule config.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import config
+except ImportError:
+    from shared import config
+
+
+def write(path, values):
+    path.write_text(json.dumps(values))
+
+
+def test_missing_file_gives_defaults_without_creating_it(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    schedule = config.ScheduleConfig(path)
+    assert schedule.get('processing_interval') == config.DEFAULT_PROCESSING_INTERVAL
+    assert schedule.get('llm_concurrency') == config.DEFAULT_LLM_CONCURRENCY
+    assert not path.exists()
+
+
+def test_values_are_coerced_to_the_default_type(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    write(path, {"llm_concurrency": "4", "watch_notes": "yes", "summary_hour": "noon", "custom": [1]})
+    schedule = config.ScheduleConfig(path)
+    assert schedule.get('llm_concurrency') == 4
+    assert schedule.get('watch_notes') is True
+    assert schedule.get('summary_hour') == config.DEFAULT_SUMMARY_HOUR
+    assert schedule.get('custom') == [1]
+
+
+def test_reloads_only_when_the_file_changes(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    write(path, {"processing_interval": 30})
+    schedule = config.ScheduleConfig(path)
+    seen = []
+    schedule.subscribe(seen.append)
+    assert schedule.get('processing_interval') == 30
+
+    # Unchanged file: nothing to report
+    assert schedule.refresh(force=False) == set()
+
+    write(path, {"processing_interval": 15, "processing_interval_unused": 1})
+    assert schedule.refresh(force=True) == {'processing_interval', 'processing_interval_unused'}
+    assert schedule.get('processing_interval') == 15
+    assert seen == [{'processing_interval', 'processing_interval_unused'}]
+
+
+def test_broken_file_keeps_last_good_values(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    write(path, {"processing_interval": 30})
+    schedule = config.ScheduleConfig(path)
+    assert schedule.get('processing_interval') == 30
+
+    path.write_text("{not json")
+    schedule.refresh(force=True)
+    assert schedule.get('processing_interval') == 30
+
+
+def test_notes_dir_follows_the_file(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    notes = tmp_path / "journal"
+    notes.mkdir()
+    schedule = config.ScheduleConfig(path)
+    schedule.update(notes_directory=str(notes))
+    assert schedule.notes_dir == notes
+    assert json.loads(path.read_text())["notes_directory"] == str(notes)
+
+
+def test_overrides_are_not_saved(tmp_path):
+    path = tmp_path / "schedule_config.json"
+    write(path, {"llm_concurrency": 2})
+    schedule = config.ScheduleConfig(path)
+    schedule.override(llm_concurrency=8)
+    assert schedule.get('llm_concurrency') == 8
+
+    schedule.update(summary_hour=9)
+    assert json.loads(path.read_text()) == {"llm_concurrency": 2, "summary_hour": 9}
+    assert schedule.get('llm_concurrency') == 8
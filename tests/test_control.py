@@ -0,0 +1,91 @@
+"""
+Tests for the daemon's Unix socket control channel.
+"""
+
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import control
+except ImportError:
+    from shared import control
+
+pytestmark = pytest.mark.skipif(not control.is_supported(), reason="Unix domain sockets not supported")
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def status(request):
+        return {'current_job': None, 'queue_depth': 3}
+
+    def process(request):
+        calls.append(request)
+        return {'queued': 'process'}
+
+    server = control.ControlServer({'status': status, 'process': process}, tmp_path / "ctl.sock")
+    server.start()
+    server.calls = calls
+    yield server
+    server.stop()
+
+
+def test_commands_round_trip(server):
+    assert control.send_command('ping', server.socket_path) == {'ok': True}
+    assert control.send_command('status', server.socket_path) == {
+        'ok': True, 'current_job': None, 'queue_depth': 3
+    }
+    assert control.send_command('process', server.socket_path, reason='test') == {
+        'ok': True, 'queued': 'process'
+    }
+    assert server.calls == [{'command': 'process', 'reason': 'test'}]
+
+    reply = control.send_command('bogus', server.socket_path)
+    assert reply['ok'] is False
+    assert 'bogus' in reply['error']
+
+
+def test_socket_is_removed_on_stop(tmp_path):
+    server = control.ControlServer({}, tmp_path / "ctl.sock")
+    server.start()
+    server.stop()
+    assert not server.socket_path.exists()
+    with pytest.raises(OSError):
+        control.send_command('ping', server.socket_path)
+
+
+def test_stale_socket_is_replaced_but_live_one_is_not(tmp_path):
+    path = tmp_path / "ctl.sock"
+    # A socket file nobody is listening on, as left by a crashed daemon
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+
+    server = control.ControlServer({}, path)
+    server.start()
+    try:
+        assert control.send_command('ping', path) == {'ok': True}
+        with pytest.raises(RuntimeError):
+            control.ControlServer({}, path).start()
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('reply', [{'ok': False, 'error': "Unknown command"}, ValueError("Truncated reply")])
+def test_status_script_falls_back_on_bad_replies(tmp_path, monkeypatch, reply):
+    import check_daemon_status
+
+    def send_command(command, **kwargs):
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(check_daemon_status.control, 'send_command', send_command)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    assert check_daemon_status.check_daemon_status() is False
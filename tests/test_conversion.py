@@ -0,0 +1,67 @@
+"""
+Tests for the process-pool conversion stage.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import conversion, file_converters
+except ImportError:
+    from shared import conversion, file_converters
+
+
+def test_inline_conversion_and_errors(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("hello")
+    with conversion.ConversionPool(max_workers=1) as pool:
+        assert pool.convert(note) == "hello"
+        future = pool.submit(tmp_path / "missing.md")
+        with pytest.raises(FileNotFoundError):
+            future.result()
+        assert pool._executor is None
+
+
+def test_docx_is_converted_in_a_worker_process(tmp_path):
+    note = tmp_path / "note.docx"
+    file_converters.write_docx_template(note, "first line\nsecond line")
+    with conversion.ConversionPool(max_workers=2) as pool:
+        assert pool.convert(note) == "first line\nsecond line"
+        assert pool.convert(tmp_path / "note.docx") == "first line\nsecond line"
+        assert pool._executor is not None
+
+
+class RecordingPool:
+    """Completes each conversion from another thread and tracks how many are outstanding"""
+
+    def __init__(self):
+        self.outstanding = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def submit(self, file_path):
+        with self.lock:
+            self.outstanding += 1
+            self.peak = max(self.peak, self.outstanding)
+        future = Future()
+        threading.Timer(0.001, future.set_result, args=(f"text of {file_path}",)).start()
+        return future
+
+
+def test_background_conversion_is_bounded(tmp_path):
+    pool = RecordingPool()
+    paths = [tmp_path / f"{i}.md" for i in range(20)]
+    results = {}
+    for file_path, future in conversion.convert_in_background(paths, pool, max_pending=3):
+        with pool.lock:
+            pool.outstanding -= 1
+        results[file_path] = future.result()
+    assert results == {path: f"text of {path}" for path in paths}
+    # max_pending, plus the note just handed to the consumer
+    assert pool.peak <= 4
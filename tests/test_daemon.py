@@ -0,0 +1,64 @@
+"""
+Tests for the daemon's job bookkeeping.
+"""
+
+import datetime
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import metrics
+except ImportError:
+    from shared import metrics
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    # Importing the daemon opens its log file under ~/Documents/notes
+    monkeypatch.setenv('HOME', str(tmp_path))
+    (tmp_path / 'Documents' / 'notes').mkdir(parents=True)
+    try:
+        module = importlib.import_module('echo_notes.daemon')
+    except ImportError:
+        module = importlib.import_module('daemon')
+    monkeypatch.setattr(module, 'daemon_state', dict(module.daemon_state, last_runs={}))
+    return module
+
+
+def runs(job, outcome):
+    return metrics.RUNS.value(job=job, outcome=outcome)
+
+
+def test_run_job_records_success(daemon):
+    finished = datetime.datetime(2024, 1, 1, 12, 0)
+    ok, errors = runs('test-ok', 'ok'), runs('test-ok', 'error')
+
+    assert daemon.run_job('test-ok', lambda: finished) == finished
+    assert runs('test-ok', 'ok') == ok + 1
+    assert runs('test-ok', 'error') == errors
+    assert daemon.daemon_state['last_runs']['test-ok'] == finished
+    assert daemon.daemon_state['current_job'] is None
+
+
+def test_run_job_records_failed_processing_run(daemon, monkeypatch):
+    try:
+        from echo_notes import notes_nextcloud
+    except ImportError:
+        import notes_nextcloud
+
+    def broken_run(paths=None, work_queue=None):
+        raise RuntimeError("notes directory is unreadable")
+
+    monkeypatch.setattr(notes_nextcloud, 'run', broken_run)
+    ok, errors = runs('test-process', 'ok'), runs('test-process', 'error')
+
+    assert daemon.run_job('test-process', daemon.run_process_notes) is None
+    assert runs('test-process', 'error') == errors + 1
+    assert runs('test-process', 'ok') == ok
+    assert 'test-process' not in daemon.daemon_state['last_runs']
+    assert daemon.daemon_state['current_job'] is None
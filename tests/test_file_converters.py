@@ -4,8 +4,11 @@ Test file converters for different file formats.
 
 import os
 import sys
+import tempfile
 import unittest
+import zipfile
 from pathlib import Path
+from unittest import mock
 
 # Add the parent directory to the path so we can import the echo_notes package
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -90,7 +93,9 @@ class TestFileConverters(unittest.TestCase):
         
         # Test with a .docx file (we don't need an actual file for this test)
         docx_file = Path('test.docx')
-        docx_writer = file_converters.get_writer_for_file(docx_file)
+        docx_writer = file_converters.get_writer_for_file(docx_file, docx_writer='template')
+        self.assertEqual(docx_writer, file_converters.write_docx_template)
+        docx_writer = file_converters.get_writer_for_file(docx_file, docx_writer='python-docx')
         self.assertEqual(docx_writer, file_converters.text_to_docx)
         
         # Test with an unsupported file format
@@ -98,5 +103,104 @@ class TestFileConverters(unittest.TestCase):
         unsupported_writer = file_converters.get_writer_for_file(unsupported_file)
         self.assertIsNone(unsupported_writer)
 
+    def write_document_xml(self, path, body, namespace=file_converters.WORD_NAMESPACES[0]):
+        """Write a minimal .docx holding only word/document.xml"""
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('word/document.xml',
+                             f'<?xml version="1.0" encoding="UTF-8"?>'
+                             f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>')
+
+    def test_streaming_docx_reader(self):
+        """Paragraphs, tabs, breaks, tables and text boxes come out in document order."""
+        body = (
+            '<w:p><w:r><w:t>Hello </w:t></w:r><w:r><w:t>world</w:t></w:r></w:p>'
+            '<w:p/>'
+            '<w:p><w:r><w:t>a</w:t><w:tab/><w:t>b</w:t><w:br/><w:t>c</w:t></w:r></w:p>'
+            '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+            '<w:p><w:r><w:t>before</w:t></w:r><w:r><w:pict><w:txbxContent>'
+            '<w:p><w:r><w:t>boxed</w:t></w:r></w:p></w:txbxContent></w:pict></w:r>'
+            '<w:r><w:t xml:space="preserve"> after</w:t></w:r></w:p>'
+            '<w:p><w:del><w:r><w:delText>removed</w:delText></w:r></w:del></w:p>'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'note.docx'
+            self.write_document_xml(path, body)
+            self.assertEqual(list(file_converters.iter_docx_paragraphs(path)),
+                             ['Hello world', '', 'a\tb\nc', 'cell', 'boxed', 'before after', ''])
+            self.assertEqual(file_converters.docx_to_text(path), 'Hello world\n\na\tb\nc\ncell\nboxed\nbefore after\n')
+
+            strict = Path(tmp) / 'strict.docx'
+            self.write_document_xml(strict, '<w:p><w:r><w:t>strict</w:t></w:r></w:p>',
+                                    namespace=file_converters.WORD_NAMESPACES[1])
+            self.assertEqual(file_converters.docx_to_text(strict), 'strict')
+
+    def test_streaming_docx_reader_matches_python_docx(self):
+        """Without tables both readers give the same text."""
+        try:
+            import docx
+        except ImportError:
+            self.skipTest('python-docx not installed')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'note.docx'
+            document = docx.Document()
+            document.add_heading('Meeting', level=1)
+            document.add_paragraph('First point')
+            document.add_paragraph('')
+            document.add_paragraph('Second ').add_run('point').bold = True
+            document.save(path)
+            self.assertEqual(file_converters.docx_to_text(path),
+                             file_converters._docx_to_text_python_docx(path))
+
+    def test_docx_falls_back_to_python_docx(self):
+        """Documents the streaming reader can't handle go through python-docx."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'odd.docx'
+            with zipfile.ZipFile(path, 'w') as archive:
+                archive.writestr('word/other.xml', '<x/>')
+            with mock.patch.object(file_converters, '_docx_to_text_python_docx',
+                                   return_value='fallback') as fallback:
+                self.assertEqual(file_converters.docx_to_text(path), 'fallback')
+            fallback.assert_called_once_with(path)
+
+    def test_template_docx_writer_round_trips(self):
+        """The template writer's output reads back line for line with both readers."""
+        content = 'SUMMARY (2024-03-04 08:30)\n\n<Tasks> & "plans"\tdue\r\nbell\x07gone\n'
+        expected = ['SUMMARY (2024-03-04 08:30)', '', '<Tasks> & "plans"\tdue', 'bellgone', '']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'note.docx'
+            file_converters.write_docx_template(path, content)
+            self.assertEqual(list(file_converters.iter_docx_paragraphs(path)), expected)
+            self.assertEqual(os.listdir(tmp), ['note.docx'])
+            try:
+                import docx
+            except ImportError:
+                return
+            self.assertEqual([p.text for p in docx.Document(str(path)).paragraphs], expected)
+
+    def test_template_docx_writer_keeps_source_styles(self):
+        """Overwriting a note keeps its styles part; new files get the default one."""
+        styles = (f'<w:styles xmlns:w="{file_converters.WORD_NAMESPACES[0]}">'
+                  '<w:style w:type="paragraph" w:styleId="Custom"/></w:styles>').encode('utf-8')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'note.docx'
+            self.write_document_xml(path, '<w:p><w:r><w:t>raw</w:t></w:r></w:p>')
+            with zipfile.ZipFile(path, 'a') as archive:
+                archive.writestr('word/styles.xml', styles)
+
+            file_converters.write_docx_template(path, 'processed')
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(archive.read('word/styles.xml'), styles)
+            self.assertEqual(file_converters.docx_to_text(path), 'processed')
+
+            other = Path(tmp) / 'other.docx'
+            file_converters.write_docx_template(other, 'text', styles_from=path)
+            with zipfile.ZipFile(other) as archive:
+                self.assertEqual(archive.read('word/styles.xml'), styles)
+
+            fresh = Path(tmp) / 'fresh.docx'
+            file_converters.write_docx_template(fresh, 'text')
+            with zipfile.ZipFile(fresh) as archive:
+                self.assertIn(b'w:styleId="Normal"', archive.read('word/styles.xml'))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
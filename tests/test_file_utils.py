@@ -32,3 +32,47 @@ def test_note_processing(tmp_path):
     file_utils.write_processed_note(note, processed_text)
 
     assert file_utils.is_processed_note(note.read_text()) is True
+
+
+def test_streamed_note_replaces_original(tmp_path):
+    note = tmp_path / "test.md"
+    note.write_text("RAW NOTE CONTENT")
+
+    file_utils.write_processed_note_stream(note, iter(["PROCESSED ", config.SUMMARY_MARKER]))
+
+    assert note.read_text() == f"PROCESSED {config.SUMMARY_MARKER}"
+    assert list(tmp_path.iterdir()) == [note]
+
+
+def test_failed_stream_keeps_original(tmp_path):
+    note = tmp_path / "test.md"
+    note.write_text("RAW NOTE CONTENT")
+
+    def broken_stream():
+        yield "PARTIAL"
+        raise RuntimeError("connection dropped")
+
+    try:
+        file_utils.write_processed_note_stream(note, broken_stream())
+    except RuntimeError:
+        pass
+
+    assert note.read_text() == "RAW NOTE CONTENT"
+    assert list(tmp_path.iterdir()) == [note]
+
+
+def test_find_latest_note_times(tmp_path):
+    assert file_utils.find_latest_note_times(tmp_path / "missing") == (None, None)
+
+    old_note = tmp_path / "old.md"
+    new_note = tmp_path / "new.docx"
+    summary = tmp_path / "Weekly Summary - 2024-01-07.md"
+    for path in (old_note, new_note, summary, tmp_path / ".hidden.md", tmp_path / "image.png"):
+        path.write_text("x")
+    os.utime(old_note, (1000, 1000))
+    os.utime(new_note, (2000, 2000))
+    os.utime(summary, (3000, 3000))
+    os.utime(tmp_path / ".hidden.md", (9000, 9000))
+    os.utime(tmp_path / "image.png", (9000, 9000))
+
+    assert file_utils.find_latest_note_times(tmp_path) == (2000, 3000)
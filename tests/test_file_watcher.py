@@ -0,0 +1,183 @@
+"""
+Tests for the daemon's directory watcher.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import file_watcher
+    from echo_notes.shared.file_watcher import NotesWatcher
+except ImportError:
+    from shared import file_watcher
+    from shared.file_watcher import NotesWatcher
+
+POLL = 0.02
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Changes:
+    """on_change callback that tests can wait on"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def __call__(self):
+        self._event.set()
+
+    def wait(self, timeout=2):
+        fired = self._event.wait(timeout)
+        self._event.clear()
+        return fired
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(file_watcher, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def watch(tmp_path):
+    watchers = []
+
+    def start(**kwargs):
+        changes = Changes()
+        watcher = NotesWatcher(tmp_path, on_change=changes, **kwargs)
+        watcher.start()
+        watchers.append(watcher)
+        # Let the polling thread take its first snapshot
+        time.sleep(POLL * 3)
+        return watcher, changes
+
+    yield start
+    for watcher in watchers:
+        watcher.stop()
+
+
+def test_paths_are_ready_only_after_settling(tmp_path, clock):
+    watcher = NotesWatcher(tmp_path, settle_seconds=5)
+    assert watcher.seconds_until_ready() is None
+    assert watcher.pop_ready() == []
+
+    watcher._mark('a.md')
+    clock.now += 3
+    watcher._mark('b.md')
+    assert watcher.seconds_until_ready() == pytest.approx(2)
+    assert watcher.pop_ready() == []
+
+    clock.now += 2
+    assert watcher.seconds_until_ready() == 0
+    assert watcher.pop_ready() == [tmp_path / 'a.md']
+    assert watcher.seconds_until_ready() == pytest.approx(3)
+
+    # Another event restarts the quiet period
+    clock.now += 2
+    watcher._mark('b.md')
+    clock.now += 4
+    assert watcher.pop_ready() == []
+    assert watcher.seconds_until_ready() == pytest.approx(1)
+    clock.now += 1
+    assert watcher.pop_ready() == [tmp_path / 'b.md']
+    assert watcher.seconds_until_ready() is None
+
+
+def test_rejected_paths_are_not_tracked(tmp_path, clock):
+    calls = []
+    watcher = NotesWatcher(tmp_path, accept=lambda path: path.suffix == '.md', settle_seconds=0,
+                           on_change=lambda: calls.append(1))
+    watcher._mark('.note.md.swp')
+    assert watcher.pop_ready() == [] and calls == []
+    watcher._mark('note.md')
+    assert watcher.pop_ready() == [tmp_path / 'note.md'] and calls == [1]
+
+
+def test_polling_reports_created_and_modified_files(tmp_path, watch):
+    watcher, changes = watch(use_inotify=False, poll_interval=POLL, settle_seconds=0)
+    assert watcher.backend == 'polling'
+    note = tmp_path / 'note.md'
+
+    note.write_text("first draft")
+    assert changes.wait()
+    assert watcher.pop_ready() == [note]
+
+    note.write_text("second, longer draft")
+    assert changes.wait()
+    assert watcher.pop_ready() == [note]
+
+    # Nothing changed since the last poll
+    assert not changes.wait(POLL * 5)
+    assert watcher.pop_ready() == []
+
+
+def test_polling_ignores_deleted_files_and_directory(tmp_path, watch):
+    note = tmp_path / 'note.md'
+    note.write_text("notes")
+    watcher, changes = watch(use_inotify=False, poll_interval=POLL, settle_seconds=0)
+
+    note.unlink()
+    assert not changes.wait(POLL * 5)
+    assert watcher.pop_ready() == []
+
+    # A removed directory reads as empty until it comes back
+    tmp_path.rmdir()
+    assert not changes.wait(POLL * 5)
+    assert watcher.is_alive()
+    tmp_path.mkdir()
+    note.write_text("notes again")
+    assert changes.wait()
+    assert watcher.pop_ready() == [note]
+
+
+def test_falls_back_to_polling_without_inotify(tmp_path, monkeypatch, watch):
+    monkeypatch.setattr(file_watcher, '_load_libc', lambda: None)
+    watcher, changes = watch(poll_interval=POLL, settle_seconds=0)
+    assert watcher.backend == 'polling'
+    (tmp_path / 'note.md').write_text("notes")
+    assert changes.wait()
+    assert watcher.pop_ready() == [tmp_path / 'note.md']
+
+
+def test_falls_back_to_polling_when_the_watch_cannot_be_added(tmp_path, monkeypatch):
+    if file_watcher._load_libc() is None:
+        pytest.skip("inotify is not available")
+    watcher = NotesWatcher(tmp_path / 'missing', poll_interval=POLL)
+    watcher.start()
+    try:
+        assert watcher.backend == 'polling'
+        assert watcher.is_alive()
+    finally:
+        watcher.stop()
+
+
+def test_inotify_reports_changes_and_a_removed_directory(tmp_path, watch):
+    if file_watcher._load_libc() is None:
+        pytest.skip("inotify is not available")
+    watcher, changes = watch(settle_seconds=0)
+    assert watcher.backend == 'inotify'
+
+    note = tmp_path / 'note.md'
+    note.write_text("notes")
+    assert changes.wait()
+    assert watcher.pop_ready() == [note]
+
+    note.unlink()
+    tmp_path.rmdir()
+    assert changes.wait()
+    watcher._thread.join(timeout=2)
+    assert watcher.rescan_needed
+    assert not watcher.is_alive()
@@ -0,0 +1,69 @@
+"""
+Tests for the on-disk LLM response cache.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared.llm_cache import ResponseCache, cache_key
+except ImportError:
+    from shared.llm_cache import ResponseCache, cache_key
+
+
+def test_key_depends_on_every_input():
+    base = cache_key("model", "system", "prompt", 100)
+    assert base == cache_key("model", "system", "prompt", 100)
+    assert base != cache_key("other", "system", "prompt", 100)
+    assert base != cache_key("model", "other", "prompt", 100)
+    assert base != cache_key("model", "system", "other", 100)
+    assert base != cache_key("model", "system", "prompt", 200)
+
+
+def test_roundtrip_survives_reopen(tmp_path):
+    db = tmp_path / "cache.sqlite"
+    cache = ResponseCache(db, max_bytes=1024)
+    cache.put("k", "reply")
+    cache.close()
+
+    cache = ResponseCache(db, max_bytes=1024)
+    assert cache.get("k") == "reply"
+    assert cache.get("missing") is None
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    assert cache.get("a") == "x" * 10  # "b" is now least recently used
+    cache.put("c", "z" * 10)
+
+    assert cache.get("a") == "x" * 10
+    assert cache.get("b") is None
+    assert cache.get("c") == "z" * 10
+    cache.close()
+
+
+def test_prompt_changes_invalidate_cache(tmp_path):
+    prompts = tmp_path / "prompts_config.json"
+    prompts.write_text('{"daily_notes_prompt": "v1"}')
+    db = tmp_path / "cache.sqlite"
+
+    cache = ResponseCache(db, max_bytes=1024, prompts_path=prompts)
+    cache.put("k", "reply")
+    assert cache.get("k") == "reply"
+
+    prompts.write_text('{"daily_notes_prompt": "version 2"}')
+    assert cache.get("k") is None
+    cache.close()
+
+    # Reopening with unchanged prompts keeps new entries
+    cache = ResponseCache(db, max_bytes=1024, prompts_path=prompts)
+    cache.put("k", "reply")
+    cache.close()
+    cache = ResponseCache(db, max_bytes=1024, prompts_path=prompts)
+    assert cache.get("k") == "reply"
+    cache.close()
@@ -0,0 +1,140 @@
+"""
+Tests for the pooled LLM client against a throwaway local HTTP server.
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import llm_client
+except ImportError:
+    from shared import llm_client
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Serves canned completions (or SSE streams), answering 503 to the first `failures` requests"""
+    failures = 0
+    requests_seen = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests_seen.append(body)
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for piece in ["Hel", "lo ", "wörld"]:
+                event = {"choices": [{"delta": {"content": piece}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        if type(self).failures > 0:
+            type(self).failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        reply = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.failures = 0
+    FlakyHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1/chat/completions"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_query_returns_content(server):
+    client = llm_client.LLMClient(url=server, model="test-model")
+    assert client.query("hello", "system", max_tokens=10) == "ok"
+
+    sent = FlakyHandler.requests_seen[0]
+    assert sent["model"] == "test-model"
+    assert sent["messages"][0] == {"role": "system", "content": "system"}
+    client.close()
+
+
+def test_query_retries_on_503(server):
+    FlakyHandler.failures = 2
+    client = llm_client.LLMClient(url=server, max_retries=3, backoff=0)
+    assert client.query("hello", "system") == "ok"
+    assert len(FlakyHandler.requests_seen) == 3
+    client.close()
+
+
+def test_query_gives_up_after_retries(server):
+    FlakyHandler.failures = 10
+    client = llm_client.LLMClient(url=server, max_retries=1, backoff=0)
+    with pytest.raises(RuntimeError):
+        client.query("hello", "system")
+    client.close()
+
+
+def test_stream_yields_deltas(server):
+    client = llm_client.LLMClient(url=server)
+    assert list(client.stream("hello", "system")) == ["Hel", "lo ", "wörld"]
+    assert FlakyHandler.requests_seen[0]["stream"] is True
+    client.close()
+
+
+def test_cached_reply_skips_server(server, tmp_path):
+    cache = llm_client.ResponseCache(tmp_path / "cache.sqlite", max_bytes=1024)
+    client = llm_client.LLMClient(url=server, model="test-model", cache=cache)
+    assert client.query("hello", "system") == "ok"
+    assert client.query("hello", "system") == "ok"
+    assert len(FlakyHandler.requests_seen) == 1
+    client.close()
+    cache.close()
+
+
+def test_llama_cpp_hints_pin_requests_to_slots(server):
+    client = llm_client.LLMClient(url=server, max_in_flight=2, server_hints=True)
+    client.query("first", "system", max_tokens=10)
+    client.query("second", "system", max_tokens=10)
+    # Sequential requests reuse the slot that already holds the system prompt
+    assert [(r["cache_prompt"], r["id_slot"]) for r in FlakyHandler.requests_seen] == [(True, 0), (True, 0)]
+
+    plain = llm_client.LLMClient(url=server, max_in_flight=2, server_hints=False)
+    plain.query("third", "system", max_tokens=10)
+    assert "cache_prompt" not in FlakyHandler.requests_seen[-1]
+    assert "id_slot" not in FlakyHandler.requests_seen[-1]
+    client.close()
+    plain.close()
+
+
+def test_config_change_closes_the_shared_client(monkeypatch):
+    class Client:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    old = Client()
+    monkeypatch.setattr(llm_client, '_client', old)
+    llm_client._on_config_change({'processing_interval'})
+    assert llm_client._client is old and not old.closed
+
+    llm_client._on_config_change({'llm_concurrency'})
+    assert llm_client._client is None
+    assert old.closed
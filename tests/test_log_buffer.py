@@ -0,0 +1,66 @@
+"""
+Tests for the dashboard's bounded log buffer.
+"""
+
+import logging
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared.log_buffer import LogBuffer
+except ImportError:
+    from shared.log_buffer import LogBuffer
+
+
+def make_logger(buffer, name):
+    log = logging.getLogger(f'test_log_buffer.{name}')
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.handlers = [buffer]
+    return log
+
+
+def test_drain_returns_new_lines_once():
+    buffer = LogBuffer(max_lines=10)
+    buffer.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    log = make_logger(buffer, 'drain')
+
+    log.info("first")
+    log.debug("second")
+    assert buffer.drain() == (["INFO first", "DEBUG second"], False)
+    assert buffer.drain() == ([], False)
+    log.warning("third")
+    assert buffer.drain() == (["WARNING third"], False)
+    assert buffer.lines() == ["INFO first", "DEBUG second", "WARNING third"]
+
+
+def test_overflow_between_drains_resets_the_view_to_the_newest_lines():
+    buffer = LogBuffer(max_lines=100)
+    log = make_logger(buffer, 'overflow')
+
+    threads = [threading.Thread(target=lambda t=t: [log.info(f"{t}-{i}") for i in range(2500)]) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines, reset = buffer.drain()
+    assert reset
+    assert len(lines) == 100
+    assert buffer.lines() == lines
+    log.info("after")
+    assert buffer.drain() == (["after"], False)
+
+
+def test_resize_keeps_the_newest_lines():
+    buffer = LogBuffer(max_lines=5)
+    log = make_logger(buffer, 'resize')
+    for i in range(5):
+        log.info(str(i))
+    buffer.resize(3)
+    assert buffer.drain() == (["2", "3", "4"], True)
+    buffer.clear()
+    assert buffer.lines() == []
@@ -0,0 +1,56 @@
+"""
+Tests for the daemon's memory tracker.
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared.memory_tracking import MemoryTracker, rss_bytes
+except ImportError:
+    from shared.memory_tracking import MemoryTracker, rss_bytes
+
+retained = []
+
+
+def leaky_job():
+    retained.append([str(i) * 10 for i in range(20000)])
+
+
+def test_reports_allocation_growth_between_cycles(tmp_path):
+    path = tmp_path / 'memory.log'
+    tracker = MemoryTracker(path, top=5)
+    assert not tracemalloc.is_tracing()
+    tracker.start()
+    try:
+        assert tracker.running
+        leaky_job()
+        tracker.record('process')
+    finally:
+        tracker.stop()
+        retained.clear()
+    assert not tracemalloc.is_tracing()
+    assert not tracker.running
+
+    report = path.read_text()
+    assert 'cycle 0: tracking started' in report
+    assert 'cycle 1: process' in report
+    assert 'RSS ' in report and 'uncollectable' in report
+    growth = report.split('cycle 1: process', 1)[1]
+    assert 'Top ' in growth
+    # The leak is the largest growth of the cycle
+    first_site = growth.split('allocation changes since the previous cycle:\n', 1)[1].splitlines()[0]
+    assert 'test_memory_tracking.py' in first_site
+    assert 'tracking stopped' in report
+
+
+def test_record_is_a_no_op_when_not_tracking(tmp_path):
+    tracker = MemoryTracker(tmp_path / 'memory.log')
+    tracker.record('process')
+    tracker.stop()
+    assert not (tmp_path / 'memory.log').exists()
+    if sys.platform.startswith('linux'):
+        assert rss_bytes() > 0
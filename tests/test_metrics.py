@@ -0,0 +1,115 @@
+"""
+Tests for the metrics registry, its exporters and the LLM client's instrumentation.
+"""
+
+import os
+import socket
+import sys
+
+import pytest
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'benchmarks'))
+
+try:
+    from echo_notes.shared import llm_client, metrics
+except ImportError:
+    from shared import llm_client, metrics
+
+from mock_llm_server import running_server
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_prometheus_text_format():
+    registry = metrics.Registry()
+    skipped = registry.counter('skipped_total', 'Skipped notes')
+    skipped.inc(3, reason='unchanged')
+    skipped.inc(reason='already "processed"')
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render_prometheus()
+    assert '# TYPE skipped_total counter' in text
+    assert 'skipped_total{reason="unchanged"} 3' in text
+    assert 'skipped_total{reason="already \\"processed\\""} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+    assert 'latency_seconds_sum 5.55' in text
+
+
+def test_json_snapshot_round_trip(tmp_path):
+    metrics.FILES_PROCESSED.inc(4)
+    metrics.FILES_FAILED.inc(stage='conversion')
+    metrics.LLM_REQUEST_SECONDS.observe(2.0)
+    metrics.LLM_REQUEST_SECONDS.observe(4.0)
+
+    path = tmp_path / 'metrics.json'
+    metrics.write_json(path)
+    snapshot = metrics.read_json(path)
+    assert metrics.sample_value(snapshot, metrics.FILES_PROCESSED.name) == 4
+    assert metrics.sample_value(snapshot, metrics.FILES_FAILED.name, stage='conversion') == 1
+    assert metrics.sample_value(snapshot, metrics.FILES_FAILED.name, stage='processing') == 0
+    assert metrics.summarize(snapshot).startswith("4 processed, 1 failed, 0 scanned, LLM 3.0s avg over 2 requests")
+    assert metrics.read_json(tmp_path / 'missing.json') is None
+    assert metrics.summarize(None) == "No metrics yet"
+
+
+def test_publisher_serves_and_writes_metrics(tmp_path):
+    port = free_port()
+    path = tmp_path / 'metrics.json'
+    publisher = metrics.MetricsPublisher(port=port, interval=60, json_path=path).start()
+    try:
+        metrics.FILES_SCANNED.inc(7)
+        response = requests.get(f'http://127.0.0.1:{port}/metrics', timeout=5)
+        assert response.status_code == 200
+        assert 'echo_notes_files_scanned_total 7' in response.text
+        snapshot = requests.get(f'http://127.0.0.1:{port}/metrics.json', timeout=5).json()
+        assert metrics.sample_value(snapshot, metrics.FILES_SCANNED.name) == 7
+    finally:
+        publisher.stop()
+    # The final numbers are left for the dashboard
+    assert metrics.sample_value(metrics.read_json(path), metrics.FILES_SCANNED.name) == 7
+
+
+def test_llm_client_records_latency_tokens_and_errors():
+    with running_server(time_scale=0.001, reply_tokens=30) as server:
+        client = llm_client.LLMClient(url=server.url, max_retries=0)
+        client.query("one two three", "system")
+        ''.join(client.stream("one two three", "system"))
+        client.close()
+
+    assert metrics.LLM_COMPLETION_TOKENS.value() == 60
+    assert metrics.LLM_PROMPT_TOKENS.value() > 0
+    assert metrics.LLM_REQUEST_SECONDS.samples()[0]['count'] == 2
+
+    with running_server(error_429_rate=1.0) as server:
+        client = llm_client.LLMClient(url=server.url, max_retries=0)
+        with pytest.raises(RuntimeError):
+            client.query("one two three", "system")
+        client.close()
+
+    client = llm_client.LLMClient(url=f'http://127.0.0.1:{free_port()}/v1/chat/completions', max_retries=0)
+    with pytest.raises(RuntimeError):
+        client.query("one two three", "system")
+    client.close()
+
+    assert metrics.LLM_ERRORS.value(type='http_429') == 1
+    assert metrics.LLM_ERRORS.value(type='connection') == 1
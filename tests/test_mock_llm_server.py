@@ -0,0 +1,145 @@
+"""
+Tests for the mock LLM server in tools/benchmarks.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'benchmarks'))
+
+try:
+    from echo_notes.shared import llm_client, metrics
+    from echo_notes.shared.llm_cache import ResponseCache
+except ImportError:
+    from shared import llm_client, metrics
+    from shared.llm_cache import ResponseCache
+
+from mock_llm_server import running_server
+
+
+def post(server, prompt="hello", timeout=5, **fields):
+    payload = dict(llm_client.build_payload(prompt, "system", 100), **fields)
+    return requests.post(server.url, json=payload, timeout=timeout)
+
+
+def test_completions_and_streaming_through_the_client():
+    with running_server(time_scale=0.001, reply_tokens=40) as server:
+        client = llm_client.LLMClient(url=server.url, max_retries=0)
+        reply = client.query("one two three", "system")
+        assert 'CLEANED & STRUCTURED NOTES' in reply
+        assert ''.join(client.stream("one two three", "system")).split('\n\n', 1)[1] == reply.split('\n\n', 1)[1]
+        client.close()
+        assert server.stats['statuses'] == {'200': 2}
+        assert server.stats['completion_tokens'] == 80
+
+
+def test_slots_queue_requests_and_reject_past_max_queue():
+    with running_server(slots=1, max_queue=1, prompt_tps=1e9, gen_tps=100, reply_tokens=20) as server:
+        statuses = []
+        threads = [threading.Thread(target=lambda: statuses.append(post(server).status_code)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # One runs, one waits for the slot, one finds the queue full
+        assert sorted(statuses) == [200, 200, 503]
+        assert server.stats['max_waiting'] == 1
+        assert server.stats['faults'] == {'queue_full': 1}
+
+
+def test_fixed_latency_without_token_timing():
+    inf = float('inf')
+    with running_server(slots=4, latency=0.2, prompt_tps=inf, gen_tps=inf, reply_tokens=10) as server:
+        elapsed = []
+
+        def timed_post():
+            started = time.monotonic()
+            post(server, "word " * 2000)
+            elapsed.append(time.monotonic() - started)
+
+        threads = [threading.Thread(target=timed_post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Every request waits out the latency, and with a slot each none of them queue
+        assert len(elapsed) == 4 and min(elapsed) >= 0.2
+        assert server.stats['max_waiting'] == 0
+        assert server.stats['requests'] == 4
+        assert server.stats['statuses'] == {'200': 4}
+
+
+def test_prompt_cache_reuses_a_slots_prefix():
+    with running_server(slots=2, time_scale=0.001) as server:
+        system = "You clean up notes. " * 20
+        for note in ("first note", "second note"):
+            payload = dict(llm_client.build_payload(note, system, 50), cache_prompt=True, id_slot=1)
+            assert requests.post(server.url, json=payload, timeout=5).json()['timings']['cache_n'] == (
+                0 if note == "first note" else len(system) // 4
+            )
+        assert server.stats['cached_prompt_tokens'] == len(system) // 4
+
+
+def test_injected_faults():
+    with running_server(error_429_rate=1.0, retry_after=7) as server:
+        response = post(server)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '7'
+
+    with running_server(timeout_rate=1.0, hang_seconds=1.0) as server:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            post(server, timeout=0.1)
+        assert server.stats['faults'] == {'timeout': 1}
+
+
+def request_count():
+    return sum(sample['count'] for sample in metrics.LLM_REQUEST_SECONDS.samples())
+
+
+def test_async_client_shares_the_cap_cache_and_metrics(tmp_path):
+    # Two slots and no queue: a third concurrent request would get a 503
+    with running_server(slots=2, max_queue=0, prompt_tps=1e9, gen_tps=200, reply_tokens=10) as server:
+        client = llm_client.LLMClient(url=server.url, max_retries=0, max_in_flight=2,
+                                      cache=ResponseCache(tmp_path / 'cache.sqlite', 1 << 20))
+        async_client = llm_client.AsyncLLMClient(client)
+        before = request_count()
+
+        async def ask_all():
+            return await asyncio.gather(*(async_client.query(f"note {i}", "system") for i in range(6)))
+
+        replies = asyncio.run(ask_all())
+        assert all('CLEANED & STRUCTURED NOTES' in reply for reply in replies)
+        assert server.stats['statuses'] == {'200': 6}
+        assert request_count() == before + 6
+
+        # Answered from the shared cache without reaching the server
+        assert asyncio.run(ask_all()) == replies
+        assert server.stats['requests'] == 6
+
+        async def stream():
+            return [piece async for piece in async_client.stream("streamed note", "system")]
+
+        pieces = asyncio.run(stream())
+        assert len(pieces) > 1
+        assert client.in_flight == 0
+        assert asyncio.run(async_client.query("streamed note", "system")) == ''.join(pieces)
+        assert server.stats['requests'] == 7
+        client.close()
+
+
+def test_use_server_normalizes_the_url(monkeypatch):
+    monkeypatch.setattr(llm_client.config, 'LM_URL', llm_client.config.LM_URL)
+    monkeypatch.setattr(llm_client, '_cache_disabled', False)
+    monkeypatch.setattr(llm_client, '_client', None)
+    assert llm_client.use_server("http://127.0.0.1:8081") == "http://127.0.0.1:8081/v1/chat/completions"
+    assert llm_client.use_server("http://h/v1/") == "http://h/v1/chat/completions"
+    assert llm_client.config.LM_URL == "http://h/v1/chat/completions"
+    assert llm_client.get_client().cache is None
@@ -0,0 +1,71 @@
+"""
+Tests for the persistent processed-note index.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared.note_index import NoteIndex
+except ImportError:
+    from shared.note_index import NoteIndex
+
+
+def test_unknown_note_is_not_processed(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("raw")
+
+    with NoteIndex(tmp_path / "index.sqlite") as index:
+        assert index.is_processed(note) is False
+
+
+def test_recorded_note_survives_reopen(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("processed")
+    db = tmp_path / "index.sqlite"
+
+    with NoteIndex(db) as index:
+        index.record(note, processed=True)
+
+    with NoteIndex(db) as index:
+        assert index.is_processed(note) is True
+
+
+def test_touched_note_with_same_content_stays_processed(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("processed")
+
+    with NoteIndex(tmp_path / "index.sqlite") as index:
+        index.record(note, processed=True)
+        stat = note.stat()
+        os.utime(note, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert index.is_processed(note) is True
+
+
+def test_changed_note_needs_processing(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("processed")
+
+    with NoteIndex(tmp_path / "index.sqlite") as index:
+        index.record(note, processed=True)
+        note.write_text("edited afterwards")
+        assert index.is_processed(note) is False
+
+
+def test_clear_and_prune(tmp_path):
+    kept = tmp_path / "kept.md"
+    gone = tmp_path / "gone.md"
+    kept.write_text("a")
+    gone.write_text("b")
+
+    with NoteIndex(tmp_path / "index.sqlite") as index:
+        index.record(kept, processed=True)
+        index.record(gone, processed=True)
+        gone.unlink()
+        index.prune(tmp_path, [kept])
+        assert index.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 1
+
+        index.clear()
+        assert index.is_processed(kept) is False
@@ -0,0 +1,76 @@
+"""
+Tests for note date extraction and the per-mtime metadata cache.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import note_metadata
+except ImportError:
+    from shared import note_metadata
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    note_metadata.clear_cache()
+    yield
+    note_metadata.clear_cache()
+
+
+def test_date_sources_in_order_of_preference(tmp_path):
+    frontmatter = tmp_path / "2024-01-01 standup.md"
+    frontmatter.write_text("---\ntitle: Standup\ndate: 2024-02-03 09:15\n---\nSUMMARY (2024-05-05 10:00)\n")
+    assert note_metadata.get_metadata(frontmatter)[:2] == (datetime(2024, 2, 3, 9, 15), 'frontmatter')
+
+    named = tmp_path / "2024-01-01_14-30 standup.md"
+    named.write_text("SUMMARY (2024-05-05 10:00)\n")
+    assert note_metadata.get_metadata(named)[:2] == (datetime(2024, 1, 1, 14, 30), 'filename')
+
+    processed = tmp_path / "standup.md"
+    processed.write_text("SUMMARY (2024-05-05 10:00)\n\nCLEANED & STRUCTURED NOTES\n")
+    assert note_metadata.get_metadata(processed)[:2] == (datetime(2024, 5, 5, 10, 0), 'summary')
+
+    raw = tmp_path / "raw.txt"
+    raw.write_text("just some words")
+    os.utime(raw, (1700000000, 1700000000))
+    assert note_metadata.get_metadata(raw)[:2] == (datetime.fromtimestamp(1700000000), 'mtime')
+
+
+def test_only_the_head_is_searched(tmp_path):
+    note = tmp_path / "long.md"
+    note.write_text("x" * (note_metadata.HEAD_BYTES + 10) + "\nSUMMARY (2024-05-05 10:00)\n")
+    assert note_metadata.get_metadata(note).date_source == 'mtime'
+
+
+def test_metadata_is_cached_until_the_file_changes(tmp_path, monkeypatch):
+    note = tmp_path / "note.md"
+    note.write_text("SUMMARY (2024-05-05 10:00)\n")
+    reads = []
+    real_read_head = note_metadata.read_head
+    monkeypatch.setattr(note_metadata, 'read_head', lambda path: reads.append(path) or real_read_head(path))
+
+    note_metadata.get_metadata(note)
+    note_metadata.get_metadata(note)
+    assert len(reads) == 1
+
+    note.write_text("SUMMARY (2024-06-06 11:00) with more text\n")
+    assert note_metadata.get_metadata(note).date == datetime(2024, 6, 6, 11, 0)
+    assert len(reads) == 2
+
+
+def test_docx_head_is_read_from_the_archive(tmp_path):
+    docx = pytest.importorskip("docx")
+    path = tmp_path / "meeting.docx"
+    document = docx.Document()
+    document.add_paragraph("SUMMARY (2024-03-04 08:30)")
+    document.add_paragraph("CLEANED & STRUCTURED NOTES")
+    document.save(path)
+
+    assert note_metadata.read_head(path).startswith("SUMMARY (2024-03-04 08:30)\n")
+    assert note_metadata.get_metadata(path)[:2] == (datetime(2024, 3, 4, 8, 30), 'summary')
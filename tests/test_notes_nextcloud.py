@@ -0,0 +1,200 @@
+"""
+Tests for note processing, with the LLM stubbed out.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import config, note_index, prompt_registry
+    from echo_notes.shared.note_index import NoteIndex
+    from echo_notes import notes_nextcloud
+except ImportError:
+    from shared import config, note_index, prompt_registry
+    from shared.note_index import NoteIndex
+    import notes_nextcloud
+
+
+def section_counts(text):
+    headers = ('CLEANED & STRUCTURED NOTES', 'TASKS', 'SUGGESTIONS / NEXT STEPS')
+    lines = [line.strip() for line in text.splitlines()]
+    counts = {header: lines.count(header) for header in headers}
+    counts['SUMMARY'] = sum(line.startswith('SUMMARY (') for line in lines)
+    return counts
+
+
+class ChunkLLM:
+    """Cleans up chunks like a model that (wrongly) repeats the full daily format per chunk"""
+
+    def __init__(self, merge_reply=None):
+        self.merge_reply = merge_reply
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, system_message, max_tokens=2000):
+        with self._lock:
+            self.calls.append((prompt, system_message))
+            number = len(self.calls)
+        if system_message == prompt_registry.get_prompt('merge_notes_prompt'):
+            return self.merge_reply(prompt) if self.merge_reply else prompt
+        return (f"SUMMARY (2024-01-01 09:00)\n\nCLEANED & STRUCTURED NOTES\n## Part {number}\nCleaned text {number}\n\n"
+                f"TASKS\n[ ] Task from part {number}\n[ ] Shared task\n\n"
+                f"SUGGESTIONS / NEXT STEPS\n• Suggestion {number}\n")
+
+
+@pytest.fixture
+def long_note(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'schedule', config.ScheduleConfig(tmp_path / 'schedule_config.json'))
+    config.schedule.override(model_context_length=4096)
+    note = tmp_path / 'meeting.md'
+    note.write_text("\n\n".join(f"Paragraph {i}: " + "word " * 80 for i in range(60)))
+    return note
+
+
+def test_multi_chunk_note_has_each_section_once(long_note, monkeypatch):
+    llm = ChunkLLM()
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', llm)
+
+    assert notes_nextcloud.process_note(long_note)
+
+    chunk_prompt = prompt_registry.get_prompt('chunk_notes_prompt')
+    chunk_calls = [call for call in llm.calls if call[1] == chunk_prompt]
+    assert len(chunk_calls) > 1
+    assert len(llm.calls) == len(chunk_calls) + 1
+
+    processed = long_note.read_text()
+    assert section_counts(processed) == {'CLEANED & STRUCTURED NOTES': 1, 'TASKS': 1,
+                                         'SUGGESTIONS / NEXT STEPS': 1, 'SUMMARY': 1}
+    # Every chunk's content lands in its section, in order; repeated tasks are dropped
+    notes, tasks = processed.split('\nTASKS\n')
+    tasks, suggestions = tasks.split('\nSUGGESTIONS / NEXT STEPS\n')
+    for number in range(1, len(chunk_calls) + 1):
+        assert f"Cleaned text {number}" in notes
+        assert f"Task from part {number}" in tasks
+        assert f"Suggestion {number}" in suggestions
+    assert tasks.count("Shared task") == 1
+    assert notes.index("Cleaned text 1") < notes.index(f"Cleaned text {len(chunk_calls)}")
+
+
+def test_merge_reply_with_repeated_sections_is_not_used(long_note, monkeypatch):
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', ChunkLLM(merge_reply=lambda merged: merged + merged))
+
+    assert notes_nextcloud.process_note(long_note)
+    assert set(section_counts(long_note.read_text()).values()) == {1}
+
+
+def test_merge_pass_reply_is_written(long_note, monkeypatch):
+    merged_note = ("SUMMARY (2024-01-01 09:00)\nOne meeting.\n\nCLEANED & STRUCTURED NOTES\nAll of it\n\n"
+                   "TASKS\n[ ] One task\n\nSUGGESTIONS / NEXT STEPS\n• One suggestion\n")
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', ChunkLLM(merge_reply=lambda merged: merged_note))
+
+    assert notes_nextcloud.process_note(long_note)
+    assert long_note.read_text().strip() == merged_note.strip()
+
+
+class ConcurrentLLM:
+    """Tracks requests in flight and fails for notes containing 'boom'"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, system_message, max_tokens=2000):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.prompts.append(prompt)
+        try:
+            time.sleep(self.delay)
+            if 'boom' in prompt:
+                raise RuntimeError("LLM request failed: 500 Server Error")
+            return f"SUMMARY (2024-01-01 09:00)\n\nCLEANED & STRUCTURED NOTES\n{prompt}\n"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def notes_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'schedule', config.ScheduleConfig(tmp_path / 'schedule_config.json'))
+    notes = tmp_path / 'notes'
+    notes.mkdir()
+    config.schedule.override(notes_directory=str(notes))
+    monkeypatch.setattr(config, 'NOTE_INDEX_PATH', tmp_path / 'index.sqlite')
+    return notes
+
+
+def test_run_caps_llm_requests_at_llm_concurrency(notes_dir, monkeypatch):
+    config.schedule.override(llm_concurrency=3)
+    llm = ConcurrentLLM()
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', llm)
+    for i in range(12):
+        (notes_dir / f'note-{i}.md').write_text(f"Raw note {i}")
+
+    notes_nextcloud.run()
+
+    assert len(llm.prompts) == 12
+    assert llm.max_in_flight == 3
+
+
+def test_failed_note_does_not_stop_the_run_and_is_recorded_unprocessed(notes_dir, monkeypatch, caplog):
+    config.schedule.override(llm_concurrency=2)
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', ConcurrentLLM())
+    notes = [notes_dir / f'note-{i}.md' for i in range(6)]
+    for i, note in enumerate(notes):
+        note.write_text("this one goes boom" if i == 1 else f"Raw note {i}")
+
+    with caplog.at_level(logging.INFO, logger='notes_nextcloud'):
+        notes_nextcloud.run()
+
+    failed = notes[1]
+    assert failed.read_text() == "this one goes boom"
+    with NoteIndex(config.NOTE_INDEX_PATH) as index:
+        assert not index.is_processed(failed)
+        for note in notes:
+            if note != failed:
+                assert "CLEANED & STRUCTURED NOTES" in note.read_text()
+                assert index.is_processed(note)
+    assert "Processed 5 notes (1 failed)" in caplog.text
+    assert f"Failed to process {failed}" in caplog.text
+
+    # Only the failed note is retried on the next run
+    llm = ConcurrentLLM()
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', llm)
+    notes_nextcloud.run()
+    assert llm.prompts == ["this one goes boom"]
+
+
+def test_note_removed_during_the_scan_is_skipped(notes_dir, monkeypatch):
+    llm = ConcurrentLLM(delay=0)
+    monkeypatch.setattr(notes_nextcloud.llm_client, 'query_llm', llm)
+    kept, synced = notes_dir / 'kept.md', notes_dir / 'synced.md'
+    kept.write_text("Kept note")
+    synced.write_text("Synced note")
+    notes_nextcloud.run()
+
+    # A sync client touches one note, then deletes it while it is being hashed
+    stat = synced.stat()
+    os.utime(synced, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    kept.write_text("Kept note, edited")
+    hash_file = note_index.hash_file
+
+    def hash_vanishing(path):
+        if path == synced:
+            path.unlink()
+        return hash_file(path)
+
+    monkeypatch.setattr(note_index, 'hash_file', hash_vanishing)
+    llm.prompts.clear()
+    notes_nextcloud.run()
+    assert llm.prompts == ["Kept note, edited"]
@@ -0,0 +1,50 @@
+"""
+Tests for the on-demand profiler.
+"""
+
+import os
+import pstats
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import profiling
+except ImportError:
+    from shared import profiling
+
+
+def busy_worker(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_profiled_writes_pstats_and_collapsed_stacks(tmp_path):
+    with profiling.profiled('unit', directory=tmp_path):
+        worker = threading.Thread(target=busy_worker, args=(0.2,), name='busy')
+        worker.start()
+        busy_worker(0.05)
+        worker.join()
+
+    pstats_file, = tmp_path.glob('echo-notes-profile-unit-*.pstats')
+    collapsed_file, = tmp_path.glob('echo-notes-profile-unit-*.collapsed')
+    assert pstats_file.stem == collapsed_file.stem
+
+    stats = pstats.Stats(str(pstats_file))
+    assert any(name == 'busy_worker' for _, _, name in stats.stats)
+
+    lines = collapsed_file.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    # The worker thread is only visible to the sampler
+    assert any(line.startswith('busy;') and 'busy_worker (test_profiling.py:' in line for line in lines)
+
+
+def test_disabled_profiling_writes_nothing(tmp_path):
+    with profiling.profiled('unit', enabled=False, directory=tmp_path) as profiler:
+        assert profiler is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,43 @@
+"""
+Tests for the cached prompt registry.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared.prompt_registry import PromptRegistry
+except ImportError:
+    from shared.prompt_registry import PromptRegistry
+
+
+def test_prompts_are_parsed_once_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "prompts_config.json"
+    path.write_text(json.dumps({"daily_notes_prompt": "v1"}))
+    registry = PromptRegistry(path)
+
+    loads = []
+    real_load = json.load
+    monkeypatch.setattr(json, 'load', lambda f: loads.append(1) or real_load(f))
+
+    assert registry.get('daily_notes_prompt') == "v1"
+    assert registry.get('daily_notes_prompt') == "v1"
+    assert len(loads) == 1
+
+    path.write_text(json.dumps({"daily_notes_prompt": "version two"}))
+    assert registry.get('daily_notes_prompt') == "version two"
+    assert len(loads) == 2
+
+
+def test_missing_prompt(tmp_path):
+    path = tmp_path / "prompts_config.json"
+    path.write_text(json.dumps({}))
+    registry = PromptRegistry(path)
+    assert registry.get('partial_summary_prompt', 'fallback') == 'fallback'
+    with pytest.raises(KeyError):
+        registry.get('daily_notes_prompt')
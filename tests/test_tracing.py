@@ -0,0 +1,130 @@
+"""
+Tests for span tracing and its OTLP JSON-lines export.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'benchmarks'))
+
+try:
+    from echo_notes.shared import config, llm_client, tracing
+    from echo_notes import notes_nextcloud
+except ImportError:
+    from shared import config, llm_client, tracing
+    import notes_nextcloud
+
+from mock_llm_server import running_server
+
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    """Trace into a temporary file with settings from a temporary schedule config"""
+    monkeypatch.setattr(config, 'schedule', config.ScheduleConfig(tmp_path / 'schedule_config.json'))
+    monkeypatch.setattr(tracing, '_enabled', None)
+    monkeypatch.setattr(tracing, '_sample_rate', 1.0)
+    path = tmp_path / 'traces.jsonl'
+    tracing.set_exporter(tracing.JsonLinesExporter(path))
+    yield path
+    tracing.set_exporter(tracing.JsonLinesExporter())
+
+
+def read_spans(path):
+    spans = []
+    if path.exists():
+        for line in path.read_text().splitlines():
+            for resource in json.loads(line)['resourceSpans']:
+                for scope in resource['scopeSpans']:
+                    spans.extend(scope['spans'])
+    return spans
+
+
+def attributes(span):
+    return {item['key']: next(iter(item['value'].values())) for item in span['attributes']}
+
+
+def test_disabled_tracing_records_nothing(traces):
+    tracing._load_settings()
+    assert not tracing.is_enabled()
+    with tracing.span('outer') as span:
+        assert span is tracing.current_span()
+        assert not span.recording
+        span.set_attribute('ignored', 1)
+    tracing.flush()
+    assert not traces.exists()
+
+
+def test_nested_spans_are_exported_as_otlp_json(traces):
+    tracing.enable()
+    with tracing.span('outer', kind='test') as outer:
+        with tracing.span('inner') as inner:
+            inner.set_attributes({'file.size': 12, 'ratio': 0.5, 'ok': True})
+        with pytest.raises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError("boom")
+        assert not traces.exists()  # Written once the root span ends
+
+    spans = {span['name']: span for span in read_spans(traces)}
+    assert set(spans) == {'outer', 'inner', 'failing'}
+    assert {span['traceId'] for span in spans.values()} == {outer.trace_id}
+    assert 'parentSpanId' not in spans['outer']
+    assert spans['inner']['parentSpanId'] == spans['outer']['spanId']
+    assert spans['inner']['attributes'] == [
+        {'key': 'file.size', 'value': {'intValue': '12'}},
+        {'key': 'ratio', 'value': {'doubleValue': 0.5}},
+        {'key': 'ok', 'value': {'boolValue': True}},
+    ]
+    assert spans['failing']['status'] == {'code': tracing.STATUS_ERROR, 'message': 'ValueError: boom'}
+    assert int(spans['outer']['endTimeUnixNano']) >= int(spans['inner']['endTimeUnixNano'])
+
+
+def test_unsampled_traces_drop_their_children(traces):
+    tracing.enable(sample_rate=0.0)
+    with tracing.span('root') as root:
+        with tracing.span('child') as child:
+            assert not child.recording
+        assert not root.recording
+    tracing.flush()
+    assert read_spans(traces) == []
+
+
+def test_processing_run_is_traced_end_to_end(traces, tmp_path, monkeypatch):
+    notes_dir = tmp_path / 'notes'
+    notes_dir.mkdir()
+    for day in (1, 2):
+        (notes_dir / f'2024-01-0{day}.md').write_text(f"Raw notes for day {day}\n" * 20)
+    monkeypatch.setattr(config, 'NOTE_INDEX_PATH', tmp_path / 'index.sqlite')
+    config.schedule.override(notes_directory=str(notes_dir), conversion_workers=1, llm_concurrency=2,
+                             fsync_notes=False)
+    tracing.enable()
+
+    with running_server(time_scale=0.001) as server:
+        monkeypatch.setattr(llm_client, '_client', llm_client.LLMClient(url=server.url, max_retries=0))
+        notes_nextcloud.run()
+        llm_client._client.close()
+
+    spans = read_spans(traces)
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span['name'], []).append(span)
+    assert len(by_name['notes_nextcloud.run']) == 1
+    run = by_name['notes_nextcloud.run'][0]
+    assert attributes(run)['notes.processed'] == '2'
+
+    for span in by_name['notes_nextcloud.process_note']:
+        assert span['parentSpanId'] == run['spanId']
+        assert int(attributes(span)['tokens.estimate']) > 0
+    process_ids = {span['spanId'] for span in by_name['notes_nextcloud.process_note']}
+    assert len(by_name['llm_client.query_llm']) == 2
+    for span in by_name['llm_client.query_llm']:
+        assert span['parentSpanId'] in process_ids
+        assert attributes(span)['http.status_code'] == '200'
+    assert {attributes(span)['file.path'] for span in by_name['file_utils.write_processed_note']} == {
+        str(path) for path in notes_dir.iterdir()
+    }
+    assert len(by_name['file_utils.get_note_text']) == 2
@@ -0,0 +1,154 @@
+"""
+Tests for the map-reduce weekly summary, with the LLM stubbed out.
+"""
+
+import os
+import sys
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import chunker, config
+    from echo_notes import weekly_summary
+except ImportError:
+    from shared import chunker, config
+    import weekly_summary
+
+
+class StubLLM:
+    """Records requests and answers each with a short summary"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, system_message, max_tokens=2000):
+        with self._lock:
+            self.calls.append((prompt, system_message, max_tokens))
+            return f"summary {len(self.calls)}"
+
+    def calls_with(self, system_message):
+        return [call for call in self.calls if call[1] == system_message]
+
+
+@pytest.fixture
+def llm(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'schedule', config.ScheduleConfig(tmp_path / 'schedule_config.json'))
+    monkeypatch.setattr(weekly_summary, 'PARTIAL_CACHE_PATH', tmp_path / 'weekly-summary-cache.json')
+    stub = StubLLM()
+    monkeypatch.setattr(weekly_summary.llm_client, 'query_llm', stub)
+    return stub
+
+
+def paragraphs(count, words=60):
+    return "\n\n".join(f"Paragraph {i}: " + "word " * words for i in range(count))
+
+
+def test_oversized_day_is_split_into_chunks_within_budget(llm):
+    config.schedule.override(model_context_length=4096)
+    day = date.today()
+    notes = {day: [paragraphs(60), "A short note"]}
+    prompt = weekly_summary.DEFAULT_PARTIAL_SUMMARY_PROMPT
+    budget = chunker.prompt_budget(4096, prompt, weekly_summary.PARTIAL_REPLY_TOKENS)
+
+    partials = weekly_summary.summarize_partials(notes, prompt)
+
+    assert len(llm.calls) > 1
+    assert len(partials) == len(llm.calls)
+    assert {partial_day for partial_day, _ in partials} == {day}
+    for user_message, _, max_tokens in llm.calls:
+        assert max_tokens == weekly_summary.PARTIAL_REPLY_TOKENS
+        assert chunker.estimate_tokens(user_message) <= budget + chunker.estimate_tokens(f"Notes from {day}:")
+    assert "A short note" in llm.calls[-1][0]
+
+
+def test_partial_cache_hits_unchanged_days_and_misses_edited_ones(llm):
+    prompt = weekly_summary.DEFAULT_PARTIAL_SUMMARY_PROMPT
+    # Days outside the cache's retention window would be dropped on save
+    monday, tuesday = date.today() - timedelta(days=2), date.today() - timedelta(days=1)
+    notes = {monday: ["Monday notes"], tuesday: ["Tuesday notes"]}
+    weekly_summary.summarize_partials(notes, prompt)
+    assert len(llm.calls) == 2
+    cache_dir = weekly_summary.PARTIAL_CACHE_PATH.parent
+    assert not [name for name in os.listdir(cache_dir) if name.endswith('.tmp')]
+
+    weekly_summary.summarize_partials(notes, prompt)
+    assert len(llm.calls) == 2
+
+    notes[tuesday] = ["Tuesday notes, edited"]
+    partials = weekly_summary.summarize_partials(notes, prompt)
+    assert len(llm.calls) == 3
+    assert "Tuesday notes, edited" in llm.calls[-1][0]
+    assert [summary for _, summary in partials] == ["summary 1", "summary 3"]
+
+
+def test_reduce_fits_partials_in_one_request(llm):
+    partials = [(date(2024, 1, day), f"day {day} went well") for day in range(1, 8)]
+    assert weekly_summary.reduce_partials(partials, "weekly prompt") == "summary 1"
+    (prompt, system_message, _), = llm.calls
+    assert system_message == "weekly prompt"
+    assert "## 2024-01-07\nday 7 went well" in prompt
+
+
+def test_reduce_condenses_groups_when_partials_exceed_the_context(llm):
+    config.schedule.override(model_context_length=4096)
+    partials = [(date(2024, 1, day), paragraphs(8)) for day in range(1, 8)]
+    weekly_budget = chunker.prompt_budget(4096, "weekly prompt", weekly_summary.WEEKLY_REPLY_TOKENS)
+    group_budget = chunker.prompt_budget(4096, "group prompt", weekly_summary.PARTIAL_REPLY_TOKENS)
+
+    summary = weekly_summary.reduce_partials(partials, "weekly prompt", "group prompt")
+
+    groups = llm.calls_with("group prompt")
+    assert 1 < len(groups) < len(partials)
+    for prompt, _, _ in groups:
+        assert chunker.estimate_tokens(prompt) <= group_budget
+    # Every day reaches exactly one group, in order
+    grouped = "\n".join(prompt for prompt, _, _ in groups)
+    assert [grouped.index(f"## 2024-01-0{day}") for day in range(1, 8)] == sorted(
+        grouped.index(f"## 2024-01-0{day}") for day in range(1, 8))
+
+    (final_prompt, _, max_tokens), = llm.calls_with("weekly prompt")
+    assert chunker.estimate_tokens(final_prompt) <= weekly_budget
+    assert max_tokens == weekly_summary.WEEKLY_REPLY_TOKENS
+    assert final_prompt == "\n\n".join(f"summary {i}" for i in range(1, len(groups) + 1))
+    assert summary == f"summary {len(groups) + 1}"
+
+
+def test_collect_recent_notes_only_reads_recent_notes(llm, tmp_path, monkeypatch):
+    notes_dir = tmp_path / 'notes'
+    notes_dir.mkdir()
+    today = date.today()
+    short = notes_dir / f'{today.isoformat()} standup.md'
+    short.write_text("Standup notes")
+    long_text = "Long notes\n" * 1000
+    (notes_dir / 'undated meeting.md').write_text(long_text)
+    (notes_dir / '2001-01-01 old.md').write_text("Old notes")
+    (notes_dir / 'Weekly Summary old.md').write_text("Skipped")
+    config.schedule.override(notes_directory=str(notes_dir))
+    weekly_summary.note_metadata.clear_cache()
+
+    heads, reads = [], []
+    read_head = weekly_summary.note_metadata.read_head
+    get_note_text = weekly_summary.file_utils.get_note_text
+    monkeypatch.setattr(weekly_summary.note_metadata, 'read_head',
+                        lambda path, *args: heads.append(path.name) or read_head(path, *args))
+    monkeypatch.setattr(weekly_summary.file_utils, 'get_note_text',
+                        lambda path, *args: reads.append(path.name) or get_note_text(path, *args))
+
+    expected = {today: ["Standup notes", long_text]}
+    assert weekly_summary.collect_recent_notes() == expected
+    # The old note is dated from its filename alone; the short note's header is all of it
+    assert sorted(heads) == [short.name, 'undated meeting.md']
+    assert reads == ['undated meeting.md']
+
+    # Cached dates: recent notes are read once more, in full, and nothing else
+    heads.clear()
+    reads.clear()
+    assert weekly_summary.collect_recent_notes() == expected
+    assert heads == []
+    assert sorted(reads) == [short.name, 'undated meeting.md']
+    weekly_summary.note_metadata.clear_cache()
@@ -0,0 +1,82 @@
+"""
+Tests for the persistent per-note work queue.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from echo_notes.shared import work_queue as wq
+except ImportError:
+    from shared import work_queue as wq
+
+
+def make_note(tmp_path, name="note.md", text="hello"):
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_claimed_jobs_survive_a_crash(tmp_path):
+    db = tmp_path / "queue.sqlite"
+    note = make_note(tmp_path)
+
+    queue = wq.WorkQueue(db)
+    queue.enqueue(note)
+    assert queue.claim_due() == [note]
+    assert queue.claim_due() == []
+    queue.conn.close()  # Simulate the daemon dying without finishing the job
+
+    queue = wq.WorkQueue(db)
+    assert queue.counts() == {wq.IN_PROGRESS: 1}
+    assert queue.recover() == 1
+    assert queue.claim_due() == [note]
+    queue.mark_done(note)
+    assert queue.counts() == {wq.DONE: 1}
+    assert queue.depth() == 0
+    queue.close()
+
+
+def test_failures_back_off_then_go_dead(tmp_path):
+    note = make_note(tmp_path)
+    queue = wq.WorkQueue(tmp_path / "queue.sqlite", max_attempts=3, base_backoff=100)
+    queue.enqueue(note)
+
+    assert queue.claim_due() == [note]
+    assert queue.mark_failed(note, "boom") == wq.FAILED
+    assert queue.claim_due() == []
+    assert 90 < queue.seconds_until_due() <= 100
+
+    # Force the retry to be due now and fail twice more
+    for expected in (wq.FAILED, wq.DEAD):
+        queue.conn.execute("UPDATE jobs SET next_attempt_at = 0")
+        assert queue.claim_due() == [note]
+        assert queue.mark_failed(note, "boom") == expected
+
+    assert queue.dead_jobs() == [(str(note), 3, "boom")]
+    assert queue.seconds_until_due() is None
+
+    # Re-scanning the unchanged note leaves it set aside...
+    queue.enqueue(note)
+    assert queue.claim_due() == []
+
+    # ...until it is edited
+    note.write_text("hello, fixed")
+    queue.enqueue(note)
+    assert queue.claim_due() == [note]
+    queue.close()
+
+
+def test_enqueue_keeps_retry_schedule_of_unchanged_note(tmp_path):
+    note = make_note(tmp_path)
+    queue = wq.WorkQueue(tmp_path / "queue.sqlite", base_backoff=100)
+    queue.enqueue(note)
+    queue.claim_due()
+    queue.mark_failed(note, "boom")
+
+    queue.enqueue(note)
+    assert queue.claim_due() == []
+    assert queue.counts() == {wq.FAILED: 1}
+    queue.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compare the streaming .docx text reader with the python-docx one.
+
+Runs both extractors over a corpus of .docx files and prints per-file
+timings, throughput and peak Python memory. Without --corpus a corpus of
+real-size notes (a few pages to a few hundred pages, with headings, bold
+runs and tables) is generated with python-docx first.
+
+    python tools/benchmarks/bench_docx_extract.py
+    python tools/benchmarks/bench_docx_extract.py --corpus ~/Documents/notes --repeat 5 --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+try:
+    from echo_notes.shared import file_converters
+except ImportError:
+    from shared import file_converters
+
+# Paragraph counts of the generated notes: a short note up to a long report
+DEFAULT_SIZES = (50, 200, 1000, 5000)
+WORDS = ("meeting project deadline review budget team release customer follow-up "
+         "design estimate risk decision action owner schedule notes draft update").split()
+
+EXTRACTORS = {
+    'streaming': lambda path: '\n'.join(file_converters.iter_docx_paragraphs(path)),
+    'python-docx': file_converters._docx_to_text_python_docx,
+}
+
+
+def generate_corpus(directory: Path, sizes=DEFAULT_SIZES, seed=0) -> list:
+    """Write one generated .docx per size and return their paths"""
+    import docx
+
+    rng = random.Random(seed)
+    paths = []
+    for paragraphs in sizes:
+        document = docx.Document()
+        for i in range(paragraphs):
+            if i % 40 == 0:
+                document.add_heading(f"Section {i // 40 + 1}", level=2)
+            paragraph = document.add_paragraph(' '.join(rng.choices(WORDS, k=rng.randint(8, 40))))
+            paragraph.add_run(' ' + ' '.join(rng.choices(WORDS, k=3))).bold = True
+            if i % 200 == 199:
+                table = document.add_table(rows=5, cols=4)
+                for cell in table._cells:
+                    cell.text = ' '.join(rng.choices(WORDS, k=4))
+        path = directory / f"generated-{paragraphs:05d}.docx"
+        document.save(path)
+        paths.append(path)
+    return paths
+
+
+def time_extractor(extract, path: Path, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract(path)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extract(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_s': statistics.median(timings), 'min_s': min(timings),
+            'peak_bytes': peak, 'chars': len(text)}
+
+
+def run(paths, repeat: int) -> list:
+    results = []
+    for path in paths:
+        size = path.stat().st_size
+        for name, extract in EXTRACTORS.items():
+            result = time_extractor(extract, path, repeat)
+            result.update(file=path.name, extractor=name, file_bytes=size,
+                          mb_per_s=size / result['median_s'] / 1e6)
+            results.append(result)
+            print(f"{path.name:<32} {name:<12} {result['median_s'] * 1000:9.1f} ms "
+                  f"{result['mb_per_s']:7.2f} MB/s {result['peak_bytes'] / 1e6:8.1f} MB peak "
+                  f"{result['chars']:>9} chars")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the .docx text extractors')
+    parser.add_argument('--corpus', type=Path, help='Directory of .docx files (default: generate one)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per file and extractor')
+    parser.add_argument('--json', type=Path, help='Also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(args.corpus.glob('*.docx'))
+        else:
+            paths = generate_corpus(Path(tmp))
+        if not paths:
+            parser.error(f"No .docx files in {args.corpus}")
+        results = run(paths, max(1, args.repeat))
+
+    for name in EXTRACTORS:
+        total = sum(r['median_s'] for r in results if r['extractor'] == name)
+        print(f"{name:<12} total {total * 1000:9.1f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Synthetic note corpus for benchmarks.
+
+Notes are a mix of .md, .txt and .docx with log-normally distributed sizes
+(most a page or two, a long tail of multi-page notes), dated over the past
+year in their filenames and mtimes, and a share of them already processed.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+try:
+    from echo_notes.shared import config, file_converters
+except ImportError:
+    from shared import config, file_converters
+
+DEFAULT_MIX = {'.md': 0.6, '.txt': 0.25, '.docx': 0.15}
+# Text size in bytes: median ~1.5 KB, 1 in 20 notes over ~8 KB, capped at 200 KB
+MEDIAN_BYTES = 1500
+SIZE_SIGMA = 1.0
+MIN_BYTES = 100
+MAX_BYTES = 200 * 1024
+DAYS_SPAN = 365
+
+WORDS = ("meeting project deadline review budget team release customer follow-up design "
+         "estimate risk decision action owner schedule draft update call email plan "
+         "question blocked done next week sprint report invoice travel idea").split()
+TOPICS = ("standup", "planning", "1on1", "journal", "ideas", "call", "retro", "research")
+
+
+def note_text(rng: random.Random, size: int, processed: bool) -> str:
+    """Roughly `size` bytes of note-like text: short headed sections of bullet points"""
+    lines = []
+    if processed:
+        lines += [f"SUMMARY ({datetime.now():%Y-%m-%d %H:%M})", "", config.SUMMARY_MARKER, ""]
+    length = sum(len(line) + 1 for line in lines)
+    while length < size:
+        if rng.random() < 0.1:
+            line = f"## {rng.choice(WORDS).title()} {rng.choice(WORDS)}"
+        else:
+            line = "- " + ' '.join(rng.choices(WORDS, k=rng.randint(4, 18)))
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def note_size(rng: random.Random) -> int:
+    size = int(rng.lognormvariate(math.log(MEDIAN_BYTES), SIZE_SIGMA))
+    return max(MIN_BYTES, min(MAX_BYTES, size))
+
+
+def generate_corpus(directory: Path, count: int, mix: dict = None, processed_fraction: float = 0.3,
+                    seed: int = 0) -> dict:
+    """Write `count` notes into directory and return {extension: number written}"""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    extensions = list(mix)
+    weights = [mix[extension] for extension in extensions]
+    now = datetime.now()
+    written = dict.fromkeys(extensions, 0)
+
+    for i in range(count):
+        extension = rng.choices(extensions, weights)[0]
+        written[extension] += 1
+        when = now - timedelta(days=rng.uniform(0, DAYS_SPAN))
+        path = directory / f"{when:%Y-%m-%d} {rng.choice(TOPICS)} {i:06d}{extension}"
+        text = note_text(rng, note_size(rng), rng.random() < processed_fraction)
+        if extension == '.docx':
+            file_converters.write_docx_template(path, text, fsync=False)
+        else:
+            path.write_text(text, encoding='utf-8')
+        timestamp = time.mktime(when.timetuple())
+        os.utime(path, (timestamp, timestamp))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic note corpus')
+    parser.add_argument('directory', type=Path)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--processed-fraction', type=float, default=0.3,
+                        help='Share of notes that already carry a summary')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    written = generate_corpus(args.directory, args.count, processed_fraction=args.processed_fraction, seed=args.seed)
+    print(', '.join(f"{count} {extension}" for extension, count in written.items()))
+
+
+if __name__ == '__main__':
+    main()
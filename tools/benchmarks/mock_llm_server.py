@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Mock OpenAI-compatible LLM server that behaves like llama.cpp / LM Studio under load.
+
+Request time is modelled from token counts: the prompt is processed at
+--prompt-tps tokens/s (minus any prefix a slot still has cached when the
+request sends llama.cpp's "cache_prompt"), then the reply is generated at
+--gen-tps tokens/s, after a fixed --latency per request. With both rates
+set to inf only the fixed latency remains, as run_benchmarks.py uses it.
+Only --slots requests run at once;
+the rest queue (FIFO), optionally up to --max-queue before getting 503.
+Requests can be pinned to a slot with "id_slot", as llm_client does.
+
+Faults can be injected at given rates: 429 and 503 responses (with
+Retry-After), timeouts (the request hangs, then the connection is closed
+without a reply) and slow first tokens. "stream": true is answered with
+server-sent events, token by token.
+
+Run it and point Echo-Notes at it:
+
+    python tools/benchmarks/mock_llm_server.py --port 8081 --slots 2 --error-503-rate 0.05
+    process-notes --llm-url http://127.0.0.1:8081/v1/chat/completions --no-cache
+
+or use running_server() from tests. GET /stats returns request counters.
+--time-scale shrinks every delay, e.g. 0.01 to run a minute of load in 0.6s.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY_MARKER = 'CLEANED & STRUCTURED NOTES'
+CHARS_PER_TOKEN = 4
+STREAM_TOKENS_PER_EVENT = 4
+
+
+class MockSettings:
+    """How the mock server behaves; every delay is multiplied by time_scale"""
+
+    def __init__(self, slots=1, prompt_tps=400.0, gen_tps=25.0, latency=0.0, reply_tokens=None, max_queue=None,
+                 error_429_rate=0.0, error_503_rate=0.0, timeout_rate=0.0, hang_seconds=150.0,
+                 slow_first_token_rate=0.0, slow_first_token_seconds=10.0, retry_after=1,
+                 time_scale=1.0, seed=None):
+        self.slots = slots
+        self.prompt_tps = prompt_tps
+        self.gen_tps = gen_tps
+        # Fixed seconds added to every request, before the first token
+        self.latency = latency
+        # None: half the prompt plus a header, capped at the request's max_tokens
+        self.reply_tokens = reply_tokens
+        self.max_queue = max_queue
+        self.error_429_rate = error_429_rate
+        self.error_503_rate = error_503_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.slow_first_token_rate = slow_first_token_rate
+        self.slow_first_token_seconds = slow_first_token_seconds
+        self.retry_after = retry_after
+        self.time_scale = time_scale
+        self.seed = seed
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, MockHandler)
+        self.settings = settings
+        self.url = f"http://{self.server_address[0]}:{self.server_port}/v1/chat/completions"
+        self._rng = random.Random(settings.seed)
+        self._slots = threading.Condition()
+        self._busy = [False] * settings.slots
+        # What each slot last processed, for prompt cache hits
+        self._cached = [''] * settings.slots
+        self._waiting = 0
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0, 'statuses': {}, 'faults': {}, 'max_waiting': 0, 'queue_wait_seconds': 0.0,
+            'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0,
+        }
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds * self.settings.time_scale)
+
+    def count(self, key: str, value=1, bucket: str = None):
+        with self._stats_lock:
+            if bucket is None:
+                self.stats[key] += value
+            else:
+                self.stats[bucket][key] = self.stats[bucket].get(key, 0) + value
+
+    def pick_fault(self):
+        """Return '429', '503', 'timeout', 'slow_first_token' or None for a new request"""
+        settings = self.settings
+        with self._stats_lock:
+            roll = self._rng.random()
+            slow = self._rng.random() < settings.slow_first_token_rate
+        for fault, rate in (('429', settings.error_429_rate), ('503', settings.error_503_rate),
+                            ('timeout', settings.timeout_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return 'slow_first_token' if slow else None
+
+    def acquire_slot(self, wanted=None):
+        """Wait for a free slot (or the requested one); None if the queue is full"""
+        if wanted is not None and not 0 <= wanted < len(self._busy):
+            wanted = None
+        started = time.monotonic()
+        with self._slots:
+            def free_slot():
+                if wanted is not None:
+                    return wanted if not self._busy[wanted] else None
+                return next((i for i, busy in enumerate(self._busy) if not busy), None)
+
+            slot = free_slot()
+            if slot is None:
+                if self.settings.max_queue is not None and self._waiting >= self.settings.max_queue:
+                    return None
+                self._waiting += 1
+                with self._stats_lock:
+                    self.stats['max_waiting'] = max(self.stats['max_waiting'], self._waiting)
+                while slot is None:
+                    self._slots.wait()
+                    slot = free_slot()
+                self._waiting -= 1
+            self._busy[slot] = True
+        self.count('queue_wait_seconds', time.monotonic() - started)
+        return slot
+
+    def release_slot(self, slot: int, prompt: str):
+        with self._slots:
+            self._cached[slot] = prompt
+            self._busy[slot] = False
+            self._slots.notify_all()
+
+    def cached_prefix(self, slot: int, prompt: str) -> int:
+        with self._slots:
+            return common_prefix_length(self._cached[slot], prompt)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: MockLLMServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        # Counted before the reply goes out, so a client that has it sees it in the stats
+        self.server.count(str(status), bucket='statuses')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, body):
+        data = f"data: {body if isinstance(body, str) else json.dumps(body)}\n\n".encode('utf-8')
+        # Chunked transfer encoding: hex length, CRLF, data, CRLF
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+        elif path.endswith('/stats'):
+            with self.server._stats_lock:
+                stats = json.loads(json.dumps(self.server.stats))
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+        try:
+            request = json.loads(body)
+            messages = request['messages']
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': {'message': f"Bad request: {e}"}})
+            return
+
+        server = self.server
+        settings = server.settings
+        server.count('requests')
+        fault = server.pick_fault()
+        if fault:
+            server.count(fault, bucket='faults')
+        if fault in ('429', '503'):
+            self._send_json(int(fault), {'error': {'message': 'Server busy' if fault == '503' else 'Rate limited'}},
+                            headers={'Retry-After': settings.retry_after})
+            return
+        if fault == 'timeout':
+            server.sleep(settings.hang_seconds)
+            self.close_connection = True
+            return
+
+        slot = server.acquire_slot(request.get('id_slot'))
+        if slot is None:
+            server.count('queue_full', bucket='faults')
+            self._send_json(503, {'error': {'message': 'No slot available'}},
+                            headers={'Retry-After': settings.retry_after})
+            return
+
+        prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+        keep_cache = bool(request.get('cache_prompt'))
+        try:
+            prompt_tokens = estimate_tokens(prompt)
+            cached_tokens = 0
+            if keep_cache:
+                cached_tokens = min(prompt_tokens, server.cached_prefix(slot, prompt) // CHARS_PER_TOKEN)
+            reply_tokens = settings.reply_tokens or (prompt_tokens // 2 + 50)
+            reply_tokens = max(1, min(int(request.get('max_tokens') or reply_tokens), reply_tokens))
+            reply = self._reply_text(messages[-1].get('content', ''), reply_tokens)
+            server.count('prompt_tokens', prompt_tokens)
+            server.count('cached_prompt_tokens', cached_tokens)
+            server.count('completion_tokens', reply_tokens)
+
+            prompt_seconds = settings.latency + (prompt_tokens - cached_tokens) / settings.prompt_tps
+            if fault == 'slow_first_token':
+                prompt_seconds += settings.slow_first_token_seconds
+            usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': reply_tokens,
+                     'total_tokens': prompt_tokens + reply_tokens}
+            timings = {'cache_n': cached_tokens, 'prompt_n': prompt_tokens - cached_tokens,
+                       'prompt_ms': prompt_seconds * 1000, 'predicted_n': reply_tokens,
+                       'predicted_ms': reply_tokens / settings.gen_tps * 1000}
+            if request.get('stream'):
+                self._stream(request, reply, reply_tokens, prompt_seconds, usage, timings)
+            else:
+                server.sleep(prompt_seconds + reply_tokens / settings.gen_tps)
+                self._send_json(200, {
+                    'id': f"mock-{time.monotonic_ns()}", 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': request.get('model', 'mock'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply},
+                                 'finish_reason': 'stop' if reply_tokens < request.get('max_tokens', 1 << 30)
+                                 else 'length'}],
+                    'usage': usage, 'timings': timings,
+                })
+        finally:
+            server.release_slot(slot, prompt if keep_cache else '')
+
+    def _reply_text(self, user_text: str, tokens: int) -> str:
+        header = f"SUMMARY ({datetime.now():%Y-%m-%d %H:%M})\n\n{SUMMARY_MARKER}\n\n"
+        words = user_text.split() or ['note']
+        body = []
+        length = len(header)
+        i = 0
+        while length < tokens * CHARS_PER_TOKEN:
+            word = words[i % len(words)]
+            body.append(word)
+            length += len(word) + 1
+            i += 1
+        return header + ' '.join(body)
+
+    def _stream(self, request, reply, reply_tokens, prompt_seconds, usage, timings):
+        server = self.server
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        server.count('200', bucket='statuses')
+
+        server.sleep(prompt_seconds)
+        chunk_id = f"mock-{time.monotonic_ns()}"
+        step = STREAM_TOKENS_PER_EVENT * CHARS_PER_TOKEN
+        for start in range(0, len(reply), step):
+            server.sleep(STREAM_TOKENS_PER_EVENT / server.settings.gen_tps)
+            self._send_event({'id': chunk_id, 'object': 'chat.completion.chunk',
+                              'choices': [{'index': 0, 'delta': {'content': reply[start:start + step]},
+                                           'finish_reason': None}]})
+        self._send_event({'id': chunk_id, 'object': 'chat.completion.chunk',
+                          'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                          'usage': usage, 'timings': timings})
+        self._send_event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+@contextmanager
+def running_server(host='127.0.0.1', port=0, **settings):
+    """Serve the mock on a background thread; yields the server (its .url is the completions endpoint)"""
+    server = MockLLMServer((host, port), MockSettings(**settings))
+    thread = threading.Thread(target=server.serve_forever, name='mock-llm-server', daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible LLM server for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--slots', type=int, default=1, help='Requests processed in parallel')
+    parser.add_argument('--max-queue', type=int, help='Waiting requests before answering 503 (default: unlimited)')
+    parser.add_argument('--prompt-tps', type=float, default=400.0, help='Prompt processing speed, tokens/s')
+    parser.add_argument('--gen-tps', type=float, default=25.0, help='Generation speed, tokens/s')
+    parser.add_argument('--latency', type=float, default=0.0, help='Fixed seconds added to every request')
+    parser.add_argument('--reply-tokens', type=int, help='Fixed reply length (default: half the prompt + 50)')
+    parser.add_argument('--error-429-rate', type=float, default=0.0)
+    parser.add_argument('--error-503-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of requests that hang')
+    parser.add_argument('--hang-seconds', type=float, default=150.0, help='How long hanging requests hang')
+    parser.add_argument('--slow-first-token-rate', type=float, default=0.0)
+    parser.add_argument('--slow-first-token-seconds', type=float, default=10.0)
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After sent with 429/503')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='Multiply every delay by this')
+    parser.add_argument('--seed', type=int)
+    args = vars(parser.parse_args(argv))
+    host, port = args.pop('host'), args.pop('port')
+
+    server = MockLLMServer((host, port), MockSettings(**args))
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for Echo-Notes.
+
+For each corpus size a fresh synthetic corpus is generated (see corpus.py)
+and the following are timed against the in-process mock LLM server (see
+mock_llm_server.py) with a fixed per-request latency and no token-based
+timing, so the results measure Echo-Notes rather than the model:
+
+    converters                  get_note_text over every note, by format
+    check_last_processed_times  the dashboard's scan (file_utils.find_latest_note_times)
+    weekly_summary              weekly_summary.main --no-cache
+    process_notes               notes_nextcloud.main --rebuild-index --no-cache
+    process_notes_rescan        a second run, with every note unchanged
+
+Results go to a JSON file so runs can be compared across releases:
+
+    python tools/benchmarks/run_benchmarks.py --sizes 1000,10000 --latency 0.02 --output results.json
+
+State (note index, caches) lives in a temporary directory; the user's notes
+and settings are never touched.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Keep the index and caches out of the user's notes folder; must be set before echo_notes is imported
+STATE_ROOT = Path(tempfile.mkdtemp(prefix='echo-notes-bench-'))
+os.environ['ECHO_STATE_DIR'] = str(STATE_ROOT / 'state')
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from echo_notes.shared import config, file_utils
+    from echo_notes import notes_nextcloud, weekly_summary
+except ImportError:
+    from shared import config, file_utils
+    import notes_nextcloud
+    import weekly_summary
+
+from corpus import generate_corpus
+from mock_llm_server import running_server
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Replies of about 500 characters, like a short processed note
+REPLY_TOKENS = 125
+BENCHMARKS = ('converters', 'check_last_processed_times', 'weekly_summary', 'process_notes', 'process_notes_rescan')
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def bench_converters(notes_dir: Path, server) -> dict:
+    by_format = {}
+    for path in sorted(notes_dir.iterdir()):
+        seconds, text = timed(file_utils.get_note_text, path)
+        stats = by_format.setdefault(path.suffix, {'files': 0, 'bytes': 0, 'chars': 0, 'seconds': 0.0})
+        stats['files'] += 1
+        stats['bytes'] += path.stat().st_size
+        stats['chars'] += len(text)
+        stats['seconds'] += seconds
+    for stats in by_format.values():
+        stats['files_per_s'] = stats['files'] / stats['seconds'] if stats['seconds'] else None
+        stats['mb_per_s'] = stats['bytes'] / stats['seconds'] / 1e6 if stats['seconds'] else None
+    total = sum(stats['seconds'] for stats in by_format.values())
+    return {'seconds': total, 'items': sum(stats['files'] for stats in by_format.values()), 'formats': by_format}
+
+
+def bench_check_last_processed_times(notes_dir: Path, server, repeat=5) -> dict:
+    timings = [timed(file_utils.find_latest_note_times, notes_dir)[0] for _ in range(repeat)]
+    return {'seconds': statistics.median(timings), 'min_seconds': min(timings), 'repeat': repeat}
+
+
+def bench_weekly_summary(notes_dir: Path, server) -> dict:
+    before = server.stats['requests']
+    seconds, _ = timed(weekly_summary.main, ['--no-cache'])
+    summary_path = notes_dir / config.weekly_summary_filename()
+    if summary_path.exists():
+        summary_path.unlink()
+    return {'seconds': seconds, 'llm_requests': server.stats['requests'] - before}
+
+
+def bench_process_notes(notes_dir: Path, server, args=('--rebuild-index', '--no-cache')) -> dict:
+    before = server.stats['requests']
+    seconds, _ = timed(notes_nextcloud.main, list(args))
+    requests = server.stats['requests'] - before
+    return {'seconds': seconds, 'llm_requests': requests, 'items': requests}
+
+
+def bench_process_notes_rescan(notes_dir: Path, server) -> dict:
+    result = bench_process_notes(notes_dir, server, args=('--no-cache',))
+    del result['items']  # Rate in notes checked, not LLM requests (there should be none)
+    return result
+
+
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'llm_latency': args.latency,
+        'llm_concurrency': args.llm_concurrency,
+        'seed': args.seed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Echo-Notes throughput benchmarks')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated corpus sizes (number of notes)')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds the mock LLM server takes per request')
+    parser.add_argument('--llm-concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='JSON results file (default: benchmark-results-<time>.json)')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    selected = [name for name in args.benchmarks.split(',') if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    output = args.output or Path(f"benchmark-results-{datetime.now():%Y%m%d-%H%M%S}.json")
+
+    # The processing modules log every note at DEBUG; that would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    results = {'environment': environment(args), 'results': []}
+    try:
+        # One slot per concurrent request, so requests never queue at the server
+        with running_server(slots=args.llm_concurrency, latency=args.latency, prompt_tps=float('inf'),
+                            gen_tps=float('inf'), reply_tokens=REPLY_TOKENS) as server:
+            config.LM_URL = server.url
+            for size in sizes:
+                notes_dir = STATE_ROOT / f'notes-{size}'
+                print(f"Generating {size} notes in {notes_dir}")
+                seconds, written = timed(generate_corpus, notes_dir, size, None, 0.3, args.seed)
+                print(f"  {written} in {seconds:.1f}s")
+                config.schedule.override(notes_directory=str(notes_dir), llm_concurrency=args.llm_concurrency,
+                                         llm_streaming=False, llm_cache_enabled=False)
+
+                for name in selected:
+                    result = globals()[f'bench_{name}'](notes_dir, server)
+                    items = result.get('items', size)
+                    result.update(benchmark=name, notes=size,
+                                  items_per_s=items / result['seconds'] if result['seconds'] else None)
+                    results['results'].append(result)
+                    print(f"  {name:<28} {result['seconds']:9.3f}s"
+                          + (f" {result['items_per_s']:10.1f} items/s" if result['items_per_s'] else ''))
+                shutil.rmtree(notes_dir)
+                if config.NOTE_INDEX_PATH.exists():
+                    config.NOTE_INDEX_PATH.unlink()
+    finally:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        shutil.rmtree(STATE_ROOT, ignore_errors=True)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()